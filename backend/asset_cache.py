@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Local, versioned cache for template assets stored in Supabase storage.
+
+Entries are keyed by (bucket, path). The bytes are stored content-addressed
+under <root>/objects/<sha256><suffix>, and <root>/index.json records for every
+key which object is current plus the ETag / Last-Modified validators returned
+by storage.
+
+Lookup rules:
+ - fresh entry (younger than the TTL): served from disk, no network traffic
+ - stale entry: served from disk immediately, and a conditional request
+   (If-None-Match / If-Modified-Since) is scheduled in the background; a 304
+   only refreshes the timestamp, a 200 stores the new version
+ - miss: fetched; misses of one get_many() call are fetched concurrently
+ - not in storage (HTTP 400/404, as Supabase answers for a missing object):
+   remembered for ASSET_MISS_TTL seconds, so optional assets that were never
+   uploaded do not cost a round-trip per request
+
+An object no index entry refers to any more (replaced by a new version) is
+deleted when the new version is stored.
+
+Configuration (environment variables):
+  ASSET_CACHE_DIR   cache root (default: <tmp>/baoyan-asset-cache)
+  ASSET_CACHE_TTL   seconds before an entry is revalidated (default 300)
+  ASSET_MISS_TTL    seconds a missing asset is not requested again (default 300)
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+ASSET_CACHE_DIR = os.getenv("ASSET_CACHE_DIR") or str(Path(tempfile.gettempdir()) / "baoyan-asset-cache")
+ASSET_CACHE_TTL = float(os.getenv("ASSET_CACHE_TTL", "300"))
+ASSET_MISS_TTL = float(os.getenv("ASSET_MISS_TTL", "300"))
+
+AssetKey = Tuple[str, str]
+# fetcher(bucket, path, etag, last_modified) -> (status_code, content, headers)
+Fetcher = Callable[[str, str, Optional[str], Optional[str]], Tuple[int, bytes, Dict[str, str]]]
+
+
+class AssetCache:
+    def __init__(self, fetcher: Fetcher, root: str = ASSET_CACHE_DIR, ttl: float = ASSET_CACHE_TTL,
+                 miss_ttl: float = ASSET_MISS_TTL, max_workers: int = 4):
+        self.fetcher = fetcher
+        self.root = Path(root)
+        self.objects_dir = self.root / 'objects'
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / 'index.json'
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+        self._revalidating: set = set()
+        # key -> (retry after, error) for assets storage does not have
+        self._misses: Dict[str, Tuple[float, Exception]] = {}
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='asset-cache')
+        self._index: Dict[str, Dict] = self._load_index()
+
+    @staticmethod
+    def _key(bucket: str, path: str) -> str:
+        return f'{bucket}/{path}'
+
+    def _load_index(self) -> Dict[str, Dict]:
+        try:
+            return json.loads(self.index_path.read_text(encoding='utf-8'))
+        except Exception:
+            return {}
+
+    def _save_index(self) -> None:
+        # caller holds self._lock
+        # workers sharing the directory must not write the same temporary file
+        tmp = self.index_path.with_name(f'{self.index_path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_text(json.dumps(self._index, ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp, self.index_path)
+
+    def _object_path(self, entry: Dict) -> Path:
+        return self.objects_dir / (entry['sha256'] + entry.get('suffix', ''))
+
+    def _store(self, bucket: str, path: str, content: bytes, headers: Dict[str, str]) -> Path:
+        sha = hashlib.sha256(content).hexdigest()
+        entry = {
+            'sha256': sha,
+            'suffix': Path(path).suffix,
+            'etag': headers.get('etag') or headers.get('ETag'),
+            'last_modified': headers.get('last-modified') or headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+        }
+        obj = self._object_path(entry)
+        if not obj.exists():
+            tmp = obj.with_name(obj.name + f'.{os.getpid()}.{threading.get_ident()}.tmp')
+            tmp.write_bytes(content)
+            os.replace(tmp, obj)
+        with self._lock:
+            previous = self._index.get(self._key(bucket, path))
+            self._index[self._key(bucket, path)] = entry
+            self._save_index()
+            garbage = None
+            if previous and previous.get('sha256') != sha \
+                    and not any(e.get('sha256') == previous.get('sha256') for e in self._index.values()):
+                garbage = self._object_path(previous)
+        if garbage is not None:
+            try:
+                garbage.unlink()
+            except FileNotFoundError:
+                pass
+        return obj
+
+    def _known_missing(self, bucket: str, path: str) -> Optional[Exception]:
+        """The error of a recent not-found response for this asset, if any."""
+        key = self._key(bucket, path)
+        with self._lock:
+            miss = self._misses.get(key)
+            if miss and miss[0] <= time.time():
+                del self._misses[key]
+                miss = None
+        return miss[1] if miss else None
+
+    def _fetch(self, bucket: str, path: str) -> Path:
+        status, content, headers = self.fetcher(bucket, path, None, None)
+        if status != 200:
+            error = Exception(f"HTTP {status}: {content[:200]!r}")
+            # Supabase answers a missing object with 400 {"statusCode": "404"}
+            if status in (400, 404):
+                with self._lock:
+                    self._misses[self._key(bucket, path)] = (time.time() + self.miss_ttl, error)
+            raise error
+        return self._store(bucket, path, content, headers)
+
+    def _revalidate(self, bucket: str, path: str) -> None:
+        key = self._key(bucket, path)
+        try:
+            with self._lock:
+                entry = dict(self._index.get(key) or {})
+            status, content, headers = self.fetcher(bucket, path, entry.get('etag'), entry.get('last_modified'))
+            if status == 304:
+                with self._lock:
+                    if key in self._index:
+                        self._index[key]['fetched_at'] = time.time()
+                        self._save_index()
+            elif status == 200:
+                self._store(bucket, path, content, headers)
+            else:
+                print(f"Asset revalidation for {key} returned HTTP {status}; keeping cached copy")
+        except Exception as e:
+            print(f"Asset revalidation for {key} failed: {e}")
+        finally:
+            with self._lock:
+                self._revalidating.discard(key)
+
+    def _lookup(self, bucket: str, path: str) -> Optional[Path]:
+        """Return the cached object (scheduling a background revalidation if stale) or None on a miss."""
+        key = self._key(bucket, path)
+        with self._lock:
+            entry = self._index.get(key)
+            if not entry:
+                return None
+            obj = self._object_path(entry)
+            if not obj.exists():
+                return None
+            stale = time.time() - entry.get('fetched_at', 0) > self.ttl
+            if stale and key not in self._revalidating:
+                self._revalidating.add(key)
+                self._executor.submit(self._revalidate, bucket, path)
+        return obj
+
+    def get(self, bucket: str, path: str) -> Path:
+        """Local path of the asset; raises when it is not cached and cannot be downloaded."""
+        hit = self._lookup(bucket, path)
+        if hit:
+            return hit
+        missing = self._known_missing(bucket, path)
+        if missing:
+            raise missing
+        return self._fetch(bucket, path)
+
+    def get_many(self, keys: Iterable[AssetKey]) -> Tuple[Dict[AssetKey, Path], Dict[AssetKey, Exception]]:
+        """
+        Resolve several assets at once. Cache misses are downloaded concurrently.
+        Returns (paths, errors) so callers can decide which assets are optional.
+        """
+        paths: Dict[AssetKey, Path] = {}
+        errors: Dict[AssetKey, Exception] = {}
+        misses = []
+        for bucket, path in keys:
+            hit = self._lookup(bucket, path)
+            missing = None if hit else self._known_missing(bucket, path)
+            if hit:
+                paths[(bucket, path)] = hit
+            elif missing:
+                errors[(bucket, path)] = missing
+            else:
+                misses.append((bucket, path))
+        futures = {k: self._executor.submit(self._fetch, *k) for k in misses}
+        for k, fut in futures.items():
+            try:
+                paths[k] = fut.result()
+            except Exception as e:
+                errors[k] = e
+        return paths, errors
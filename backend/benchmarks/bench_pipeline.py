@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Stage-by-stage benchmark of the cover generation pipeline, with baseline comparison.
+
+Usage (from backend/):
+  python benchmarks/bench_pipeline.py                      # compare with benchmarks/baseline.json
+  python benchmarks/bench_pipeline.py --save-baseline      # record a new baseline
+  python benchmarks/bench_pipeline.py --sizes 0,200 --logos 5000 --iterations 50
+
+Inputs are synthetic and reproducible: cover templates padded with 0 up to
+hundreds of extra paragraphs (synthetic.make_template) and a generated logos
+directory + mapping with several thousand entries (synthetic.make_logo_set).
+
+Stages:
+  logo_index_build               build the school -> logo index (cold find_logo_file)
+  find_logo_file                 warm lookups, mixing mapped names and misses
+  docx_load                      clone the cached template
+  replace_first_image_with_logo
+  replace_placeholders           with the compiled placeholder plan
+  docx_save
+  assemble_cover_docx            the service's DOCX path: ZIP-level patching of the compiled
+                                 template (docx_patch.py) with the logo and fields
+  convert_docx_to_pdf            only when soffice is available
+  main                           generate_school_cover.main end to end
+
+Each stage reports min / median / p95 wall time and the tracemalloc peak of
+one extra run. A stage regresses when its best time (or peak memory) exceeds
+the baseline by more than --tolerance; the exit code is then 1. Baselines are
+machine specific: re-record them on the machine that runs the comparison.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import io
+import json
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from generate_school_cover import (  # noqa: E402
+    assemble_cover_docx,
+    compile_placeholders,
+    convert_docx_to_pdf,
+    find_logo_file,
+    main as generate_cover_main,
+    placeholder_spec_key,
+    replace_first_image_with_logo,
+    replace_placeholders,
+)
+from logo_index import build_logo_index  # noqa: E402
+from template_cache import get_compiled_template  # noqa: E402
+from synthetic import SAMPLE_FIELDS, make_logo_set, make_template  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'baseline.json'
+# differences below these floors are noise, whatever the percentage
+MIN_TIME_DELTA_MS = 0.05
+MIN_PEAK_DELTA_KIB = 64
+WARMUP_RUNS = 2
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def measure(fn: Callable, iterations: int, setup: Optional[Callable] = None) -> Dict[str, float]:
+    """
+    Time fn(setup()) `iterations` times (after warm-up runs, with the cyclic GC
+    paused like timeit does), then record its tracemalloc peak once.
+    """
+    for _ in range(WARMUP_RUNS):
+        fn(setup() if setup else None)
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            arg = setup() if setup else None
+            t0 = time.perf_counter()
+            fn(arg)
+            samples.append((time.perf_counter() - t0) * 1000)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    samples.sort()
+
+    arg = setup() if setup else None
+    tracemalloc.start()
+    try:
+        fn(arg)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'min_ms': round(samples[0], 4),
+        'median_ms': round(_percentile(samples, 0.5), 4),
+        'p95_ms': round(_percentile(samples, 0.95), 4),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def run_logo_stages(work: Path, logo_count: int, iterations: int) -> Dict[str, Dict[str, float]]:
+    logos_dir = work / 'logos'
+    mapping_path = work / 'logo_mapping.json'
+    names = make_logo_set(logos_dir, logo_count, mapping_path)
+    spec = {'logo_mapping': str(mapping_path)}
+    # every 10th query misses the mapping and goes through the bigram fallback
+    queries = [n if i % 10 else n + '（分校）' for i, n in enumerate(names[:: max(1, len(names) // 200)])]
+    cursor = iter(range(10 ** 9))
+
+    def lookup(_):
+        find_logo_file(logos_dir, queries[next(cursor) % len(queries)], spec)
+
+    find_logo_file(logos_dir, names[0], spec)  # build the process-wide index outside the timing
+    return {
+        f'logos={logo_count}/logo_index_build': measure(
+            lambda _: build_logo_index(logos_dir, mapping_path), max(3, iterations // 5)),
+        f'logos={logo_count}/find_logo_file': measure(lookup, iterations * 20),
+    }
+
+
+def run_template_stages(work: Path, extra_paragraphs: int, iterations: int, logo: Path,
+                        with_pdf: bool) -> Dict[str, Dict[str, float]]:
+    template = make_template(work / f'template-{extra_paragraphs}.docx', extra_paragraphs)
+    spec: Dict = {}
+    compiled = get_compiled_template(template)
+    plan = compiled.artifact(placeholder_spec_key(spec), lambda master: compile_placeholders(master, spec))
+    fields = dict(SAMPLE_FIELDS)
+
+    def filled():
+        doc = compiled.instantiate()
+        replace_first_image_with_logo(doc, logo, spec)
+        replace_placeholders(doc, fields, plan, spec)
+        return doc
+
+    prefix = f'paragraphs=+{extra_paragraphs}'
+    results = {
+        f'{prefix}/docx_load': measure(lambda _: compiled.instantiate(), iterations),
+        f'{prefix}/replace_first_image_with_logo': measure(
+            lambda doc: replace_first_image_with_logo(doc, logo, spec), iterations, compiled.instantiate),
+        f'{prefix}/replace_placeholders': measure(
+            lambda doc: replace_placeholders(doc, fields, plan, spec), iterations, compiled.instantiate),
+        f'{prefix}/docx_save': measure(lambda doc: doc.save(io.BytesIO()), iterations, filled),
+        # warm-up runs compile the patch skeleton, as the service's first request does
+        f'{prefix}/assemble_cover_docx': measure(
+            lambda _: assemble_cover_docx(template, spec, logo, fields), iterations),
+    }
+
+    out_docx = work / f'cover-{extra_paragraphs}.docx'
+    filled().save(str(out_docx))
+    if with_pdf:
+        results[f'{prefix}/convert_docx_to_pdf'] = measure(
+            lambda _: convert_docx_to_pdf(out_docx, work / f'cover-{extra_paragraphs}.pdf'),
+            max(1, iterations // 10))
+
+    output = work / f'main-{extra_paragraphs}.{"pdf" if with_pdf else "docx"}'
+    argv = [
+        '--template', str(template), '--logos', str(logo.parent), '--school', '测试大学0000',
+        '--output', str(output), '--fields', json.dumps(fields, ensure_ascii=False),
+        '--spec', str(work / 'spec.json'),
+    ]
+
+    def run_main(_):
+        with redirect_stdout(io.StringIO()):
+            generate_cover_main(argv)
+
+    results[f'{prefix}/main'] = measure(run_main, max(1, iterations // (10 if with_pdf else 1)))
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict, tolerance: float) -> List[str]:
+    """Print a comparison table; returns the regressed stage keys."""
+    base = baseline.get('results', {})
+    regressions = []
+    print(f"{'stage':<52}{'min ms':>10}{'median ms':>11}{'p95 ms':>10}{'peak KiB':>11}{'vs base':>10}")
+    for key, r in results.items():
+        b = base.get(key)
+        note = 'new'
+        if b:
+            # best-of-N is the least noisy estimate of what the code costs (cf. timeit)
+            dt = r['min_ms'] - b['min_ms']
+            dm = r['peak_kib'] - b['peak_kib']
+            note = f"{dt / b['min_ms'] * 100:+.0f}%" if b['min_ms'] else '-'
+            slow = dt > max(MIN_TIME_DELTA_MS, b['min_ms'] * tolerance)
+            fat = dm > max(MIN_PEAK_DELTA_KIB, b['peak_kib'] * tolerance)
+            if slow or fat:
+                regressions.append(key)
+                note += ' REGRESSED' + ('' if slow else ' (memory)')
+        print(f"{key:<52}{r['min_ms']:>10.3f}{r['median_ms']:>11.3f}{r['p95_ms']:>10.3f}{r['peak_kib']:>11.1f}  {note}")
+    return regressions
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='0,50,200,500',
+                        help='comma-separated extra paragraph counts for the synthetic templates')
+    parser.add_argument('--logos', type=int, default=3000, help='number of synthetic logos')
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown / memory growth (0.25 = 25%%)')
+    parser.add_argument('--json', help='also write the raw results to this file')
+    args = parser.parse_args(argv)
+
+    with_pdf = shutil.which('soffice') is not None
+    if not with_pdf:
+        print("soffice not found: skipping convert_docx_to_pdf, main writes DOCX")
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        work = Path(tmp)
+        (work / 'spec.json').write_text(
+            json.dumps({'logo_mapping': str(work / 'logo_mapping.json')}), encoding='utf-8')
+        results.update(run_logo_stages(work, args.logos, args.iterations))
+        logo = work / 'logos' / 'school_00000.png'
+        for size in (int(s) for s in args.sizes.split(',') if s.strip()):
+            results.update(run_template_stages(work, size, args.iterations, logo, with_pdf))
+
+    meta = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'iterations': args.iterations,
+        'logos': args.logos,
+        'soffice': with_pdf,
+    }
+    if args.json:
+        Path(args.json).write_text(json.dumps({'meta': meta, 'results': results}, indent=2), encoding='utf-8')
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps({'meta': meta, 'results': results}, indent=2) + '\n', encoding='utf-8')
+        compare(results, {}, args.tolerance)
+        print("Saved baseline to", baseline_path)
+        return 0
+
+    baseline = {}
+    if baseline_path.exists():
+        baseline = json.loads(baseline_path.read_text(encoding='utf-8'))
+        base_meta = baseline.get('meta', {})
+        if (base_meta.get('python'), base_meta.get('machine')) != (meta['python'], meta['machine']):
+            print(f"note: baseline was recorded on {base_meta.get('platform')} / Python {base_meta.get('python')}")
+    else:
+        print("No baseline at", baseline_path, "- run with --save-baseline to record one")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} stage(s) regressed beyond {args.tolerance:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Compare per-request template loading: Document(path) vs the compiled template cache.
+
+Usage (from backend/):
+  python benchmarks/bench_template_load.py [--template path/to/template.docx] [--iterations 200]
+
+Without --template a synthetic cover template is generated. Each path is timed
+for load only and for load + placeholder replacement + save, which is the
+per-request work of generate_school_cover.main before PDF conversion.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docx import Document  # noqa: E402
+
+from generate_school_cover import replace_placeholders  # noqa: E402
+from template_cache import TemplateCache  # noqa: E402
+from synthetic import SAMPLE_FIELDS, make_template  # noqa: E402
+
+
+def _time(fn, iterations: int):
+    samples = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return statistics.mean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.95) - 1]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--template', help='DOCX template (default: synthetic cover)')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    if args.template:
+        template = Path(args.template)
+    else:
+        template = make_template(Path(tempfile.mkdtemp()) / 'template.docx')
+
+    cache = TemplateCache()
+    cache.get(template)  # warm: the first request pays the parse once
+
+    def full(load):
+        doc = load()
+        replace_placeholders(doc, dict(SAMPLE_FIELDS))
+        doc.save(io.BytesIO())
+
+    cases = [
+        ('load: Document(path)', lambda: Document(str(template))),
+        ('load: cached clone', lambda: cache.get(template).instantiate()),
+        ('load+replace+save: Document(path)', lambda: full(lambda: Document(str(template)))),
+        ('load+replace+save: cached clone', lambda: full(lambda: cache.get(template).instantiate())),
+    ]
+    print(f"template: {template} ({args.iterations} iterations)")
+    print(f"{'case':<38}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, fn in cases:
+        mean, p50, p95 = _time(fn, args.iterations)
+        print(f"{name:<38}{mean:>10.2f}{p50:>10.2f}{p95:>10.2f}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main(sys.argv[1:]))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Synthetic inputs for the cover-generation benchmarks.
+
+make_template() writes a DOCX shaped like the production cover (logo image,
+"××大学××学院" header, "label：×××" rows) and can pad it with extra body
+paragraphs to simulate larger templates. make_logo_set() writes a logos
+directory and mapping of arbitrary size.
+"""
+from __future__ import annotations
+
+import io
+import json
+from pathlib import Path
+from typing import List, Optional
+
+from docx import Document
+from docx.shared import Inches
+from PIL import Image
+
+COVER_LABELS = ['学  生  姓  名', '申  请  专  业', '本  科  院  校', '毕  业  专  业', '联  系  方  式', '邮            箱']
+
+SAMPLE_FIELDS = {
+    "学生姓名": "王小明",
+    "申请专业": "计算机科学与技术",
+    "本科院校": "北京大学",
+    "毕业专业": "软件工程",
+    "联系方式": "138-0000-0000",
+    "邮箱": "wangxiaoming@pku.edu.cn",
+}
+
+
+def png_bytes(size: int = 200, color=(180, 20, 40)) -> bytes:
+    buf = io.BytesIO()
+    Image.new('RGB', (size, size), color).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def make_template(path: Path, extra_paragraphs: int = 0) -> Path:
+    doc = Document()
+    p = doc.add_paragraph()
+    p.add_run().add_picture(io.BytesIO(png_bytes()), width=Inches(1.2), height=Inches(1.2))
+    p = doc.add_paragraph()
+    for t in ('××', '大学', '××', '学院'):
+        p.add_run(t)
+    doc.add_paragraph('推荐免试研究生申请材料')
+    for label in COVER_LABELS:
+        p = doc.add_paragraph()
+        p.add_run(label + '：')
+        p.add_run('×××')
+    for i in range(extra_paragraphs):
+        doc.add_paragraph(f'附加说明第{i + 1}段：本段用于模拟较长的模板正文内容。')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc.save(str(path))
+    return path
+
+
+def school_names(count: int):
+    """Distinct synthetic school names ('测试理工大学0001', ...)."""
+    kinds = ('大学', '理工大学', '师范大学', '学院', '医科大学')
+    return [f"测试{kinds[i % len(kinds)]}{i:04d}" for i in range(count)]
+
+
+def make_logo_set(logos_dir: Path, count: int, mapping_path: Optional[Path] = None) -> List[str]:
+    """
+    Write `count` small PNG logos (school_<n>.png, like scripts/logo_mapping.json
+    names) plus a school -> file mapping JSON. Returns the school names.
+    """
+    logos_dir.mkdir(parents=True, exist_ok=True)
+    blob = png_bytes(64)
+    names = school_names(count)
+    mapping = {}
+    for i, name in enumerate(names):
+        file_name = f"school_{i:05d}.png"
+        (logos_dir / file_name).write_bytes(blob)
+        mapping[name] = file_name
+    mapping_path = mapping_path or logos_dir / 'logo_mapping.json'
+    mapping_path.write_text(json.dumps(mapping, ensure_ascii=False), encoding='utf-8')
+    return names
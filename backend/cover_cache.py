@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache of generated cover PDFs.
+
+Students regenerate the same cover many times while editing other parts of
+their application. A cover is fully determined by
+
+  (renderer version, template sha256, spec, logo file sha256, engine, fields)
+
+so the PDF is stored on local disk under the sha256 of that tuple. The same
+key doubles as the response ETag: a client that sends it back in If-None-Match
+gets a 304 without the PDF being read, let alone rendered.
+
+Fields are keyed exactly as the renderer receives them, in order: the
+placeholder replacement tells an empty value from a missing key and falls back
+to the first field in dict order, so any normalization here could map two
+different covers to one key.
+
+Files live in COVER_CACHE_DIR as <key>.pdf; the least recently used ones are
+deleted once the directory exceeds COVER_CACHE_MAX_MB. The LRU order survives
+restarts through the file mtimes (touched on every hit), and uvicorn workers on
+one host share the directory.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+COVER_CACHE_DIR = os.getenv("COVER_CACHE_DIR") or str(Path(tempfile.gettempdir()) / "baoyan-cover-cache")
+COVER_CACHE_MAX_MB = float(os.getenv("COVER_CACHE_MAX_MB", "512"))
+
+# Bump when the rendering code changes output for the same inputs
+COVER_RENDER_VERSION = "cover-v1"
+
+_digest_memo: Dict[Tuple[str, int, int], str] = {}
+_digest_lock = threading.Lock()
+
+
+def file_digest(path: Path) -> str:
+    """sha256 of a file, memoized on (path, mtime, size) so unchanged files are hashed once."""
+    st = path.stat()
+    memo_key = (str(path.resolve()), st.st_mtime_ns, st.st_size)
+    with _digest_lock:
+        digest = _digest_memo.get(memo_key)
+    if digest is None:
+        digest = hashlib.sha256(path.read_bytes()).hexdigest()
+        with _digest_lock:
+            _digest_memo[memo_key] = digest
+    return digest
+
+
+def cover_cache_key(template: Path, spec: Dict, logo: Optional[Path], fields: Dict[str, str], engine: str) -> str:
+    payload = json.dumps(
+        {
+            'version': COVER_RENDER_VERSION,
+            'template': file_digest(template),
+            'spec': spec or {},
+            'logo': file_digest(logo) if logo else None,
+            'engine': engine,
+            # a list of pairs: sort_keys must not reorder the fields
+            'fields': [[key, value] for key, value in (fields or {}).items()],
+        },
+        ensure_ascii=False, sort_keys=True, separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def etag_for(key: str) -> str:
+    return f'"{key}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 9110 weak comparison against an If-None-Match header value."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class CoverCache:
+    def __init__(self, root: str = COVER_CACHE_DIR, max_bytes: int = int(COVER_CACHE_MAX_MB * 1024 * 1024)):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # key -> size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self.counters = {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'not_modified': 0, 'bypasses': 0}
+        files = sorted(self.root.glob('*.pdf'), key=lambda p: p.stat().st_mtime)
+        for p in files:
+            size = p.stat().st_size
+            self._entries[p.stem] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    def _path(self, key: str) -> Path:
+        return self.root / f"{key}.pdf"
+
+    def _evict(self) -> None:
+        # caller holds self._lock
+        while self._bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            self.counters['evictions'] += 1
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            # files written by other workers sharing the directory count as hits too
+            data = path.read_bytes()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._bytes -= size
+                self.counters['misses'] += 1
+            return None
+        with self._lock:
+            if key not in self._entries:
+                self._bytes += len(data)
+            self._entries[key] = len(data)
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous
+            self._entries[key] = len(data)
+            self._bytes += len(data)
+            self.counters['stores'] += 1
+            self._evict()
+
+    def record_bypass(self) -> None:
+        with self._lock:
+            self.counters['bypasses'] += 1
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.counters['not_modified'] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.counters['hits'] + self.counters['misses']
+            return {
+                **self.counters,
+                'hit_ratio': round(self.counters['hits'] / lookups, 4) if lookups else 0.0,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
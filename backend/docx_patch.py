@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+ZIP-level DOCX assembly for cover generation.
+
+Saving a python-docx Document re-serializes and re-deflates every part of the
+package (styles.xml alone is hundreds of KB), although a cover only changes
+word/document.xml and the logo image. This module assembles the output at the
+ZIP level instead:
+
+ - ZipTemplate parses the template's central directory once and keeps each
+   member's raw bytes (local header + compressed data). Unchanged members are
+   copied byte for byte, never decompressed or recompressed; replaced members
+   get a fresh local header, and the central directory / end record are written
+   with struct.
+ - XmlSkeleton is a serialized part split around value slots. It is produced
+   once per template and field set by running the regular python-docx
+   replacement with sentinel values; filling it is string concatenation of
+   XML-escaped values.
+
+ZIP64 archives are not handled (ValueError); callers fall back to the
+python-docx path.
+"""
+from __future__ import annotations
+
+import re
+import struct
+import zlib
+from typing import Callable, Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+CENTRAL_HEADER = struct.Struct('<4sHHHHHHIIIHHHHHII')
+END_RECORD = struct.Struct('<4sHHHHIIH')
+
+LOCAL_SIG = b'PK\x03\x04'
+CENTRAL_SIG = b'PK\x01\x02'
+END_SIG = b'PK\x05\x06'
+
+METHOD_STORED = 0
+METHOD_DEFLATED = 8
+FLAG_DATA_DESCRIPTOR = 0x08
+FLAG_UTF8 = 0x800
+
+
+class ZipMember:
+    __slots__ = ('name', 'central', 'raw')
+
+    def __init__(self, name: str, central: bytes, raw: bytes):
+        self.name = name
+        # central directory record (fixed part + name + extra + comment)
+        self.central = central
+        # local header + data (+ data descriptor), exactly as in the template
+        self.raw = raw
+
+
+class ZipTemplate:
+    """A ZIP archive split into raw members, re-assembled with some members replaced."""
+
+    def __init__(self, data: bytes):
+        end = data.rfind(END_SIG, max(0, len(data) - 65557))
+        if end < 0:
+            raise ValueError("not a ZIP archive (no end of central directory record)")
+        _, disk, cd_disk, _, count, cd_size, cd_offset, _ = END_RECORD.unpack_from(data, end)
+        if disk or cd_disk or count == 0xFFFF or cd_offset == 0xFFFFFFFF:
+            raise ValueError("multi-disk and ZIP64 archives are not supported")
+
+        entries = []
+        pos = cd_offset
+        for _ in range(count):
+            fields = CENTRAL_HEADER.unpack_from(data, pos)
+            if fields[0] != CENTRAL_SIG:
+                raise ValueError("corrupt central directory")
+            name_len, extra_len, comment_len = fields[10], fields[11], fields[12]
+            offset = fields[16]
+            size = CENTRAL_HEADER.size + name_len + extra_len + comment_len
+            raw_name = data[pos + CENTRAL_HEADER.size:pos + CENTRAL_HEADER.size + name_len]
+            name = raw_name.decode('utf-8' if fields[3] & FLAG_UTF8 else 'cp437')
+            entries.append((offset, name, data[pos:pos + size]))
+            pos += size
+
+        # a member's raw span runs to the next local header (or the central directory)
+        starts = sorted(offset for offset, _, _ in entries) + [cd_offset]
+        next_start = {start: starts[i + 1] for i, start in enumerate(starts[:-1])}
+        self.members: List[ZipMember] = []
+        for offset, name, central in entries:
+            if data[offset:offset + 4] != LOCAL_SIG:
+                raise ValueError(f"corrupt local header for {name}")
+            self.members.append(ZipMember(name, central, data[offset:next_start[offset]]))
+        self.names = {m.name for m in self.members}
+
+    def read(self, name: str) -> bytes:
+        """Uncompressed content of a member (used once, when compiling)."""
+        for m in self.members:
+            if m.name == name:
+                fields = LOCAL_HEADER.unpack(m.raw[:LOCAL_HEADER.size])
+                method, csize = fields[3], fields[7]
+                start = LOCAL_HEADER.size + fields[9] + fields[10]
+                if fields[2] & FLAG_DATA_DESCRIPTOR:
+                    csize = CENTRAL_HEADER.unpack_from(m.central)[8]
+                body = m.raw[start:start + csize]
+                if method == METHOD_STORED:
+                    return body
+                if method == METHOD_DEFLATED:
+                    return zlib.decompress(body, -15)
+                raise ValueError(f"unsupported compression method {method} for {name}")
+        raise KeyError(name)
+
+    def build(self, replacements: Dict[str, Tuple[bytes, bool]]) -> bytes:
+        """
+        The archive with members replaced: {name: (content, deflate)}. Every
+        other member is copied verbatim, in the original order.
+        """
+        out: List[bytes] = []
+        central: List[bytes] = []
+        pos = 0
+        for m in self.members:
+            replacement = replacements.get(m.name)
+            if replacement is None:
+                out.append(m.raw)
+                # only the local header offset changes
+                central.append(m.central[:42] + struct.pack('<I', pos) + m.central[46:])
+                pos += len(m.raw)
+                continue
+
+            content, deflate = replacement
+            crc = zlib.crc32(content) & 0xFFFFFFFF
+            if deflate:
+                compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+                body = compressor.compress(content) + compressor.flush()
+                method = METHOD_DEFLATED
+            else:
+                body = content
+                method = METHOD_STORED
+            c = CENTRAL_HEADER.unpack_from(m.central)
+            flags = c[3] & FLAG_UTF8
+            name_bytes = m.central[CENTRAL_HEADER.size:CENTRAL_HEADER.size + c[10]]
+            version_needed = 20 if method == METHOD_DEFLATED else 10
+            local = LOCAL_HEADER.pack(LOCAL_SIG, version_needed, flags, method, c[5], c[6],
+                                      crc, len(body), len(content), len(name_bytes), 0)
+            out += [local, name_bytes, body]
+            central.append(CENTRAL_HEADER.pack(
+                CENTRAL_SIG, c[1], version_needed, flags, method, c[5], c[6], crc, len(body), len(content),
+                c[10], c[11], c[12], 0, c[14], c[15], pos,
+            ) + m.central[CENTRAL_HEADER.size:])
+            pos += len(local) + len(name_bytes) + len(body)
+
+        cd = b''.join(central)
+        out.append(cd)
+        out.append(END_RECORD.pack(END_SIG, 0, 0, len(central), len(central), len(cd), pos, 0))
+        return b''.join(out)
+
+
+def sentinel(slot: int) -> str:
+    """Marker for value slot `slot` (private-use characters, never in template text)."""
+    return '\ue000' + chr(0xe100 + slot) + '\ue001'
+
+
+_SENTINEL_RE = re.compile(b'\xee\x80\x80(...)\xee\x80\x81', re.S)
+
+# value characters python-docx does not write as plain <w:t> text
+_UNSAFE_VALUE_RE = re.compile(r'[\x00-\x1f\x7f\ue000-\uf8ff]')
+
+
+def plain_text_value(value: str) -> bool:
+    """
+    True when python-docx would write `value` as a single plain <w:t>: non-empty,
+    no surrounding whitespace (xml:space="preserve") and no tabs, breaks or control
+    characters. Anything else has to go through the python-docx path.
+    """
+    return bool(value) and value == value.strip() and not _UNSAFE_VALUE_RE.search(value)
+
+
+class XmlSkeleton:
+    """A serialized XML part with value slots, filled by concatenation."""
+
+    def __init__(self, serialized: bytes, suffixes: Optional[Dict[int, bytes]] = None):
+        # slot -> bytes that immediately follow the sentinel in a "full value" occurrence,
+        # which distinguishes two renderings of one slot (see generate_school_cover)
+        suffixes = suffixes or {}
+        self.segments: List[bytes] = []
+        self.slots: List[Tuple[int, bool]] = []  # (slot, follows-suffix variant)
+        pos = 0
+        for m in _SENTINEL_RE.finditer(serialized):
+            slot = ord(m.group(1).decode('utf-8')) - 0xe100
+            self.segments.append(serialized[pos:m.start()])
+            pos = m.end()
+            suffix = suffixes.get(slot)
+            full = bool(suffix) and serialized.startswith(suffix, pos)
+            if full:
+                pos += len(suffix)
+            self.slots.append((slot, full))
+        self.segments.append(serialized[pos:])
+
+    def fill(self, render: Callable[[int, bool], str]) -> bytes:
+        """render(slot, full) -> text for each slot occurrence; the text is XML-escaped here."""
+        parts = [self.segments[0]]
+        for (slot, full), segment in zip(self.slots, self.segments[1:]):
+            parts.append(escape(render(slot, full)).encode('utf-8'))
+            parts.append(segment)
+        return b''.join(parts)
@@ -16,32 +16,104 @@ Behavior:
      - "标签：占位" 形式会把右侧替换为 provided values (if present).
      - runs containing 'XXX' or '____' will be replaced in-order with provided mapping.
  - Saves a modified DOCX and attempts to convert it to PDF using LibreOffice (soffice).
+ - render_cover assembles the DOCX at the ZIP level (docx_patch.py): the template's
+   unchanged members are copied byte for byte and only word/document.xml (filled
+   from a skeleton compiled per template and field set, MAX_PATCH_PLANS kept) and the logo image
+   part are written. Values that are not plain single-line text fall back to
+   python-docx.
+
+Library use:
+  render_cover(template, spec, logo, fields) -> bytes is reentrant: all
+  configuration is passed per call (nothing is read from process globals or
+  sys.argv), so it can run concurrently in threads or worker processes.
+  TEMPLATE_SPEC is only the default for the lower-level helpers when no spec
+  is passed.
 
 Dependencies:
   pip install python-docx lxml
   LibreOffice (optional, for PDF conversion)
+  reportlab (for --engine native, which draws the PDF without LibreOffice)
 """
 from __future__ import annotations
 
 import argparse
+import hashlib
+import io
 import json
-import os
-import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
 
 from docx import Document
 from docx.shared import Inches
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from docx.text.paragraph import Paragraph
 
-# Loaded template spec (can be overridden via --spec)
+from docx_patch import XmlSkeleton, ZipTemplate, plain_text_value, sentinel
+from soffice_pool import get_pool
+from template_cache import get_compiled_template
+from logo_index import get_logo_index
+from raster_cache import get_raster_cache
+
+# Default template spec for helpers called without an explicit spec
 TEMPLATE_SPEC: Dict = {}
 
+DEFAULT_FIELDS = {
+    "学生姓名": "王小明",
+    "申请专业": "计算机科学与技术",
+    "本科院校": "北京大学",
+    "毕业专业": "软件工程",
+    "联系方式": "138-0000-0000",
+    "邮箱": "wangxiaoming@pku.edu.cn"
+}
+
+
+# per thread: time spent in stages nested inside each open stage_timer
+_open_stages = threading.local()
+
+
+@contextmanager
+def stage_timer(timings: Optional[Dict[str, float]], stage: str):
+    """
+    Add the wall time of the block to timings[stage] (no-op when timings is None).
+    Stages timed inside the block (e.g. rasterization within logo_replace) are
+    excluded from it, so stages never overlap and sum to the wall time.
+    """
+    if timings is None:
+        yield
+        return
+    stack = _open_stages.__dict__.setdefault('stack', [])
+    stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        nested = stack.pop()
+        timings[stage] = timings.get(stage, 0.0) + elapsed - nested
+        if stack:
+            stack[-1] += elapsed
+
+
+def load_spec(spec_path: Optional[Path]) -> Dict:
+    """Read a template spec JSON; missing or unreadable specs yield {}."""
+    try:
+        if spec_path and spec_path.exists():
+            return json.loads(spec_path.read_text(encoding='utf-8'))
+    except Exception as e:
+        print("Failed to load template spec:", e)
+    return {}
+
 def emu_to_px(emu: int, dpi: int = 300) -> float:
     """
     Convert EMU (English Metric Unit) to pixels.
@@ -50,64 +122,29 @@ def emu_to_px(emu: int, dpi: int = 300) -> float:
     inches = emu / 914400.0
     return inches * dpi
 
-def find_logo_file(logos_dir: Path, school_name: str) -> Optional[Path]:
-    # First try explicit mapping from spec-generated mapping file
-    mapped = None
-    try:
-        logo_map_path = Path(TEMPLATE_SPEC.get('logo_mapping', Path(__file__).parent / 'logo_mapping.json'))
-        if logo_map_path.exists():
-            mapped_json = json.loads(logo_map_path.read_text(encoding='utf-8'))
-            # exact match
-            if school_name in mapped_json:
-                candidate = logos_dir / mapped_json[school_name]
-                if candidate.exists():
-                    return candidate
-            # try simplified match keys
-            name_low = school_name.lower()
-            for k, v in mapped_json.items():
-                if k.lower() == name_low:
-                    candidate = logos_dir / v
-                    if candidate.exists():
-                        return candidate
-    except Exception:
-        pass
-    name_low = school_name.lower()
-    candidates: List[Path] = []
-    for p in logos_dir.iterdir():
-        if not p.is_file():
-            continue
-        fname = p.name.lower()
-        if name_low in fname:
-            candidates.append(p)
-    if not candidates:
-        # try fuzzy: split school_name into tokens
-        tokens = re.split(r'[\s\-]+', school_name)
-        for p in logos_dir.iterdir():
-            fname = p.name.lower()
-            if all(tok.lower() in fname for tok in tokens if tok):
-                candidates.append(p)
-    if not candidates:
-        return None
-    # prefer svg, then png, then jpg
-    def score(x: Path):
-        ext = x.suffix.lower()
-        if ext == '.svg':
-            return 0
-        if ext == '.png':
-            return 1
-        if ext in ('.jpg', '.jpeg'):
-            return 2
-        return 3
-    candidates.sort(key=lambda x: (score(x), x.name))
-    return candidates[0]
+def find_logo_file(logos_dir: Path, school_name: str, spec: Optional[Dict] = None) -> Optional[Path]:
+    """
+    Resolve the logo for a school: explicit mapping (exact, then case-folded),
+    then pinyin / initials (logo_pinyin_index.json next to the mapping), then
+    file-name substring, then all name tokens. Prefers svg, then png, then jpg.
+    Lookups go through an in-memory index rebuilt only when its inputs change.
+    """
+    spec = TEMPLATE_SPEC if spec is None else spec
+    logo_map_path = Path(spec.get('logo_mapping', Path(__file__).parent / 'logo_mapping.json'))
+    pinyin_path = Path(spec.get('logo_pinyin_index', logo_map_path.with_name('logo_pinyin_index.json')))
+    return get_logo_index(logos_dir, logo_map_path, pinyin_path).lookup(school_name)
 
-def replace_first_image_with_logo(doc: Document, logo_path: Path) -> bool:
+def replace_first_image_with_logo(doc: Document, logo_path: Path, spec: Optional[Dict] = None,
+                                  timings: Optional[Dict[str, float]] = None) -> bool:
     """
     Replace the blob of the first image relationship found in the document with the logo bytes.
+    SVG rasterization time is added to timings['rasterization'] when timings is given.
     Returns True on success.
     """
     from docx.shared import Emu
 
+    spec = TEMPLATE_SPEC if spec is None else spec
+
     # First attempt: replace bytes on first image part found in package
     try:
         with open(logo_path, 'rb') as f:
@@ -173,53 +210,190 @@ def replace_first_image_with_logo(doc: Document, logo_path: Path) -> bool:
 
                 # insert new picture in this run with same size if available
                 try:
-                    # If logo is SVG, rasterize it to temp PNG with desired pixel size
-                    tmp_to_remove = None
+                    # If logo is SVG, rasterize it (through the shared raster cache) at the desired pixel size
+                    logo_to_use = str(logo_path)
                     if logo_path.suffix.lower() == '.svg':
                         try:
-                            import cairosvg
-                            # convert EMU to px for rasterization (1 inch = 914400 EMU)
                             # Use higher DPI (300) and scale factor (3x) for crisp logos when zoomed in PDF
-                            scale_factor = 3.0  # 3x scale for high-quality rendering
-                            px_w = round(emu_to_px(cx, dpi=300) * scale_factor) if cx else None
-                            px_h = round(emu_to_px(cy, dpi=300) * scale_factor) if cy else None
-                            tmp_png = Path.cwd() / f".tmp_logo_{os.getpid()}.png"
-                            if px_w and px_h:
-                                cairosvg.svg2png(url=str(logo_path), write_to=str(tmp_png), output_width=px_w, output_height=px_h)
-                            elif px_w:
-                                cairosvg.svg2png(url=str(logo_path), write_to=str(tmp_png), output_width=px_w)
-                            else:
-                                cairosvg.svg2png(url=str(logo_path), write_to=str(tmp_png))
-                            logo_to_use = tmp_png
-                            tmp_to_remove = tmp_png
+                            logo_spec = spec.get('logo', {})
+                            with stage_timer(timings, 'rasterization'):
+                                png = get_raster_cache().get_png(
+                                    logo_path, cx, cy,
+                                    dpi=logo_spec.get('dpi', 300),
+                                    scale=logo_spec.get('scale_factor', 3.0),
+                                )
+                            logo_to_use = io.BytesIO(png)
                         except Exception:
                             # fallback to using original path
-                            logo_to_use = logo_path
-                    else:
-                        logo_to_use = logo_path
+                            logo_to_use = str(logo_path)
 
                     if cx and cy:
-                        run.add_picture(str(logo_to_use), width=Emu(cx), height=Emu(cy))
+                        run.add_picture(logo_to_use, width=Emu(cx), height=Emu(cy))
                     else:
-                        run.add_picture(str(logo_to_use))
-                    if tmp_to_remove and tmp_to_remove.exists():
-                        try:
-                            tmp_to_remove.unlink()
-                        except Exception:
-                            pass
+                        run.add_picture(logo_to_use)
                     return True
                 except Exception:
                     # insertion failed; try next run
                     continue
     return False
 
-def replace_placeholders(doc: Document, mapping: Dict[str, str]) -> int:
+DEFAULT_KEYS_PRIORITY = ['学生姓名', '申请专业', '本科院校', '毕业专业', '联系方式', '邮箱']
+DEFAULT_PLACEHOLDER_CHARS = ['×', 'X']
+
+# Character clues identifying each field in a "label：value" line (label side)
+LABEL_CLUES: Dict[str, List[str]] = {
+    '学生姓名': ['学', '名'],
+    '申请专业': ['专', '业'],
+    '本科院校': ['院', '校'],
+    '毕业专业': ['毕', '业'],
+    '联系方式': ['联', '系'],
+    '邮箱': ['邮'],
+}
+
+# Character clues identifying each field from the whole paragraph text
+CONTEXT_CLUES: Dict[str, List[str]] = {
+    '学生姓名': ['姓', '名'],
+    '申请专业': ['申'],
+    '本科院校': ['院', '校'],
+    '毕业专业': ['毕'],
+    '联系方式': ['联'],
+    '邮箱': ['邮'],
+}
+
+
+def label_candidate_keys(label: str, keys_priority: List[str]) -> List[str]:
+    """Keys (in priority order) whose label clues all appear in the label text."""
+    return [k for k in keys_priority if k in LABEL_CLUES and all(ch in label for ch in LABEL_CLUES[k])]
+
+
+def context_candidate_keys(text: str, keys_priority: List[str]) -> List[str]:
+    """Keys (in priority order) whose context clues all appear in the paragraph text."""
+    return [k for k in keys_priority if k in CONTEXT_CLUES and all(ch in text for ch in CONTEXT_CLUES[k])]
+
+
+def match_label_key(label: str, mapping: Dict[str, str], keys_priority: List[str]) -> Optional[str]:
+    """Return the first provided field whose label clues match, e.g. '学  生  姓  名' -> '学生姓名'."""
+    for key in label_candidate_keys(label, keys_priority):
+        if key in mapping:
+            return key
+    return None
+
+
+def match_context_key(text: str, mapping: Dict[str, str], keys_priority: List[str]) -> str:
+    """Pick a field for a stray placeholder from paragraph context, falling back to the first field."""
+    for key in context_candidate_keys(text, keys_priority):
+        if key in mapping:
+            return key
+    return next(iter(mapping.keys()))
+
+
+def header_university(mapping: Dict[str, str]) -> str:
+    """University short name for the '××大学××学院' header (without the trailing '大学')."""
+    uni_full = mapping.get('本科院校', mapping.get('学校', '清华大学'))
+    return uni_full[:-2] if uni_full.endswith('大学') else uni_full
+
+
+def header_department(mapping: Dict[str, str]) -> str:
+    """Department name for the '××大学××学院' header, derived from the major."""
+    return mapping.get('申请专业', mapping.get('毕业专业', '计算机科学与技术'))
+
+
+@dataclass(frozen=True)
+class ParagraphPlan:
+    """Per-paragraph facts that only depend on the template, resolved once by compile_placeholders."""
+    index: int
+    text: str
+    sep: str  # '' when the paragraph is not a "label：value" line
+    left: str
+    right: str
+    label_keys: Tuple[str, ...]  # fields whose label clues match, in priority order
+    context_keys: Tuple[str, ...]  # fields whose context clues match, in priority order
+    is_header: bool  # "××大学××学院" style paragraph
+    uni_idx: Optional[int]
+    coll_idx: Optional[int]
+
+
+@dataclass(frozen=True)
+class CompiledPlaceholders:
+    keys_priority: Tuple[str, ...]
+    placeholder_chars: Tuple[str, ...]
+    plans: Tuple[ParagraphPlan, ...]
+
+    def bind(self, doc: Document):
+        """Pair each plan with its paragraph in `doc` (a clone of the compiled template)."""
+        p_elems = doc.element.body.findall(qn('w:p'))
+        return [(Paragraph(p_elems[plan.index], doc._body), plan) for plan in self.plans]
+
+
+def placeholder_spec_key(spec: Optional[Dict] = None) -> Tuple:
+    """Cache key for compiled placeholders: the spec settings compile_placeholders depends on."""
+    spec = TEMPLATE_SPEC if spec is None else spec
+    return (
+        'placeholders',
+        tuple(spec.get('keys_priority', DEFAULT_KEYS_PRIORITY)),
+        tuple(spec.get('placeholder_chars', DEFAULT_PLACEHOLDER_CHARS)),
+    )
+
+
+def compile_placeholders(doc: Document, spec: Optional[Dict] = None) -> CompiledPlaceholders:
+    """
+    Resolve, once per template, which paragraphs hold placeholders and which fields
+    their labels can map to. Paragraphs without placeholders are left out, so
+    replace_placeholders only visits the nodes it may change. Read-only on `doc`.
+    """
+    spec = TEMPLATE_SPEC if spec is None else spec
+    keys_priority = list(spec.get('keys_priority', DEFAULT_KEYS_PRIORITY))
+    placeholder_chars = list(spec.get('placeholder_chars', DEFAULT_PLACEHOLDER_CHARS))
+    plans: List[ParagraphPlan] = []
+    for index, paragraph in enumerate(doc.paragraphs):
+        text = paragraph.text or ''
+        sep = left = right = ''
+        label_keys: Tuple[str, ...] = ()
+        if '：' in text or ':' in text:
+            sep = '：' if '：' in text else ':'
+            left, right = text.split(sep, 1)
+            label_keys = tuple(label_candidate_keys(left.strip(), keys_priority))
+        has_placeholder = any(pc in text for pc in placeholder_chars)
+        if not label_keys and not has_placeholder:
+            continue
+        is_header = '大学' in text and '学院' in text and has_placeholder
+        uni_idx = coll_idx = None
+        if is_header:
+            for i, r in enumerate(paragraph.runs):
+                if r.text == '大学':
+                    uni_idx = i
+                if r.text == '学院':
+                    coll_idx = i
+        plans.append(ParagraphPlan(
+            index=index,
+            text=text,
+            sep=sep,
+            left=left,
+            right=right,
+            label_keys=label_keys,
+            context_keys=tuple(context_candidate_keys(text, keys_priority)),
+            is_header=is_header,
+            uni_idx=uni_idx,
+            coll_idx=coll_idx,
+        ))
+    return CompiledPlaceholders(tuple(keys_priority), tuple(placeholder_chars), tuple(plans))
+
+
+def replace_placeholders(doc: Document, mapping: Dict[str, str],
+                         compiled: Optional[CompiledPlaceholders] = None,
+                         spec: Optional[Dict] = None) -> int:
     """
     Replace placeholders in 'label: value' style and simple tokens.
     mapping: { '学生姓名': '张三', '申请专业': '计算机' }
+    compiled: placeholder plan of the template `doc` was cloned from; compiled on the fly if omitted.
+    spec: template spec (table layout); defaults to TEMPLATE_SPEC.
     Returns number of replacements made.
     """
     replaced = 0
+    spec = TEMPLATE_SPEC if spec is None else spec
+    table_spec = spec.get('table', {})
+    if compiled is None:
+        compiled = compile_placeholders(doc, spec)
 
     # Helper to copy font properties from one run to another
     def copy_font_props(src_run, dst_run):
@@ -234,9 +408,8 @@ def replace_placeholders(doc: Document, mapping: Dict[str, str]) -> int:
         except Exception:
             pass
 
-    # Load keys priority and placeholder chars from spec if provided
-    keys_priority = TEMPLATE_SPEC.get('keys_priority', ['学生姓名', '申请专业', '本科院校', '毕业专业', '联系方式', '邮箱'])
-    placeholder_chars = TEMPLATE_SPEC.get('placeholder_chars', ['×', 'X'])
+    # Placeholder chars from spec (as captured when the template was compiled)
+    placeholder_chars = list(compiled.placeholder_chars)
     placeholder_set = set(placeholder_chars)
 
     def _align_from_str(s: str):
@@ -251,8 +424,8 @@ def replace_placeholders(doc: Document, mapping: Dict[str, str]) -> int:
             return WD_PARAGRAPH_ALIGNMENT.CENTER
         return None
 
-    for paragraph in doc.paragraphs:
-        paragraph_text = paragraph.text or ''
+    # only paragraphs that can hold placeholders are visited
+    for paragraph, plan in compiled.bind(doc):
         modified_run_ids = set()
         def clear_adjacent_placeholder_runs(runs, idx):
             # clear following runs that contain only placeholder characters (e.g. × or X)
@@ -265,39 +438,11 @@ def replace_placeholders(doc: Document, mapping: Dict[str, str]) -> int:
                     break
 
         # 1) Handle label: value lines (e.g. "学  生  姓  名  ：   ×××")
-        if '：' in paragraph_text or ':' in paragraph_text:
-            if '：' in paragraph_text:
-                left, right = paragraph_text.split('：', 1)
-                sep = '：'
-            else:
-                left, right = paragraph_text.split(':', 1)
-                sep = ':'
-            label = left.strip()
-
-            # Find which key this label corresponds to by checking known labels in runs
-            matched_key = None
-            # simple heuristics: check runs for label tokens
-            for key in keys_priority:
-                if key in mapping:
-                    # check a few common Chinese label forms
-                    if key == '学生姓名' and ('学' in label and '名' in label):
-                        matched_key = key
-                        break
-                    if key == '申请专业' and '专' in label and '业' in label:
-                        matched_key = key
-                        break
-                    if key == '本科院校' and ('院' in label and '校' in label):
-                        matched_key = key
-                        break
-                    if key == '毕业专业' and '毕' in label and '业' in label:
-                        matched_key = key
-                        break
-                    if key == '联系方式' and '联' in label and '系' in label:
-                        matched_key = key
-                        break
-                    if key == '邮箱' and '邮' in label:
-                        matched_key = key
-                        break
+        if plan.sep:
+            left, right, sep = plan.left, plan.right, plan.sep
+
+            # Find which key this label corresponds to (label clues resolved at compile time)
+            matched_key = next((k for k in plan.label_keys if k in mapping), None)
 
             # If matched, replace only the run(s) that contain × or the right-hand side
             if matched_key:
@@ -317,8 +462,8 @@ def replace_placeholders(doc: Document, mapping: Dict[str, str]) -> int:
                 try:
                     table.allow_autofit = False
                     # left/right column widths from template spec if provided
-                    left_w = TEMPLATE_SPEC.get('table', {}).get('left_col_width_in', 2.2)
-                    right_w = TEMPLATE_SPEC.get('table', {}).get('right_col_width_in', 4.0)
+                    left_w = table_spec.get('left_col_width_in', 2.2)
+                    right_w = table_spec.get('right_col_width_in', 4.0)
                     table.columns[0].width = Inches(left_w)
                     table.columns[1].width = Inches(right_w)
                     # set vertical alignment center for both cells
@@ -356,7 +501,7 @@ def replace_placeholders(doc: Document, mapping: Dict[str, str]) -> int:
                 left_para = left_cell.paragraphs[0]
                 left_para.text = left + sep
                 # right-align label so its visual center aligns with cell middle (configurable)
-                left_align = TEMPLATE_SPEC.get('table', {}).get('left_cell_alignment', 'right')
+                left_align = table_spec.get('left_cell_alignment', 'right')
                 try:
                     la = _align_from_str(left_align)
                     if la is not None:
@@ -375,7 +520,7 @@ def replace_placeholders(doc: Document, mapping: Dict[str, str]) -> int:
                 right_para = right_cell.paragraphs[0]
                 right_para.text = mapping[matched_key]
                 # align value inside right cell per spec (e.g., center)
-                right_align = TEMPLATE_SPEC.get('table', {}).get('right_cell_alignment', 'center')
+                right_align = table_spec.get('right_cell_alignment', 'center')
                 try:
                     ra = _align_from_str(right_align)
                     if ra is not None:
@@ -397,7 +542,7 @@ def replace_placeholders(doc: Document, mapping: Dict[str, str]) -> int:
                     # fallback: if insertion fails, just replace in-place
                     for i, run in enumerate(runs):
                         rt = run.text or ''
-                    if any(pc in rt for pc in placeholder_chars) or right.strip() in rt:
+                        if any(pc in rt for pc in placeholder_chars) or right.strip() in rt:
                             leading_ws = rt[:len(rt) - len(rt.lstrip())] if rt else ''
                             run.text = leading_ws + mapping[matched_key]
                             modified_run_ids.add(id(run))
@@ -408,25 +553,17 @@ def replace_placeholders(doc: Document, mapping: Dict[str, str]) -> int:
                 continue
 
         # 2) Handle header like "××大学××学院" where runs are split (××, 大学, ××, 学院)
-        if '大学' in paragraph_text and '学院' in paragraph_text and any(pc in paragraph_text for pc in placeholder_chars):
-            # find runs for the pattern and replace only the × runs
+        if plan.is_header:
+            # replace only the × runs; indices of the '大学' and '学院' runs were found at compile time
             runs = paragraph.runs
-            # find index of first '大学' run and '学院' run if present
-            uni_idx = None
-            coll_idx = None
-            for i, r in enumerate(runs):
-                if r.text == '大学':
-                    uni_idx = i
-                if r.text == '学院':
-                    coll_idx = i
+            uni_idx = plan.uni_idx
+            coll_idx = plan.coll_idx
             # Replace run before '大学' (if contains ×) with university short name (no trailing '大学')
             if uni_idx is not None and uni_idx > 0:
                 candidate = runs[uni_idx - 1]
                 if any(pc in (candidate.text or '') for pc in placeholder_chars) and id(candidate) not in modified_run_ids:
-                    uni_full = mapping.get('本科院校', mapping.get('学校', '清华大学'))
-                    # remove trailing '大学' to avoid duplication because the next run is '大学'
-                    uni_short = uni_full[:-2] if uni_full.endswith('大学') else uni_full
-                    candidate.text = uni_short
+                    # short name without trailing '大学' to avoid duplication because the next run is '大学'
+                    candidate.text = header_university(mapping)
                     modified_run_ids.add(id(candidate))
                     replaced += 1
                     # clear any adjacent placeholder runs (e.g., duplicates)
@@ -435,9 +572,8 @@ def replace_placeholders(doc: Document, mapping: Dict[str, str]) -> int:
             if coll_idx is not None and coll_idx > 0:
                 candidate = runs[coll_idx - 1]
                 if any(pc in (candidate.text or '') for pc in placeholder_chars) and id(candidate) not in modified_run_ids:
-                    dept = mapping.get('申请专业', mapping.get('毕业专业', '计算机科学与技术'))
                     # keep only the department name (append nothing, since next run is '学院')
-                    candidate.text = dept
+                    candidate.text = header_department(mapping)
                     modified_run_ids.add(id(candidate))
                     replaced += 1
                     clear_adjacent_placeholder_runs(runs, coll_idx - 1)
@@ -448,32 +584,8 @@ def replace_placeholders(doc: Document, mapping: Dict[str, str]) -> int:
             if any(pc in rt for pc in placeholder_chars):
                 if id(run) in modified_run_ids:
                     continue
-                # find best key by paragraph context
-                chosen_key = None
-                for key in keys_priority:
-                    if key in mapping:
-                        # context clues
-                        if key == '学生姓名' and '姓' in paragraph_text and '名' in paragraph_text:
-                            chosen_key = key
-                            break
-                        if key == '申请专业' and '申' in paragraph_text:
-                            chosen_key = key
-                            break
-                        if key == '本科院校' and '院' in paragraph_text and '校' in paragraph_text:
-                            chosen_key = key
-                            break
-                        if key == '毕业专业' and '毕' in paragraph_text:
-                            chosen_key = key
-                            break
-                        if key == '联系方式' and '联' in paragraph_text:
-                            chosen_key = key
-                            break
-                        if key == '邮箱' and '邮' in paragraph_text:
-                            chosen_key = key
-                            break
-                if not chosen_key:
-                    # fallback: pick first available mapping
-                    chosen_key = next(iter(mapping.keys()))
+                # find best key by paragraph context, falling back to the first available mapping
+                chosen_key = next((k for k in plan.context_keys if k in mapping), None) or next(iter(mapping.keys()))
                 # preserve leading whitespace, then set mapping value
                 leading_ws = rt[:len(rt) - len(rt.lstrip())] if rt else ''
                 run.text = leading_ws + mapping.get(chosen_key, '')
@@ -487,7 +599,11 @@ def replace_placeholders(doc: Document, mapping: Dict[str, str]) -> int:
 def convert_docx_to_pdf(docx_path: Path, out_pdf: Path) -> bool:
     """
     Try to convert using LibreOffice (soffice). Returns True if pdf created.
+    Uses the long-lived worker pool when the service has started one.
     """
+    pool = get_pool()
+    if pool is not None:
+        return pool.convert(docx_path, out_pdf)
     if not shutil.which('soffice'):
         print("LibreOffice (soffice) not found; skipping PDF conversion.")
         return False
@@ -507,6 +623,247 @@ def convert_docx_to_pdf(docx_path: Path, out_pdf: Path) -> bool:
         print("LibreOffice conversion failed:", e)
     return False
 
+def fill_cover_document(template: Path, spec: Dict, logo: Optional[Path], fields: Dict[str, str],
+                        timings: Optional[Dict[str, float]] = None):
+    """
+    Clone the cached template and apply the logo and field values.
+    Returns (document, number of placeholders replaced).
+    """
+    with stage_timer(timings, 'docx_load'):
+        # parsed once per template content and cloned per call
+        compiled_template = get_compiled_template(template)
+        doc = compiled_template.instantiate()
+    if logo:
+        with stage_timer(timings, 'logo_replace'):
+            replace_first_image_with_logo(doc, logo, spec, timings)
+    with stage_timer(timings, 'placeholder_replacement'):
+        placeholders_plan = compiled_template.artifact(
+            placeholder_spec_key(spec), lambda master: compile_placeholders(master, spec))
+        replaced = replace_placeholders(doc, fields, placeholders_plan, spec)
+    return doc, replaced
+
+
+def docx_to_pdf_bytes(docx: bytes) -> bytes:
+    """Convert DOCX bytes to PDF bytes (soffice pool if running, else a one-off soffice)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        docx_path = Path(tmp) / 'cover.docx'
+        pdf_path = Path(tmp) / 'cover.pdf'
+        docx_path.write_bytes(docx)
+        if not convert_docx_to_pdf(docx_path, pdf_path) or not pdf_path.exists():
+            raise RuntimeError("PDF conversion failed")
+        return pdf_path.read_bytes()
+
+
+# Fields the "××大学××学院" header shows shortened (header_university). In the patch
+# skeleton their sentinel carries this suffix wherever the full value is written.
+UNIVERSITY_KEYS = ('本科院校', '学校')
+UNIVERSITY_SUFFIX = '大学'
+
+# compiled patch plans kept across all templates (least recently used dropped first)
+MAX_PATCH_PLANS = 32
+
+
+@dataclass(frozen=True)
+class CoverPatchPlan:
+    """Everything assemble_cover_docx needs to write a cover without python-docx."""
+    package: ZipTemplate
+    document_part: str  # ZIP member of the main document
+    document: XmlSkeleton
+    keys: Tuple[str, ...]
+    logo_part: Optional[str]  # ZIP member replace_first_image_with_logo swaps, if any
+
+    def fill_document(self, fields: Dict[str, str]) -> bytes:
+        def render(slot: int, full: bool) -> str:
+            key = self.keys[slot]
+            value = fields[key]
+            if key in UNIVERSITY_KEYS and not full:
+                return header_university({key: value})
+            return value
+        return self.document.fill(render)
+
+
+def patchable_fields(fields: Dict[str, str]) -> bool:
+    """Whether the patch skeleton reproduces python-docx output for these values exactly."""
+    for key, value in fields.items():
+        if not isinstance(value, str) or not plain_text_value(value):
+            return False
+        if key in UNIVERSITY_KEYS and not header_university({key: value}):
+            return False
+    return True
+
+
+def patch_keys(fields: Dict[str, str], keys_priority: Tuple[str, ...]) -> Optional[Tuple[str, ...]]:
+    """
+    The field keys a patch plan is compiled for: the first field (stray placeholders
+    fall back to it) followed by the others in keys_priority order, so only the key
+    set and the first key pick a plan. None when a key is outside keys_priority.
+    """
+    if not fields or not set(fields) <= set(keys_priority):
+        return None
+    first = next(iter(fields))
+    return (first,) + tuple(k for k in keys_priority if k in fields and k != first)
+
+
+def template_package(compiled_template, template: Path) -> Optional[ZipTemplate]:
+    """The template split into raw ZIP members, once per compiled template."""
+    def build(_master) -> Optional[ZipTemplate]:
+        data = template.read_bytes()
+        if hashlib.sha256(data).hexdigest() != compiled_template.sha256:
+            # the file changed after it was compiled; the next call recompiles
+            return None
+        try:
+            return ZipTemplate(data)
+        except ValueError as e:
+            print(f"DOCX patching disabled for {template.name}: {e}")
+            return None
+    return compiled_template.artifact('docx_package', build)
+
+
+def compile_cover_patch(compiled_template, template: Path, spec: Dict, placeholders_plan: CompiledPlaceholders,
+                        keys: Tuple[str, ...]) -> Optional[CoverPatchPlan]:
+    """
+    Build the patch plan of one template / spec / field-key sequence (see patch_keys):
+    run the regular replacement once with sentinel values and cut the serialized
+    document at the sentinels. None when the template cannot be patched at the ZIP level.
+    """
+    package = template_package(compiled_template, template)
+    if package is None:
+        return None
+
+    doc = compiled_template.instantiate()
+    document_part = doc.part.partname.lstrip('/')
+    logo_part = None
+    for rel in doc.part.rels.values():
+        if rel.is_external:
+            continue
+        if (getattr(rel.target_part, 'content_type', '') or '').startswith('image/'):
+            logo_part = rel.target_part.partname.lstrip('/')
+            break
+    if document_part not in package.names or (logo_part and logo_part not in package.names):
+        return None
+
+    sentinels = {
+        key: sentinel(i) + (UNIVERSITY_SUFFIX if key in UNIVERSITY_KEYS else '')
+        for i, key in enumerate(keys)
+    }
+    replace_placeholders(doc, sentinels, placeholders_plan, spec)
+    skeleton = XmlSkeleton(
+        doc.part.blob,
+        {i: UNIVERSITY_SUFFIX.encode('utf-8') for i, key in enumerate(keys) if key in UNIVERSITY_KEYS},
+    )
+    return CoverPatchPlan(package, document_part, skeleton, keys, logo_part)
+
+
+class PatchPlanCache:
+    """LRU of compiled patch plans (None included: the template cannot be patched)."""
+
+    def __init__(self, max_entries: int = MAX_PATCH_PLANS):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, Optional[CoverPatchPlan]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Tuple, build) -> Optional[CoverPatchPlan]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        # built without the lock (tens of ms); concurrent misses may build twice
+        plan = build()
+        with self._lock:
+            self._entries[key] = plan
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return plan
+
+
+_PATCH_PLANS = PatchPlanCache()
+
+
+def assemble_cover_docx(template: Path, spec: Dict, logo: Optional[Path], fields: Dict[str, str],
+                        timings: Optional[Dict[str, float]] = None) -> bytes:
+    """
+    DOCX bytes of a filled cover. Fast path: fill the compiled document skeleton and
+    write the package at the ZIP level (unchanged members copied verbatim, the
+    logo swapped into the template's image part). Values python-docx would not
+    write as plain text, field names outside the spec's keys_priority, and
+    templates that cannot be patched take the python-docx path
+    (fill_cover_document + save).
+    """
+    plan = None
+    with stage_timer(timings, 'docx_load'):
+        compiled_template = get_compiled_template(template)
+        placeholders_plan = compiled_template.artifact(
+            placeholder_spec_key(spec), lambda master: compile_placeholders(master, spec))
+        keys = patch_keys(fields, placeholders_plan.keys_priority)
+        if keys is not None and patchable_fields(fields):
+            patch_key = (compiled_template.sha256, placeholder_spec_key(spec),
+                         json.dumps(spec.get('table', {}), sort_keys=True), keys)
+            plan = _PATCH_PLANS.get(
+                patch_key, lambda: compile_cover_patch(compiled_template, template, spec, placeholders_plan, keys))
+
+    if plan is not None and (logo is None or plan.logo_part):
+        replacements = {}
+        if logo:
+            with stage_timer(timings, 'logo_replace'):
+                # same bytes replace_first_image_with_logo puts into the first image part
+                replacements[plan.logo_part] = (logo.read_bytes(), False)
+        with stage_timer(timings, 'placeholder_replacement'):
+            replacements[plan.document_part] = (plan.fill_document(fields), True)
+        with stage_timer(timings, 'docx_save'):
+            return plan.package.build(replacements)
+
+    doc, _ = fill_cover_document(template, spec, logo, fields, timings)
+    with stage_timer(timings, 'docx_save'):
+        buf = io.BytesIO()
+        doc.save(buf)
+    return buf.getvalue()
+
+
+def render_cover(template: Path, spec: Dict, logo: Optional[Path], fields: Dict[str, str],
+                 engine: str = 'docx', fmt: str = 'pdf',
+                 timings: Optional[Dict[str, float]] = None) -> bytes:
+    """
+    Render one cover and return its bytes. Reentrant: everything it needs is an argument.
+
+    template: DOCX template path
+    spec: template spec dict (see template_spec.json); {} for defaults
+    logo: resolved logo file (find_logo_file), or None to keep the template image
+    fields: placeholder values; the spec defaults are used when empty
+    engine: 'docx' (python-docx + LibreOffice) or 'native' (reportlab, PDF only)
+    fmt: 'pdf' or 'docx'
+    timings: optional dict that receives seconds per stage (docx_load, rasterization,
+             placeholder_replacement, docx_save, soffice_conversion, native_render, ...)
+    """
+    spec = spec or {}
+    fields = fields or spec.get('defaults', DEFAULT_FIELDS)
+    if engine == 'native' and fmt == 'pdf':
+        from native_cover import extract_layout, render_native_pdf
+        with stage_timer(timings, 'docx_load'):
+            layout = get_compiled_template(template).artifact('native_layout', extract_layout)
+        with stage_timer(timings, 'native_render'), tempfile.TemporaryDirectory() as tmp:
+            out_pdf = Path(tmp) / 'cover.pdf'
+            if not render_native_pdf(layout, logo, fields, out_pdf, spec):
+                raise RuntimeError("Native PDF rendering failed")
+            return out_pdf.read_bytes()
+
+    docx = assemble_cover_docx(template, spec, logo, fields, timings)
+    if fmt == 'docx':
+        return docx
+    with stage_timer(timings, 'soffice_conversion'):
+        return docx_to_pdf_bytes(docx)
+
+
+def render_cover_timed(*args, **kwargs) -> Tuple[bytes, Dict[str, float]]:
+    """render_cover that also returns its stage timings (for process-pool callers)."""
+    timings: Dict[str, float] = {}
+    data = render_cover(*args, timings=timings, **kwargs)
+    return data, timings
+
+
 def main(argv: List[str]):
     parser = argparse.ArgumentParser()
     parser.add_argument('--template', required=True, help='Path to DOCX template')
@@ -515,6 +872,8 @@ def main(argv: List[str]):
     parser.add_argument('--output', required=True, help='Output PDF path (or .docx)')
     parser.add_argument('--fields', help='JSON string with mapping of placeholders to values')
     parser.add_argument('--spec', help='Path to template spec JSON (optional)')
+    parser.add_argument('--engine', choices=['docx', 'native'], default='docx',
+                        help='docx: python-docx + LibreOffice; native: draw the PDF directly with reportlab')
     args = parser.parse_args(argv)
 
     template = Path(args.template)
@@ -526,13 +885,9 @@ def main(argv: List[str]):
         spec_path = Path(args.spec)
     else:
         spec_path = Path(__file__).parent / 'template_spec.json'
-    try:
-        if spec_path and spec_path.exists():
-            global TEMPLATE_SPEC
-            TEMPLATE_SPEC = json.loads(spec_path.read_text(encoding='utf-8'))
-            print("Loaded template spec from", spec_path)
-    except Exception as e:
-        print("Failed to load template spec:", e)
+    spec = load_spec(spec_path)
+    if spec:
+        print("Loaded template spec from", spec_path)
 
     if not template.exists():
         print("Template not found:", template)
@@ -552,30 +907,30 @@ def main(argv: List[str]):
 
     # If no fields provided or empty, use default test data from spec (if available)
     if not mapping:
-        mapping = TEMPLATE_SPEC.get('defaults', {
-            "学生姓名": "王小明",
-            "申请专业": "计算机科学与技术",
-            "本科院校": "北京大学",
-            "毕业专业": "软件工程",
-            "联系方式": "138-0000-0000",
-            "邮箱": "wangxiaoming@pku.edu.cn"
-        })
+        mapping = spec.get('defaults', DEFAULT_FIELDS)
         print("Using default test data for placeholders")
 
-    logo_file = find_logo_file(logos_dir, school)
+    logo_file = find_logo_file(logos_dir, school, spec)
     if not logo_file:
         print("Logo file not found for school:", school)
         # continue but warn
     else:
         print("Using logo:", logo_file)
 
-    doc = Document(str(template))
-
-    if logo_file:
-        ok = replace_first_image_with_logo(doc, logo_file)
-        print("Logo replace:", ok)
+    if args.engine == 'native':
+        if output.suffix.lower() == '.pdf':
+            try:
+                pdf = render_cover(template, spec, logo_file, mapping, engine='native')
+            except Exception as e:
+                print("Native PDF rendering failed:", e)
+                return 1
+            output.parent.mkdir(parents=True, exist_ok=True)
+            output.write_bytes(pdf)
+            print("Saved PDF to", output)
+            return 0
+        print("Native engine only renders PDF; falling back to docx engine for", output)
 
-    replaced = replace_placeholders(doc, mapping)
+    doc, replaced = fill_cover_document(template, spec, logo_file, mapping)
     print("Placeholders replaced:", replaced)
 
     out_docx = output.with_suffix('.docx') if output.suffix.lower() != '.docx' else output
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Incremental parser for a JSON array that arrives in chunks (LLM streaming output).
+
+JsonArrayStreamParser.feed() returns every top-level array element that became
+complete with the new chunk, so /parse/stream can emit each {label, category}
+object as soon as its closing brace arrives instead of waiting for the whole
+completion. Text before the opening '[' (```json fences, prose) is ignored.
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, List
+
+
+class JsonArrayStreamParser:
+    def __init__(self):
+        self._text = ''
+        self._pos = 0           # next character to scan
+        self._depth = 0         # nesting depth, 1 == inside the top-level array
+        self._in_string = False
+        self._escape = False
+        self._item_start = -1   # start of the element being scanned, -1 if none
+        self.done = False       # top-level array closed
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far (for a non-incremental fallback parse)."""
+        return self._text
+
+    def feed(self, chunk: str) -> List[Any]:
+        self._text += chunk
+        items: List[Any] = []
+        text = self._text
+        i = self._pos
+        n = len(text)
+        while i < n and not self.done:
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == '\\':
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif self._depth == 0:
+                # before the array: skip fences / prose until '['
+                if ch == '[':
+                    self._depth = 1
+            elif ch == '"':
+                self._in_string = True
+            elif ch in '[{':
+                if self._depth == 1:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in ']}':
+                self._depth -= 1
+                if self._depth == 1 and self._item_start >= 0:
+                    try:
+                        items.append(json.loads(text[self._item_start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._item_start = -1
+                elif self._depth == 0:
+                    self.done = True
+            i += 1
+        self._pos = i
+        return items
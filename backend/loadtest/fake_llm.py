@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+OpenAI-compatible stand-in for load tests (POST /v1/chat/completions).
+
+Responds after a configurable latency (mean +- uniform jitter). Content comes
+from, in order:
+
+ 1. a responses file (JSON Lines), each line one of
+      {"prompt_sha256": "<sha256 of the user message>", "content": "..."}   (recorded)
+      {"contains": "<substring of the user message>", "content": "..."}     (canned)
+ 2. built-in canned answers: a material list for /parse prompts and, for /match
+    prompts, one candidate per required item taken from the listed files.
+
+stream=true is answered as Server-Sent Events chunks spread over the latency.
+
+Usage (from backend/):
+  python loadtest/fake_llm.py --port 9100 --latency-ms 800 --jitter-ms 200 [--responses recorded.jsonl]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CANNED_PARSE = [
+    {"label": "本科成绩单", "category": "transcript"},
+    {"label": "外语水平证明（CET-6/托福/雅思）", "category": "english"},
+    {"label": "个人陈述", "category": "personal"},
+    {"label": "推荐信", "category": "recommendation"},
+    {"label": "报名表", "category": "application_form"},
+]
+
+STREAM_CHUNK_CHARS = 16
+
+
+def load_responses(path: Optional[Path]) -> List[Dict]:
+    if not path:
+        return []
+    rules = []
+    for line in path.read_text(encoding='utf-8').splitlines():
+        if line.strip():
+            rules.append(json.loads(line))
+    return rules
+
+
+def _json_after(prompt: str, marker: str):
+    """The JSON value on the line after `marker` in a /match prompt, or None."""
+    start = prompt.find(marker)
+    if start < 0:
+        return None
+    line = prompt[start + len(marker):].lstrip('\n').split('\n', 1)[0]
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+def canned_content(system: str, prompt: str) -> str:
+    if 'Required Items:' in prompt:
+        items = _json_after(prompt, 'Required Items:') or []
+        files = _json_after(prompt, 'Available Files:') or []
+        matches = []
+        for i, item in enumerate(items):
+            candidates = []
+            if files:
+                f = files[i % len(files)]
+                candidates.append({"id": f.get("id"), "score": 80, "reason": "Category match (fake)"})
+            matches.append({"item_label": item.get("label"), "candidates": candidates})
+        return json.dumps({"matches": matches}, ensure_ascii=False)
+    return json.dumps(CANNED_PARSE, ensure_ascii=False)
+
+
+def create_app(latency_ms: float = 800, jitter_ms: float = 200, responses: Optional[List[Dict]] = None) -> FastAPI:
+    app = FastAPI(title="Fake LLM")
+    rules = responses or []
+    stats = {"requests": 0, "streams": 0}
+
+    def pick_content(system: str, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        for rule in rules:
+            if rule.get('prompt_sha256') == digest or (rule.get('contains') and rule['contains'] in prompt):
+                return rule['content']
+        return canned_content(system, prompt)
+
+    def delay() -> float:
+        return max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000.0
+
+    @app.get("/health")
+    def health():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages") or []
+        system = next((m.get("content", "") for m in messages if m.get("role") == "system"), "")
+        prompt = next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), "")
+        content = pick_content(system, prompt)
+        model = body.get("model", "fake")
+        stats["requests"] += 1
+
+        if body.get("stream"):
+            stats["streams"] += 1
+            chunks = [content[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(content), STREAM_CHUNK_CHARS)]
+            per_chunk = delay() / max(1, len(chunks))
+
+            async def events():
+                for chunk in chunks:
+                    await asyncio.sleep(per_chunk)
+                    data = {
+                        "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": int(time.time()),
+                        "model": model,
+                        "choices": [{"index": 0, "delta": {"content": chunk}, "finish_reason": None}],
+                    }
+                    yield f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+                yield "data: [DONE]\n\n"
+
+            return StreamingResponse(events(), media_type="text/event-stream")
+
+        await asyncio.sleep(delay())
+        return JSONResponse(content={
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt), "completion_tokens": len(content), "total_tokens": len(prompt) + len(content)},
+        })
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency-ms', type=float, default=800)
+    parser.add_argument('--jitter-ms', type=float, default=200)
+    parser.add_argument('--responses', help='JSON Lines file with recorded/canned responses')
+    args = parser.parse_args(argv)
+    app = create_app(args.latency_ms, args.jitter_ms, load_responses(Path(args.responses) if args.responses else None))
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
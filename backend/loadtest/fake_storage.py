@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Supabase Storage stand-in for load tests (GET /storage/v1/object/<bucket>/<path>).
+
+Serves files from --root (laid out as <root>/<bucket>/<path>). Without --root a
+synthetic tree is generated with the assets /generate-cover downloads:
+
+  institution-assets/pdf_generate/config/word_template.docx   (benchmarks/synthetic.py cover)
+  institution-assets/pdf_generate/config/template_spec.json
+  institution-assets/pdf_generate/config/logo_mapping.json
+
+Responses carry ETag / Last-Modified and honour If-None-Match with 304, like
+the real storage API, so the service's asset cache revalidation is exercised.
+
+Usage (from backend/):
+  python loadtest/fake_storage.py --port 9200 [--root path/to/tree] [--latency-ms 20]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import sys
+import tempfile
+from email.utils import formatdate
+from pathlib import Path
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+from synthetic import make_logo_set, make_template  # noqa: E402
+
+CONFIG_PREFIX = Path('institution-assets') / 'pdf_generate' / 'config'
+
+
+def make_storage_tree(root: Path, logos: int = 200) -> Path:
+    """Write the synthetic /generate-cover assets under `root`."""
+    config = root / CONFIG_PREFIX
+    config.mkdir(parents=True, exist_ok=True)
+    make_template(config / 'word_template.docx')
+    make_logo_set(root / 'institution-assets' / 'pdf_generate' / 'school-logos', logos, config / 'logo_mapping.json')
+    (config / 'template_spec.json').write_text(json.dumps({
+        'keys_priority': ['学生姓名', '申请专业', '本科院校', '毕业专业', '联系方式', '邮箱'],
+        'placeholder_chars': ['×', 'X'],
+        'table': {'left_col_width_in': 2.2, 'right_col_width_in': 4.0},
+        'logo': {'dpi': 300, 'scale_factor': 3.0},
+    }, ensure_ascii=False), encoding='utf-8')
+    return root
+
+
+def create_app(root: Path, latency_ms: float = 0) -> FastAPI:
+    app = FastAPI(title="Fake Supabase Storage")
+    root = root.resolve()
+    stats = {"requests": 0, "not_modified": 0, "not_found": 0}
+
+    @app.get("/health")
+    def health():
+        return stats
+
+    @app.get("/storage/v1/object/{bucket}/{path:path}")
+    async def get_object(bucket: str, path: str, request: Request):
+        stats["requests"] += 1
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000.0)
+        target = (root / bucket / path).resolve()
+        if root not in target.parents or not target.is_file():
+            stats["not_found"] += 1
+            return JSONResponse(status_code=400, content={"statusCode": "404", "error": "not_found", "message": "Object not found"})
+        data = target.read_bytes()
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        headers = {"ETag": etag, "Last-Modified": formatdate(target.stat().st_mtime, usegmt=True)}
+        if request.headers.get("if-none-match") == etag:
+            stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=data, media_type="application/octet-stream", headers=headers)
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9200)
+    parser.add_argument('--root', help='storage tree (<root>/<bucket>/<path>); synthetic when omitted')
+    parser.add_argument('--latency-ms', type=float, default=0)
+    args = parser.parse_args(argv)
+    root = Path(args.root) if args.root else make_storage_tree(Path(tempfile.mkdtemp(prefix='fake-storage-')))
+    print("Serving storage tree", root)
+    uvicorn.run(create_app(root, args.latency_ms), host=args.host, port=args.port, log_level='warning')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
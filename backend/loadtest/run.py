@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the parse service.
+
+Starts the fake LLM (fake_llm.py) and fake Supabase storage (fake_storage.py),
+starts the service under uvicorn with OPENAI_BASE_URL / SUPABASE_URL pointed at
+them (and throwaway cache directories), then drives concurrent traffic and
+reports throughput and latency percentiles per endpoint.
+
+Usage (from backend/):
+  python loadtest/run.py                                   # /parse, /match, /generate-cover
+  python loadtest/run.py --endpoints parse,match --requests 500 --concurrency 50
+  python loadtest/run.py --llm-latency-ms 1500 --workers 2 --mixed --json report.json
+  python loadtest/run.py --service-url http://127.0.0.1:8000   # drive an already running service
+
+Endpoints are run one after another by default (--mixed runs them at the same
+time). /parse texts are unique per request unless --repeat-parse is given, so
+the LLM path rather than the response cache is measured.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+HERE = Path(__file__).resolve().parent
+BACKEND = HERE.parent
+
+ENDPOINTS = ('parse', 'parse-stream', 'match', 'generate-cover')
+
+NOTICE_TEMPLATE = (
+    "关于接收{year}年推荐免试研究生的通知（{tag} 批次 {n}）\n"
+    "申请材料：1. 本科成绩单（加盖教务处公章）；2. 外语水平证明（CET-6、托福或雅思成绩单复印件）；"
+    "3. 个人陈述；4. 两封专家推荐信；5. 报名表。"
+)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_process(args: List[str], env: Optional[Dict[str, str]] = None, log: Optional[Path] = None):
+    out = open(log, 'wb') if log else subprocess.DEVNULL
+    return subprocess.Popen(args, cwd=str(BACKEND), env=env, stdout=out, stderr=subprocess.STDOUT)
+
+
+def wait_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(url, timeout=2.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout:.0f}s")
+
+
+def percentile(samples: List[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+# --- request builders: (method, path, json body, headers) ---
+
+def parse_request(n: int, repeat: bool, path: str = '/parse'):
+    # texts differ per endpoint too, so /parse/stream does not hit entries cached by /parse
+    text = NOTICE_TEMPLATE.format(year=2026, tag=path, n=0 if repeat else n)
+    return 'POST', path, {'text': text}, {}
+
+
+def parse_stream_request(n: int, repeat: bool):
+    return parse_request(n, repeat, '/parse/stream')
+
+
+def match_request(n: int, materials: int, mode: str):
+    categories = ['transcript', 'english', 'personal', 'recommendation', 'application_form', 'certificate']
+    names = ['成绩单', '六级成绩', '个人陈述', '推荐信', '报名表', '获奖证书']
+    body = {
+        'items': [{'label': label, 'category': cat} for label, cat in zip(
+            ['本科成绩单', 'CET-6', '个人陈述', '专家推荐信', '报名表'], categories)],
+        'materials': [
+            {'id': f'm{n}-{i}', 'filename': f'张三_{names[i % len(names)]}_{i}.pdf',
+             'category': categories[i % len(categories)]}
+            for i in range(materials)
+        ],
+        'mode': mode,
+    }
+    return 'POST', '/match', body, {}
+
+
+def cover_request(n: int, engine: str):
+    body = {
+        'school': f'测试大学{n % 200:04d}',
+        'fields': {'学生姓名': f'学生{n}', '申请专业': '计算机科学与技术', '本科院校': '北京大学'},
+        'engine': engine,
+    }
+    return 'POST', '/generate-cover', body, {}
+
+
+async def drive(client: httpx.AsyncClient, name: str, build: Callable[[int], tuple], total: int,
+                concurrency: int) -> Dict:
+    """Send `total` requests with at most `concurrency` in flight; returns latency stats."""
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(total))
+
+    async def worker():
+        for n in counter:
+            method, path, body, headers = build(n)
+            t0 = time.perf_counter()
+            try:
+                resp = await client.request(method, path, json=body, headers=headers)
+                await resp.aread()
+                if resp.status_code >= 400:
+                    errors[str(resp.status_code)] = errors.get(str(resp.status_code), 0) + 1
+                    continue
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, total))))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'endpoint': name,
+        'requests': total,
+        'ok': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50), 1),
+        'p90_ms': round(percentile(latencies, 0.90), 1),
+        'p99_ms': round(percentile(latencies, 0.99), 1),
+        'max_ms': round(latencies[-1], 1) if latencies else 0.0,
+    }
+
+
+async def run_load(base_url: str, builders: Dict[str, Callable], total: int, concurrency: int,
+                   mixed: bool, timeout: float) -> List[Dict]:
+    limits = httpx.Limits(max_connections=concurrency * max(1, len(builders)), max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        if mixed:
+            return list(await asyncio.gather(*(
+                drive(client, name, build, total, concurrency) for name, build in builders.items())))
+        return [await drive(client, name, build, total, concurrency) for name, build in builders.items()]
+
+
+def print_report(results: List[Dict]) -> None:
+    print(f"{'endpoint':<16}{'ok/total':>11}{'rps':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}  errors")
+    for r in results:
+        errors = ', '.join(f"{k}x{v}" for k, v in r['errors'].items()) or '-'
+        print(f"{r['endpoint']:<16}{r['ok']:>5}/{r['requests']:<5}{r['throughput_rps']:>9.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p90_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}  {errors}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--endpoints', default='parse,match,generate-cover',
+                        help=f"comma-separated subset of {','.join(ENDPOINTS)}")
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=20, help='in-flight requests per endpoint')
+    parser.add_argument('--mixed', action='store_true', help='run all endpoints at the same time')
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--llm-latency-ms', type=float, default=800)
+    parser.add_argument('--llm-jitter-ms', type=float, default=200)
+    parser.add_argument('--llm-responses', help='JSON Lines responses file for the fake LLM')
+    parser.add_argument('--storage-latency-ms', type=float, default=20)
+    parser.add_argument('--storage-root', help='storage tree for the fake Supabase (synthetic when omitted)')
+    parser.add_argument('--materials', type=int, default=30, help='materials per /match request')
+    parser.add_argument('--match-mode', default='llm', help='/match mode (llm, local, hybrid, vector, rerank)')
+    parser.add_argument('--cover-engine', default='native', choices=['docx', 'native'],
+                        help='docx needs LibreOffice on this machine')
+    parser.add_argument('--repeat-parse', action='store_true', help='send the same /parse text (cache hits)')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn workers for the service')
+    parser.add_argument('--service-url', help='use a running service instead of starting one')
+    parser.add_argument('--json', help='write the report to this file')
+    parser.add_argument('--logs', help='directory for fake/service logs (default: discarded)')
+    args = parser.parse_args(argv)
+
+    selected = [e.strip() for e in args.endpoints.split(',') if e.strip()]
+    unknown = [e for e in selected if e not in ENDPOINTS]
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(unknown)}")
+    all_builders = {
+        'parse': lambda n: parse_request(n, args.repeat_parse),
+        'parse-stream': lambda n: parse_stream_request(n, args.repeat_parse),
+        'match': lambda n: match_request(n, args.materials, args.match_mode),
+        'generate-cover': lambda n: cover_request(n, args.cover_engine),
+    }
+    builders = {name: all_builders[name] for name in selected}
+
+    logs = Path(args.logs) if args.logs else None
+    if logs:
+        logs.mkdir(parents=True, exist_ok=True)
+    work = Path(tempfile.mkdtemp(prefix='baoyan-loadtest-'))
+    procs = []
+    try:
+        llm_port, storage_port = free_port(), free_port()
+        llm_cmd = [sys.executable, str(HERE / 'fake_llm.py'), '--port', str(llm_port),
+                   '--latency-ms', str(args.llm_latency_ms), '--jitter-ms', str(args.llm_jitter_ms)]
+        if args.llm_responses:
+            llm_cmd += ['--responses', args.llm_responses]
+        storage_cmd = [sys.executable, str(HERE / 'fake_storage.py'), '--port', str(storage_port),
+                       '--latency-ms', str(args.storage_latency_ms)]
+        if args.storage_root:
+            storage_cmd += ['--root', args.storage_root]
+        procs.append(start_process(llm_cmd, log=logs / 'fake_llm.log' if logs else None))
+        procs.append(start_process(storage_cmd, log=logs / 'fake_storage.log' if logs else None))
+        wait_ready(f"http://127.0.0.1:{llm_port}/health")
+        wait_ready(f"http://127.0.0.1:{storage_port}/health")
+
+        base_url = args.service_url
+        if not base_url:
+            service_port = free_port()
+            env = dict(os.environ)
+            env.update({
+                'OPENAI_BASE_URL': f"http://127.0.0.1:{llm_port}/v1",
+                'OPENAI_API_KEY': 'loadtest',
+                'SUPABASE_URL': f"http://127.0.0.1:{storage_port}",
+                'SUPABASE_SERVICE_ROLE_KEY': 'loadtest',
+                'PARSE_CACHE_PATH': str(work / 'parse-cache.sqlite3'),
+                'ASSET_CACHE_DIR': str(work / 'assets'),
+                'RASTER_CACHE_DIR': str(work / 'raster'),
+                'COVER_CACHE_DIR': str(work / 'covers'),
+                'LOGO_CACHE_DIR': str(work / 'logos'),
+            })
+            procs.append(start_process(
+                [sys.executable, '-m', 'uvicorn', 'python_parse_service:app', '--host', '127.0.0.1',
+                 '--port', str(service_port), '--workers', str(args.workers), '--log-level', 'warning'],
+                env=env, log=logs / 'service.log' if logs else None))
+            base_url = f"http://127.0.0.1:{service_port}"
+            wait_ready(base_url + '/parse/cache-stats')
+        else:
+            print(f"Using running service {base_url}; point it at OPENAI_BASE_URL=http://127.0.0.1:{llm_port}/v1 "
+                  f"and SUPABASE_URL=http://127.0.0.1:{storage_port}")
+
+        print(f"{args.requests} requests x {len(builders)} endpoint(s), concurrency {args.concurrency}"
+              f"{' (mixed)' if args.mixed else ''}, LLM latency {args.llm_latency_ms:.0f}±{args.llm_jitter_ms:.0f} ms")
+        results = asyncio.run(run_load(base_url, builders, args.requests, args.concurrency, args.mixed, args.timeout))
+        print_report(results)
+        if args.json:
+            Path(args.json).write_text(json.dumps({'args': vars(args), 'results': results}, ensure_ascii=False, indent=2),
+                                       encoding='utf-8')
+        return 0 if all(r['ok'] == r['requests'] for r in results) else 1
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            try:
+                p.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                p.kill()
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Deterministic, local scoring for /match.
+
+Applies the same category-first rules the /match prompt asks the LLM to follow:
+
+  +50  the material's category is the requirement's category
+  +30  the file name contains a synonym of the requirement (成绩单/绩点/transcript, ...)
+  +10  keyword overlap between the de-noised file name and the requirement label
+
+An item is "confident" when its best candidate reaches CONFIDENT_SCORE (category
+and synonym both agree). In hybrid mode only the remaining, ambiguous items are
+escalated to the LLM.
+"""
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from pathlib import PurePath
+from typing import Dict, List, Optional, Set, Tuple
+
+CATEGORY_SCORE = 50
+SYNONYM_SCORE = 30
+KEYWORD_SCORE = 10
+CONFIDENT_SCORE = CATEGORY_SCORE + SYNONYM_SCORE
+# candidates below this score (keyword overlap only) are not reported
+MIN_CANDIDATE_SCORE = SYNONYM_SCORE
+MAX_CANDIDATES = 5
+
+CATEGORY_SEMANTICS: Dict[str, str] = {
+    "transcript": "成绩单/绩点/排名证明",
+    "english": "外语/四六级/托福雅思",
+    "personal": "简历/个人陈述/计划书",
+    "application_form": "报名表/申请表",
+    "certificate": "获奖证书/证明",
+    "recommendation": "推荐信",
+    "identity": "身份证/学生证",
+    "paper": "论文/出版物",
+    "other": "其他材料",
+}
+
+# Synonym groups per category; a requirement matching any term of a group is
+# satisfied by file names containing any other term of the same group.
+SYNONYMS: Dict[str, List[List[str]]] = {
+    "transcript": [
+        ["成绩单", "成绩", "绩点", "gpa", "transcript"],
+        ["排名证明", "排名", "名次", "ranking", "rank"],
+    ],
+    "english": [
+        ["外语", "英语", "四级", "六级", "四六级", "cet", "cet4", "cet6", "cet-4", "cet-6",
+         "托福", "toefl", "雅思", "ielts", "gre"],
+    ],
+    "personal": [
+        ["简历", "履历", "resume", "cv"],
+        ["个人陈述", "自述", "陈述", "personal statement"],
+        ["研究计划", "计划书", "学习计划", "study plan", "research plan"],
+    ],
+    "application_form": [
+        ["报名表", "申请表", "登记表", "申请书", "application form"],
+    ],
+    "certificate": [
+        ["获奖证书", "获奖", "证书", "奖状", "荣誉", "竞赛", "award", "certificate"],
+    ],
+    "recommendation": [
+        ["推荐信", "推荐", "recommendation", "reference"],
+    ],
+    "identity": [
+        ["身份证", "学生证", "证件", "id card"],
+    ],
+    "paper": [
+        ["论文", "出版物", "期刊", "发表", "专利", "paper", "publication"],
+    ],
+}
+
+# University names carry no content signal in file names
+_UNIVERSITY_RE = re.compile(r'[\u4e00-\u9fff]{2,}(大学|学院)')
+_TOKEN_RE = re.compile(r'[a-z0-9]+|[\u4e00-\u9fff]+')
+# CJK synonym terms, longest first; a school name never contains one
+_CJK_TERMS = sorted({t for groups in SYNONYMS.values() for g in groups for t in g if not t.isascii()},
+                    key=len, reverse=True)
+
+
+def _strip_school(m: re.Match) -> str:
+    # the CJK run before 大学/学院 may start with content ('成绩单北京大学'): keep it up to its last term
+    name = m.group(0)
+    cut = max((name.rfind(t) + len(t) for t in _CJK_TERMS if t in name), default=0)
+    return name[:cut] + ' '
+
+
+def strip_university_names(text: str) -> str:
+    return _UNIVERSITY_RE.sub(_strip_school, text)
+
+
+def denoise_filename(filename: str) -> str:
+    stem = PurePath(filename or '').stem.lower()
+    return strip_university_names(stem)
+
+
+@lru_cache(maxsize=None)
+def _ascii_term_re(term: str) -> re.Pattern:
+    # ASCII terms match whole words only: 'gre' not in 'degree', 'cv' not in 'cvpr'
+    return re.compile(r'(?<![a-z])' + re.escape(term) + r'(?![a-z])')
+
+
+def contains_term(text: str, term: str) -> bool:
+    """Whether lower-cased `text` contains a synonym term (ASCII terms on word boundaries)."""
+    if term.isascii():
+        return _ascii_term_re(term).search(text) is not None
+    return term in text
+
+
+def _keywords(text: str) -> Set[str]:
+    """ASCII words and CJK bigrams (single CJK chars carry too little meaning)."""
+    out: Set[str] = set()
+    for tok in _TOKEN_RE.findall(text.lower()):
+        if tok.isascii():
+            if len(tok) > 1:
+                out.add(tok)
+        else:
+            out.update(tok[i:i + 2] for i in range(len(tok) - 1))
+    return out
+
+
+def synonym_group(label: str, category: Optional[str] = None) -> Tuple[Optional[str], Optional[List[str]]]:
+    """(category, synonym group) that the requirement label refers to, preferring its own category."""
+    low = (label or '').lower()
+    ordered = list(SYNONYMS.items())
+    if category in SYNONYMS:
+        ordered.sort(key=lambda kv: kv[0] != category)
+    for cat, groups in ordered:
+        for group in groups:
+            if any(contains_term(low, term) for term in group):
+                return cat, group
+    return None, None
+
+
+def score_item(item: Dict, materials: List[Dict]) -> List[Dict]:
+    """Scored candidates for one requirement item, best first."""
+    label = str(item.get('label') or '')
+    category = str(item.get('category') or '').lower() or None
+    group_cat, group = synonym_group(label, category)
+    if not category or category == 'other':
+        category = group_cat or category
+    label_keywords = _keywords(strip_university_names(label))
+
+    candidates = []
+    for m in materials:
+        score = 0
+        reasons = []
+        mcat = str(m.get('category') or 'other').lower()
+        fname = denoise_filename(str(m.get('filename') or ''))
+        if category and mcat == category:
+            score += CATEGORY_SCORE
+            reasons.append(f"Category:{CATEGORY_SEMANTICS.get(category, category).split('/')[0]}")
+        hit = next((term for term in group if contains_term(fname, term)), None) if group else None
+        if hit:
+            score += SYNONYM_SCORE
+            reasons.append(f"Filename contains '{hit}'")
+        elif label_keywords & _keywords(fname):
+            score += KEYWORD_SCORE
+            reasons.append("Partial filename match")
+        if score >= MIN_CANDIDATE_SCORE:
+            candidates.append({'id': m.get('id'), 'score': score, 'reason': ' + '.join(reasons)})
+    candidates.sort(key=lambda c: -c['score'])
+    return candidates[:MAX_CANDIDATES]
+
+
+def is_confident(candidates: List[Dict]) -> bool:
+    return bool(candidates) and candidates[0]['score'] >= CONFIDENT_SCORE
+
+
+def local_match(items: List[Dict], materials: List[Dict]) -> Tuple[List[Dict], List[int]]:
+    """
+    Score every item locally. Returns (matches in item order, indices of ambiguous items).
+    """
+    matches = []
+    ambiguous = []
+    for idx, item in enumerate(items):
+        candidates = score_item(item, materials)
+        matches.append({'item_label': item.get('label'), 'candidates': candidates})
+        if not is_confident(candidates):
+            ambiguous.append(idx)
+    return matches, ambiguous
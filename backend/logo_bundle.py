@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+Packed logo bundle: every school logo in one file, read through mmap.
+
+The logo set is ~3,000 small files. scripts/pack_logos.py packs them, together
+with logo_mapping.json, into a single bundle with identical image bytes stored
+once. At runtime the bundle is memory-mapped: a lookup is a binary search over
+a hash table and a slice of the mapping, with no per-logo open/stat, and
+deploying the whole set means shipping one file.
+
+Layout (little-endian):
+
+  header    magic "BYLOGOS\\0", version, entry count, blob count, 4 reserved
+            bytes, then the offsets of the blob table, hash table, entry table
+            and string table
+  blobs     deduplicated image bytes, each aligned to 8 bytes
+  blob table   per blob: offset u64, length u32, first 16 bytes of its sha256
+  hash table   per entry: 64-bit blake2b of the entry name, sorted
+  entry table  per entry (same order): name offset/length, kind (file or
+               school), blob id, offset/length of the logo file name
+  strings   UTF-8 names
+
+A "file" entry is a logo file name (school_xxx.svg); a "school" entry is a
+logo_mapping.json key pointing at the file it maps to.
+
+Logos are handed to the renderer as paths, so LogoBundle.materialize() writes a
+blob once to LOGO_BUNDLE_CACHE_DIR/<sha256 prefix><ext> and reuses it after.
+
+Configuration (environment variables):
+  LOGO_BUNDLE_PATH       bundle built by scripts/pack_logos.py (unset: no logos)
+  LOGO_BUNDLE_CACHE_DIR  where materialized logos go (default: <tmp>/baoyan-logo-bundle)
+"""
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from logo_index import LogoIndex
+
+LOGO_BUNDLE_PATH = os.getenv("LOGO_BUNDLE_PATH", "")
+LOGO_BUNDLE_CACHE_DIR = os.getenv("LOGO_BUNDLE_CACHE_DIR") or str(Path(tempfile.gettempdir()) / "baoyan-logo-bundle")
+
+MAGIC = b"BYLOGOS\0"
+VERSION = 1
+
+HEADER = struct.Struct('<8sIII4xQQQQ')
+BLOB = struct.Struct('<QI4x16s')
+HASH = struct.Struct('<Q')
+ENTRY = struct.Struct('<IHBxIIH2x')
+
+KIND_FILE = 0
+KIND_SCHOOL = 1
+
+BLOB_ALIGN = 8
+
+
+def name_hash(name: str) -> int:
+    return int.from_bytes(hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def write_bundle(files: Dict[str, Path], mapping: Dict[str, str], out_path: Path) -> Dict[str, int]:
+    """
+    Pack `files` (logo file name -> path) and the school -> file name `mapping`
+    into a bundle at `out_path` (written atomically). Mapping entries whose file
+    is not in `files` are dropped. Returns build statistics.
+    """
+    out_path = Path(out_path)
+    tmp = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+    blobs: List[Tuple[int, int, bytes]] = []
+    blob_ids: Dict[bytes, int] = {}
+    file_blob: Dict[str, int] = {}
+    total_bytes = 0
+
+    with open(tmp, 'wb') as f:
+        f.write(b'\0' * HEADER.size)
+        for name in sorted(files):
+            data = Path(files[name]).read_bytes()
+            total_bytes += len(data)
+            digest = hashlib.sha256(data).digest()
+            blob_id = blob_ids.get(digest)
+            if blob_id is None:
+                pad = -f.tell() % BLOB_ALIGN
+                f.write(b'\0' * pad)
+                blob_id = blob_ids[digest] = len(blobs)
+                blobs.append((f.tell(), len(data), digest[:16]))
+                f.write(data)
+            file_blob[name] = blob_id
+
+        strings = bytearray()
+        string_offsets: Dict[str, Tuple[int, int]] = {}
+
+        def intern(s: str) -> Tuple[int, int]:
+            if s not in string_offsets:
+                raw = s.encode('utf-8')
+                string_offsets[s] = (len(strings), len(raw))
+                strings.extend(raw)
+            return string_offsets[s]
+
+        entries = []
+        for name, blob_id in file_blob.items():
+            entries.append((name_hash(name), name, KIND_FILE, blob_id, name))
+        dropped = 0
+        for school, fname in mapping.items():
+            if fname not in file_blob:
+                dropped += 1
+                continue
+            entries.append((name_hash(school), school, KIND_SCHOOL, file_blob[fname], fname))
+        entries.sort(key=lambda e: (e[0], e[2], e[1]))
+
+        f.write(b'\0' * (-f.tell() % BLOB_ALIGN))
+        blob_table = f.tell()
+        for offset, length, digest16 in blobs:
+            f.write(BLOB.pack(offset, length, digest16))
+        hash_table = f.tell()
+        for h, *_ in entries:
+            f.write(HASH.pack(h))
+        entry_table = f.tell()
+        for _, name, kind, blob_id, fname in entries:
+            name_off, name_len = intern(name)
+            file_off, file_len = intern(fname)
+            f.write(ENTRY.pack(name_off, name_len, kind, blob_id, file_off, file_len))
+        string_table = f.tell()
+        f.write(strings)
+        size = f.tell()
+
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries), len(blobs),
+                            blob_table, hash_table, entry_table, string_table))
+    os.replace(tmp, out_path)
+    return {
+        'files': len(file_blob),
+        'schools': len(entries) - len(file_blob),
+        'unmapped_schools': dropped,
+        'blobs': len(blobs),
+        'input_bytes': total_bytes,
+        'bundle_bytes': size,
+    }
+
+
+class LogoBundle:
+    def __init__(self, path: Path, cache_dir: str = LOGO_BUNDLE_CACHE_DIR):
+        self.path = Path(path)
+        self.cache_dir = Path(cache_dir)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, self._entry_count, self._blob_count,
+             self._blob_table, hash_table, self._entry_table, self._string_table) = HEADER.unpack_from(self._mm, 0)
+        except struct.error:
+            self._mm.close()
+            raise ValueError(f"{self.path}: not a logo bundle (truncated header)")
+        if magic != MAGIC or version != VERSION:
+            self._mm.close()
+            raise ValueError(f"{self.path}: not a logo bundle (magic {magic!r}, version {version})")
+
+        self._view = memoryview(self._mm)
+        hashes = self._view[hash_table:hash_table + HASH.size * self._entry_count]
+        if sys.byteorder == 'little':
+            self._hashes = hashes.cast('Q')
+        else:
+            self._hashes = array('Q', bytes(hashes))
+            self._hashes.byteswap()
+        self._lock = threading.Lock()
+        self._index: Optional[LogoIndex] = None
+        self._materialized: Dict[int, Path] = {}
+
+    def __len__(self) -> int:
+        return self._entry_count
+
+    def close(self) -> None:
+        if isinstance(self._hashes, memoryview):
+            self._hashes.release()
+        self._view.release()
+        self._mm.close()
+
+    def _string(self, offset: int, length: int) -> str:
+        start = self._string_table + offset
+        return str(self._mm[start:start + length], 'utf-8')
+
+    def _entry(self, i: int) -> Tuple[int, int, int, int, int, int]:
+        return ENTRY.unpack_from(self._mm, self._entry_table + i * ENTRY.size)
+
+    def _find(self, name: str, kind: int) -> Optional[Tuple[int, int, int, int, int, int]]:
+        h = name_hash(name)
+        i = bisect_left(self._hashes, h)
+        while i < self._entry_count and self._hashes[i] == h:
+            entry = self._entry(i)
+            if entry[2] == kind and self._string(entry[0], entry[1]) == name:
+                return entry
+            i += 1
+        return None
+
+    def _blob(self, blob_id: int) -> Tuple[int, int, bytes]:
+        return BLOB.unpack_from(self._mm, self._blob_table + blob_id * BLOB.size)
+
+    def get(self, file_name: str) -> Optional[memoryview]:
+        """Bytes of a logo file as a zero-copy view into the bundle, or None."""
+        entry = self._find(file_name, KIND_FILE)
+        if entry is None:
+            return None
+        offset, length, _ = self._blob(entry[3])
+        return self._view[offset:offset + length]
+
+    def mapped_file(self, school: str) -> Optional[str]:
+        """logo_mapping.json lookup: the file name packed for `school`, or None."""
+        entry = self._find(school, KIND_SCHOOL)
+        return self._string(entry[4], entry[5]) if entry else None
+
+    def _entries(self, kind: int) -> Iterator[Tuple[str, str]]:
+        for i in range(self._entry_count):
+            entry = self._entry(i)
+            if entry[2] == kind:
+                yield self._string(entry[0], entry[1]), self._string(entry[4], entry[5])
+
+    def file_names(self) -> List[str]:
+        return [name for name, _ in self._entries(KIND_FILE)]
+
+    def mapping(self) -> Dict[str, str]:
+        return dict(self._entries(KIND_SCHOOL))
+
+    def logo_index(self) -> LogoIndex:
+        """find_logo_file semantics over the packed names (built on first use)."""
+        if self._index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = LogoIndex(self.path, self.mapping(), self.file_names())
+        return self._index
+
+    def lookup(self, school: str) -> Optional[str]:
+        """Logo file name for a school: mapping, then file-name substring, then tokens."""
+        found = self.logo_index().lookup(school)
+        return found.name if found else None
+
+    def materialize(self, file_name: str) -> Optional[Path]:
+        """
+        Path of a local copy of a packed logo, written on first use as
+        <sha256 prefix><ext> so identical images share one file.
+        """
+        entry = self._find(file_name, KIND_FILE)
+        if entry is None:
+            return None
+        blob_id = entry[3]
+        path = self._materialized.get(blob_id)
+        if path is not None:
+            return path
+        offset, length, digest16 = self._blob(blob_id)
+        path = self.cache_dir / f"{digest16.hex()}{Path(file_name).suffix.lower()}"
+        if not path.exists():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(self._view[offset:offset + length])
+            os.replace(tmp, path)
+        self._materialized[blob_id] = path
+        return path
+
+
+_bundle: Optional[LogoBundle] = None
+_bundle_failed = False
+_bundle_lock = threading.Lock()
+
+
+def get_logo_bundle() -> Optional[LogoBundle]:
+    """The LOGO_BUNDLE_PATH bundle, opened once; None when unset or unreadable."""
+    global _bundle, _bundle_failed
+    if _bundle is None and LOGO_BUNDLE_PATH and not _bundle_failed:
+        with _bundle_lock:
+            if _bundle is None and not _bundle_failed:
+                try:
+                    _bundle = LogoBundle(Path(LOGO_BUNDLE_PATH))
+                    print(f"Logo bundle loaded: {LOGO_BUNDLE_PATH} ({len(_bundle)} entries)")
+                except (OSError, ValueError) as e:
+                    _bundle_failed = True
+                    print(f"Logo bundle unavailable: {e}")
+    return _bundle
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+In-memory school -> logo file index.
+
+find_logo_file used to re-read logo_mapping.json (~3k entries) on every call and
+scan the logos directory up to twice on a miss. LogoIndex is built once from the
+mapping and one directory listing and answers:
+
+ - exact mapping lookups and case-folded mapping lookups in O(1)
+ - ASCII queries by full pinyin ("beijingdaxue") or initials ("bjdx") through
+   logo_pinyin_index.json, written by scripts/generate_logo_mapping.py and
+   loaded as is; ambiguous initials are ignored
+ - substring and token fallbacks through a character-bigram index over the
+   lower-cased file names, so only files sharing every bigram are checked
+ - repeated queries (hits and misses alike) from a result memo
+
+Candidate preference is unchanged: svg, then png, then jpg/jpeg, then anything
+else, ties broken by file name.
+
+get_logo_index() keeps one index per (logos dir, mapping file, pinyin index) and
+rebuilds it when any of them changes (mtime/size signature).
+"""
+from __future__ import annotations
+
+import json
+import re
+import threading
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+MEMO_LIMIT = 4096
+
+_MISSING = object()
+
+
+def ext_preference(name: str) -> int:
+    """Preference order for logo formats: svg, then png, then jpg."""
+    ext = Path(name).suffix.lower()
+    if ext == '.svg':
+        return 0
+    if ext == '.png':
+        return 1
+    if ext in ('.jpg', '.jpeg'):
+        return 2
+    return 3
+
+
+def _bigrams(text: str) -> Iterable[str]:
+    return (text[i:i + 2] for i in range(len(text) - 1))
+
+
+def pinyin_key(query: str) -> str:
+    """Lower-cased ASCII letters and digits of an ASCII query ('' for anything else)."""
+    return re.sub(r'[^0-9a-z]', '', query.lower()) if query.isascii() else ''
+
+
+class LogoIndex:
+    def __init__(self, logos_dir: Path, mapping: Dict[str, str], file_names: Iterable[str],
+                 pinyin_index: Optional[Dict[str, Dict[str, List[str]]]] = None):
+        self.logos_dir = logos_dir
+        # files sorted by preference so the first verified candidate is the best one
+        names = sorted(file_names, key=lambda n: (ext_preference(n), n))
+        self._names: Tuple[str, ...] = tuple(names)
+        self._lower: Tuple[str, ...] = tuple(n.lower() for n in names)
+        present = frozenset(names)
+
+        exact: Dict[str, str] = {}
+        folded: Dict[str, str] = {}
+        for school, fname in mapping.items():
+            if fname not in present:
+                continue
+            exact[school] = fname
+            folded.setdefault(school.casefold(), fname)
+        self._exact = MappingProxyType(exact)
+        self._folded = MappingProxyType(folded)
+
+        # pinyin / initials -> best present file
+        self._pinyin: Dict[str, str] = {}
+        self._initials: Dict[str, str] = {}
+        for kind, target in (('pinyin', self._pinyin), ('initials', self._initials)):
+            for key, fnames in ((pinyin_index or {}).get(kind) or {}).items():
+                candidates = sorted((f for f in fnames if f in present), key=lambda n: (ext_preference(n), n))
+                # initials shared by different schools (same stem = same school) are ambiguous
+                if candidates and (kind == 'pinyin' or len({Path(f).stem for f in candidates}) == 1):
+                    target[key] = candidates[0]
+
+        grams: Dict[str, set] = {}
+        for i, low in enumerate(self._lower):
+            for g in _bigrams(low):
+                grams.setdefault(g, set()).add(i)
+        self._grams: Dict[str, FrozenSet[int]] = MappingProxyType({g: frozenset(ids) for g, ids in grams.items()})
+
+        self._memo: Dict[str, Optional[Path]] = {}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _candidate_ids(self, needle: str) -> Iterable[int]:
+        """File ids that may contain `needle`, in preference order (not yet verified)."""
+        if len(needle) < 2:
+            return range(len(self._names))
+        ids: Optional[FrozenSet[int]] = None
+        for g in set(_bigrams(needle)):
+            hit = self._grams.get(g)
+            if not hit:
+                return ()
+            ids = hit if ids is None else ids & hit
+        return sorted(ids or ())
+
+    def _substring_match(self, needle: str) -> Optional[int]:
+        for i in self._candidate_ids(needle):
+            if needle in self._lower[i]:
+                return i
+        return None
+
+    def _token_match(self, tokens: List[str]) -> Optional[int]:
+        if not tokens:
+            return 0 if self._names else None
+        longest = max(tokens, key=len)
+        for i in self._candidate_ids(longest):
+            if all(tok in self._lower[i] for tok in tokens):
+                return i
+        return None
+
+    def _resolve(self, school_name: str) -> Optional[Path]:
+        fname = self._exact.get(school_name) or self._folded.get(school_name.casefold())
+        if not fname:
+            key = pinyin_key(school_name)
+            fname = (self._pinyin.get(key) or self._initials.get(key)) if key else None
+        if fname:
+            return self.logos_dir / fname
+        i = self._substring_match(school_name.lower())
+        if i is None:
+            # fuzzy: every token of the school name must appear in the file name
+            tokens = [tok.lower() for tok in re.split(r'[\s\-]+', school_name) if tok]
+            i = self._token_match(tokens)
+        return self.logos_dir / self._names[i] if i is not None else None
+
+    def lookup(self, school_name: str) -> Optional[Path]:
+        cached = self._memo.get(school_name, _MISSING)
+        if cached is not _MISSING:
+            return cached
+        result = self._resolve(school_name)
+        if len(self._memo) >= MEMO_LIMIT:
+            self._memo.clear()
+        self._memo[school_name] = result
+        return result
+
+
+def load_json_file(path: Optional[Path]) -> Dict:
+    """Parsed JSON object at `path`, or {} when it is missing or unreadable."""
+    if not path:
+        return {}
+    try:
+        return json.loads(Path(path).read_text(encoding='utf-8'))
+    except Exception:
+        return {}
+
+
+def _signature(logos_dir: Path, mapping_path: Optional[Path], pinyin_path: Optional[Path]) -> Tuple:
+    def stat_sig(p: Optional[Path]):
+        try:
+            st = p.stat()
+            return (st.st_mtime_ns, st.st_size)
+        except Exception:
+            return None
+    return (stat_sig(logos_dir), stat_sig(mapping_path) if mapping_path else None,
+            stat_sig(pinyin_path) if pinyin_path else None)
+
+
+def build_logo_index(logos_dir: Path, mapping_path: Optional[Path], pinyin_path: Optional[Path] = None) -> LogoIndex:
+    names = [p.name for p in logos_dir.iterdir() if p.is_file()] if logos_dir.is_dir() else []
+    return LogoIndex(logos_dir, load_json_file(mapping_path), names, load_json_file(pinyin_path))
+
+
+_INDEXES: Dict[Tuple[str, str, str], Tuple[Tuple, LogoIndex]] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+def get_logo_index(logos_dir: Path, mapping_path: Optional[Path], pinyin_path: Optional[Path] = None) -> LogoIndex:
+    """Shared index for (logos_dir, mapping_path, pinyin_path), rebuilt when any changes on disk."""
+    key = (str(logos_dir), str(mapping_path), str(pinyin_path))
+    sig = _signature(logos_dir, mapping_path, pinyin_path)
+    cached = _INDEXES.get(key)
+    if cached and cached[0] == sig:
+        return cached[1]
+    with _INDEX_LOCK:
+        cached = _INDEXES.get(key)
+        if cached and cached[0] == sig:
+            return cached[1]
+        index = build_logo_index(logos_dir, mapping_path, pinyin_path)
+        _INDEXES[key] = (sig, index)
+        return index
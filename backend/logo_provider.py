@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+On-demand school logos from Supabase storage.
+
+The service used to render every cover with the template's placeholder logo
+because nothing downloaded school logos. LogoProvider resolves a school through
+logo_mapping.json (same rules as find_logo_file: exact, case-folded, pinyin /
+initials when logo_pinyin_index.json is available, substring, tokens, over the
+mapped file names) and fetches only that one file from
+<bucket>/pdf_generate/school-logos/ the first time it is needed.
+
+ - downloaded logos are kept in LOGO_CACHE_DIR under their storage file name;
+   after LOGO_CACHE_TTL a hit is still served from disk while a conditional
+   request (If-Modified-Since) refreshes it in the background
+ - concurrent misses for the same logo share one download: the first caller
+   fetches, the others wait for its result
+ - logos missing from storage are remembered for LOGO_MISS_TTL seconds
+ - per-school request counts are persisted to <LOGO_CACHE_DIR>/requests.json
+   (merged across workers); prefetch() / the command below warm the most
+   requested schools concurrently
+
+Prefetch (from backend/, uses the service's Supabase credentials):
+  python logo_provider.py --top 200 [--concurrency 8]
+  python logo_provider.py --schools 清华大学 北京大学
+  python logo_provider.py --all
+
+Configuration (environment variables):
+  LOGO_CACHE_DIR     local logo directory (default: <tmp>/baoyan-logo-cache)
+  LOGO_CACHE_TTL     seconds before a cached logo is revalidated (default 604800)
+  LOGO_MISS_TTL      seconds a missing logo is not retried (default 600)
+  LOGO_PREFETCH_TOP  most-requested logos warmed at service startup (default 0)
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.utils import formatdate
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from logo_index import LogoIndex, load_json_file
+
+LOGO_CACHE_DIR = os.getenv("LOGO_CACHE_DIR") or str(Path(tempfile.gettempdir()) / "baoyan-logo-cache")
+LOGO_CACHE_TTL = float(os.getenv("LOGO_CACHE_TTL", str(7 * 24 * 3600)))
+LOGO_MISS_TTL = float(os.getenv("LOGO_MISS_TTL", "600"))
+LOGO_PREFETCH_TOP = int(os.getenv("LOGO_PREFETCH_TOP", "0"))
+
+LOGO_BUCKET = "institution-assets"
+LOGO_PREFIX = "pdf_generate/school-logos"
+
+# request counts are merged into requests.json at most this often
+REQUEST_COUNTS_FLUSH_SECONDS = 60
+
+# fetcher(bucket, path, etag, last_modified) -> (status_code, content, headers), as in asset_cache
+Fetcher = Callable[[str, str, Optional[str], Optional[str]], Tuple[int, bytes, Dict[str, str]]]
+
+
+class LogoProvider:
+    def __init__(self, fetcher: Fetcher, mapping_source: Callable[[], Optional[Path]],
+                 pinyin_source: Optional[Callable[[], Optional[Path]]] = None,
+                 bucket: str = LOGO_BUCKET, prefix: str = LOGO_PREFIX, root: str = LOGO_CACHE_DIR,
+                 ttl: float = LOGO_CACHE_TTL, miss_ttl: float = LOGO_MISS_TTL, max_workers: int = 4):
+        self.fetcher = fetcher
+        self.mapping_source = mapping_source
+        self.pinyin_source = pinyin_source
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.requests_path = self.root / 'requests.json'
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._misses: Dict[str, float] = {}
+        self._revalidating: set = set()
+        self._index: Optional[Tuple[Path, LogoIndex]] = None
+        self._pending_counts: Counter = Counter()
+        self._last_flush = time.time()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='logo-provider')
+        self.counters = {'hits': 0, 'downloads': 0, 'coalesced': 0, 'not_found': 0, 'errors': 0, 'revalidated': 0}
+
+    def _logo_index(self) -> Optional[LogoIndex]:
+        mapping_path = self.mapping_source()
+        if not mapping_path:
+            return None
+        cached = self._index
+        if cached and cached[0] == mapping_path:
+            return cached[1]
+        mapping = json.loads(Path(mapping_path).read_text(encoding='utf-8'))
+        # only consulted when the mapping changes
+        pinyin_index = load_json_file(self.pinyin_source()) if self.pinyin_source else {}
+        # storage is not listed: the mapped file names are the known logo set
+        index = LogoIndex(Path(self.prefix), mapping, set(mapping.values()), pinyin_index)
+        self._index = (mapping_path, index)
+        return index
+
+    def resolve_name(self, school: str) -> Optional[str]:
+        """Storage file name of the school's logo, or None when the mapping has no match."""
+        index = self._logo_index()
+        found = index.lookup(school) if index else None
+        return found.name if found else None
+
+    def get(self, school: str) -> Optional[Path]:
+        """Local path of the school's logo, downloading it on first use; None when there is none."""
+        fname = self.resolve_name(school)
+        if not fname:
+            return None
+        self._count(school)
+        return self.fetch(fname)
+
+    def fetch(self, fname: str) -> Optional[Path]:
+        """Local copy of one storage logo; concurrent misses for the same file share one download."""
+        path = self.root / Path(fname).name
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            st = None
+        if st is not None:
+            with self._lock:
+                self.counters['hits'] += 1
+                stale = time.time() - st.st_mtime > self.ttl
+                if stale and fname not in self._revalidating:
+                    self._revalidating.add(fname)
+                    self._executor.submit(self._revalidate, fname, path, st.st_mtime)
+            return path
+
+        with self._lock:
+            if self._misses.get(fname, 0) > time.time():
+                return None
+            future = self._inflight.get(fname)
+            leader = future is None
+            if leader:
+                future = self._inflight[fname] = Future()
+            else:
+                self.counters['coalesced'] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            result = self._download(fname, path)
+        except Exception as e:
+            with self._lock:
+                self.counters['errors'] += 1
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(fname, None)
+
+    def _remote_path(self, fname: str) -> str:
+        return f"{self.prefix}/{fname}"
+
+    def _write(self, path: Path, content: bytes) -> None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(content)
+        os.replace(tmp, path)
+
+    def _download(self, fname: str, path: Path) -> Optional[Path]:
+        status, content, _ = self.fetcher(self.bucket, self._remote_path(fname), None, None)
+        if status == 200:
+            self._write(path, content)
+            with self._lock:
+                self.counters['downloads'] += 1
+            return path
+        # Supabase answers a missing object with 400 {"statusCode": "404"}
+        if status in (400, 404):
+            with self._lock:
+                self.counters['not_found'] += 1
+                self._misses[fname] = time.time() + self.miss_ttl
+            print(f"Logo {fname} not found in storage (HTTP {status})")
+            return None
+        raise Exception(f"Logo download {fname} failed: HTTP {status}")
+
+    def _revalidate(self, fname: str, path: Path, mtime: float) -> None:
+        try:
+            status, content, _ = self.fetcher(self.bucket, self._remote_path(fname), None,
+                                              formatdate(mtime, usegmt=True))
+            if status == 304:
+                os.utime(path)
+            elif status == 200:
+                self._write(path, content)
+            else:
+                print(f"Logo revalidation for {fname} returned HTTP {status}; keeping cached copy")
+                return
+            with self._lock:
+                self.counters['revalidated'] += 1
+        except Exception as e:
+            print(f"Logo revalidation for {fname} failed: {e}")
+        finally:
+            with self._lock:
+                self._revalidating.discard(fname)
+
+    def _count(self, school: str) -> None:
+        with self._lock:
+            self._pending_counts[school] += 1
+            due = time.time() - self._last_flush > REQUEST_COUNTS_FLUSH_SECONDS
+        if due:
+            self.flush()
+
+    def _load_counts(self) -> Counter:
+        try:
+            return Counter(json.loads(self.requests_path.read_text(encoding='utf-8')))
+        except Exception:
+            return Counter()
+
+    def flush(self) -> None:
+        """Merge the request counts gathered since the last flush into requests.json."""
+        with self._lock:
+            pending, self._pending_counts = self._pending_counts, Counter()
+            self._last_flush = time.time()
+        if not pending:
+            return
+        counts = self._load_counts()
+        counts.update(pending)
+        self._write(self.requests_path, json.dumps(dict(counts), ensure_ascii=False).encode('utf-8'))
+
+    def top_schools(self, n: int) -> List[str]:
+        counts = self._load_counts()
+        with self._lock:
+            counts.update(self._pending_counts)
+        return [school for school, _ in counts.most_common(n)]
+
+    def prefetch(self, schools: Iterable[str], concurrency: int = 8) -> Dict[str, int]:
+        """Download the logos of `schools` concurrently (without counting them as requests)."""
+        names = {name for name in (self.resolve_name(s) for s in schools) if name}
+        stats = {'logos': len(names), 'cached': 0, 'missing': 0, 'failed': 0}
+
+        def warm(name: str) -> str:
+            if (self.root / Path(name).name).exists():
+                return 'cached'
+            try:
+                return 'fetched' if self.fetch(name) else 'missing'
+            except Exception as e:
+                print(f"Prefetch {name} failed: {e}")
+                return 'failed'
+
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            for outcome in pool.map(warm, sorted(names)):
+                stats[outcome] = stats.get(outcome, 0) + 1
+        return stats
+
+    def all_schools(self) -> List[str]:
+        mapping_path = self.mapping_source()
+        return list(json.loads(Path(mapping_path).read_text(encoding='utf-8'))) if mapping_path else []
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self.counters, 'inflight': len(self._inflight), 'known_missing': len(self._misses)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Warm the local logo cache from Supabase storage')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--top', type=int, help='prefetch the N most requested schools')
+    group.add_argument('--schools', nargs='+', help='prefetch these schools')
+    group.add_argument('--all', action='store_true', help='prefetch every school in logo_mapping.json')
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    from python_parse_service import logo_provider
+
+    if args.all:
+        schools = logo_provider.all_schools()
+    elif args.schools:
+        schools = args.schools
+    else:
+        schools = logo_provider.top_schools(args.top)
+        if not schools:
+            print("No request counts recorded yet in", logo_provider.requests_path)
+    start = time.perf_counter()
+    stats = logo_provider.prefetch(schools, args.concurrency)
+    print(f"Prefetched {stats['logos']} logos for {len(schools)} schools in {time.perf_counter() - start:.1f}s:",
+          json.dumps(stats, ensure_ascii=False))
+    return 0 if not stats['failed'] else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Prometheus metrics for the parse service (served as text on /metrics).
+
+ - cover_stage_seconds{stage, engine}: one histogram per /generate-cover stage
+   (asset_download, logo_lookup, pool_wait, docx_load, rasterization,
+   placeholder_replacement, docx_save, soffice_conversion, native_render).
+   Stages that run in the cover worker processes are timed there and reported
+   back with the result.
+ - llm_request_seconds{endpoint, kind}: LLM call latency for /parse and /match
+ - http_request_seconds{endpoint} / http_requests_in_flight{endpoint}
+ - llm_requests_in_flight, cover_renders_in_flight
+ - errors_total{endpoint, kind}
+
+Metrics are per worker process: with several uvicorn workers each one exposes
+its own /metrics (scrape them individually or run a single worker per port).
+
+Dependencies:
+  pip install prometheus_client
+"""
+from __future__ import annotations
+
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# cover stages range from sub-millisecond cache hits to multi-second soffice runs
+STAGE_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+LLM_BUCKETS = (.1, .25, .5, 1, 2, 4, 8, 15, 30, 60, 120)
+
+COVER_STAGE_SECONDS = Histogram(
+    'cover_stage_seconds', 'Time spent in each cover generation stage', ['stage', 'engine'],
+    buckets=STAGE_BUCKETS,
+)
+LLM_REQUEST_SECONDS = Histogram(
+    'llm_request_seconds', 'LLM call latency (stream: until the last chunk)', ['endpoint', 'kind'],
+    buckets=LLM_BUCKETS,
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    'http_request_seconds', 'Request latency until the response starts', ['endpoint'],
+    buckets=STAGE_BUCKETS + (60, 120),
+)
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests being handled', ['endpoint'])
+LLM_IN_FLIGHT = Gauge('llm_requests_in_flight', 'LLM calls holding a concurrency slot')
+COVER_IN_FLIGHT = Gauge('cover_renders_in_flight', 'Covers submitted to the render pool')
+ERRORS = Counter('errors_total', 'Errors by endpoint and kind', ['endpoint', 'kind'])
+
+
+def observe_stages(timings: Dict[str, float], engine: str) -> None:
+    for stage, seconds in timings.items():
+        COVER_STAGE_SECONDS.labels(stage, engine).observe(seconds)
+
+
+@contextmanager
+def time_stage(stage: str, engine: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        COVER_STAGE_SECONDS.labels(stage, engine).observe(time.perf_counter() - start)
+
+
+def record_error(endpoint: str, kind: str) -> None:
+    ERRORS.labels(endpoint, kind).inc()
+
+
+def render_latest():
+    """(body, content type) for the /metrics response."""
+    return generate_latest(), CONTENT_TYPE_LATEST
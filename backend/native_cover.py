@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Native cover renderer: draws the cover straight to PDF with reportlab.
+
+The DOCX engine mutates the template with python-docx and then needs LibreOffice
+to produce a PDF. This engine instead reads the template layout once and paints
+the page itself, so no soffice process is involved:
+
+ - the logo is drawn at the template image extent (cx/cy in EMU), as reported by
+   scripts/parse_docx_template.py (extract_images_info); without a logo the
+   template's own image is drawn, as the DOCX engine keeps it
+ - "label：value" lines become label/value rows (detect_placeholders heuristics),
+   laid out with the `table` column widths and alignments from template_spec.json;
+   rows whose label matches no field are filled like any other text
+ - the "××大学××学院" header and any other text are drawn in document order,
+   wrapped to the column width, continuing on a new page when the page is full
+
+Field resolution reuses the heuristics of generate_school_cover, so both engines
+fill the same fields from the same mapping.
+
+Dependencies:
+  pip install reportlab python-docx
+  CairoSVG (only for SVG logos)
+"""
+from __future__ import annotations
+
+import io
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from docx import Document
+from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from reportlab.pdfgen import canvas
+
+from generate_school_cover import (
+    header_department,
+    header_university,
+    match_context_key,
+    match_label_key,
+)
+from raster_cache import get_raster_cache
+
+EMU_PER_PT = 12700
+DEFAULT_FONT_SIZE_PT = 10.5  # 五号
+LINE_SPACING = 1.5
+
+WP_NS = '{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}'
+A_NS = '{http://schemas.openxmlformats.org/drawingml/2006/main}'
+R_EMBED = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed'
+
+# reportlab's built-in CID font covers simplified Chinese without shipping a TTF
+FONT_NAME = 'STSong-Light'
+pdfmetrics.registerFont(UnicodeCIDFont(FONT_NAME))
+
+
+def _alignment_name(alignment) -> str:
+    if alignment == WD_PARAGRAPH_ALIGNMENT.CENTER:
+        return 'center'
+    if alignment == WD_PARAGRAPH_ALIGNMENT.RIGHT:
+        return 'right'
+    return 'left'
+
+
+def _paragraph_font_size(paragraph, default: float) -> float:
+    for run in paragraph.runs:
+        if run.font.size:
+            return run.font.size.pt
+    style_font = getattr(paragraph.style, 'font', None)
+    if style_font is not None and style_font.size:
+        return style_font.size.pt
+    return default
+
+
+def _image_blob(doc: Document, node) -> Optional[bytes]:
+    blip = node.find('.//' + A_NS + 'blip')
+    rid = blip.get(R_EMBED) if blip is not None else None
+    part = doc.part.related_parts.get(rid) if rid else None
+    return getattr(part, 'blob', None)
+
+
+def extract_layout(doc: Document) -> Dict:
+    """
+    Collect page geometry and the blocks to draw, in document order.
+
+    Each block is one of:
+      {'type': 'image', 'cx', 'cy', 'align', 'blob': template image bytes or None}
+      {'type': 'row', 'label', 'sep', 'placeholder_text', 'runs', 'font_size_pt', 'align'}
+      {'type': 'runs', 'runs': [text, ...], 'font_size_pt', 'align'}
+    """
+    section = doc.sections[0]
+    normal = doc.styles['Normal'].font
+    default_size = normal.size.pt if normal.size else DEFAULT_FONT_SIZE_PT
+    blocks: List[Dict] = []
+    for paragraph in doc.paragraphs:
+        align = _alignment_name(paragraph.alignment)
+        font_size = _paragraph_font_size(paragraph, default_size)
+        extent = None
+        blob = None
+        for node in paragraph._p.iter(WP_NS + 'inline', WP_NS + 'anchor'):
+            ext = node.find(WP_NS + 'extent')
+            if ext is not None:
+                try:
+                    extent = (int(ext.get('cx')), int(ext.get('cy')))
+                except Exception:
+                    extent = None
+                blob = _image_blob(doc, node)
+                break
+        if extent:
+            blocks.append({'type': 'image', 'cx': extent[0], 'cy': extent[1], 'align': align, 'blob': blob})
+            continue
+        text = paragraph.text or ''
+        if '：' in text or ':' in text:
+            sep = '：' if '：' in text else ':'
+            left, right = text.split(sep, 1)
+            blocks.append({
+                'type': 'row',
+                'label': left,
+                'sep': sep,
+                'placeholder_text': right.strip(),
+                'runs': [r.text or '' for r in paragraph.runs],
+                'font_size_pt': font_size,
+                'align': align,
+            })
+            continue
+        blocks.append({
+            'type': 'runs',
+            'runs': [r.text or '' for r in paragraph.runs],
+            'font_size_pt': font_size,
+            'align': align,
+        })
+    return {
+        'page_width_pt': section.page_width.pt,
+        'page_height_pt': section.page_height.pt,
+        'left_margin_pt': section.left_margin.pt,
+        'right_margin_pt': section.right_margin.pt,
+        'top_margin_pt': section.top_margin.pt,
+        'bottom_margin_pt': section.bottom_margin.pt,
+        'blocks': blocks,
+    }
+
+
+def _fill_runs(runs: List[str], mapping: Dict[str, str], keys_priority: List[str],
+               placeholder_chars: List[str]) -> str:
+    """Substitute placeholder runs the same way replace_placeholders does for non-row paragraphs."""
+    text = ''.join(runs)
+    out = list(runs)
+    if not any(pc in text for pc in placeholder_chars) or not mapping:
+        return text
+    filled = set()
+    if '大学' in text and '学院' in text:
+        for i, r in enumerate(runs):
+            if i == 0 or i - 1 in filled or not any(pc in runs[i - 1] for pc in placeholder_chars):
+                continue
+            if r == '大学':
+                out[i - 1] = header_university(mapping)
+                filled.add(i - 1)
+            elif r == '学院':
+                out[i - 1] = header_department(mapping)
+                filled.add(i - 1)
+    for i, r in enumerate(runs):
+        if i in filled or not any(pc in r for pc in placeholder_chars):
+            continue
+        leading_ws = r[:len(r) - len(r.lstrip())]
+        out[i] = leading_ws + mapping.get(match_context_key(text, mapping, keys_priority), '')
+        # placeholder-only runs that follow are cleared to avoid duplication
+        for j in range(i + 1, len(runs)):
+            if runs[j].strip() and all(ch in placeholder_chars for ch in runs[j].strip()):
+                out[j] = ''
+                filled.add(j)
+            else:
+                break
+    return ''.join(out)
+
+
+def _logo_image(logo_path: Path, cx: int, cy: int, spec: Dict) -> ImageReader:
+    if logo_path.suffix.lower() != '.svg':
+        return ImageReader(str(logo_path))
+    logo_spec = spec.get('logo', {})
+    png = get_raster_cache().get_png(
+        logo_path, cx, cy,
+        dpi=logo_spec.get('dpi', 300),
+        scale=logo_spec.get('scale_factor', 3.0),
+    )
+    return ImageReader(io.BytesIO(png))
+
+
+def _wrap(text: str, width: float, font_size: float) -> List[str]:
+    """Break `text` into lines no wider than `width` (character-wise, as Word breaks CJK text)."""
+    lines: List[str] = []
+    line = ''
+    for ch in text:
+        if line and pdfmetrics.stringWidth(line + ch, FONT_NAME, font_size) > width:
+            lines.append(line)
+            line = ch.lstrip()
+        else:
+            line += ch
+    lines.append(line)
+    return lines
+
+
+def _draw_aligned(c: canvas.Canvas, text: str, x0: float, width: float, y: float, align: str,
+                  font_size: float) -> None:
+    c.setFont(FONT_NAME, font_size)
+    if align == 'center':
+        c.drawCentredString(x0 + width / 2, y, text)
+    elif align == 'right':
+        c.drawRightString(x0 + width, y, text)
+    else:
+        c.drawString(x0, y, text)
+
+
+def render_native_pdf(layout: Dict, logo_path: Optional[Path], mapping: Dict[str, str],
+                      out_pdf: Path, spec: Optional[Dict] = None) -> bool:
+    """Draw the cover described by `layout` to `out_pdf`. Returns True when the PDF was written."""
+    spec = spec or {}
+    keys_priority = spec.get('keys_priority', ['学生姓名', '申请专业', '本科院校', '毕业专业', '联系方式', '邮箱'])
+    placeholder_chars = spec.get('placeholder_chars', ['×', 'X'])
+    table = spec.get('table', {})
+    left_w = table.get('left_col_width_in', 2.2) * 72
+    right_w = table.get('right_col_width_in', 4.0) * 72
+    left_align = table.get('left_cell_alignment', 'right')
+    right_align = table.get('right_cell_alignment', 'center')
+
+    page_w = layout['page_width_pt']
+    page_h = layout['page_height_pt']
+    x0 = layout['left_margin_pt']
+    content_w = page_w - x0 - layout['right_margin_pt']
+    top = page_h - layout['top_margin_pt']
+    bottom = layout.get('bottom_margin_pt', layout['top_margin_pt'])
+    y = top
+
+    out_pdf.parent.mkdir(parents=True, exist_ok=True)
+    c = canvas.Canvas(str(out_pdf), pagesize=(page_w, page_h))
+
+    def advance(height: float) -> float:
+        # move down by `height`, continuing on a new page when it does not fit
+        nonlocal y
+        if y - height < bottom and y < top:
+            c.showPage()
+            y = top
+        y -= height
+        return y
+
+    for block in layout['blocks']:
+        if block['type'] == 'image':
+            w = block['cx'] / EMU_PER_PT
+            h = block['cy'] / EMU_PER_PT
+            advance(h)
+            try:
+                if logo_path:
+                    image = _logo_image(logo_path, block['cx'], block['cy'], spec)
+                elif block.get('blob'):
+                    image = ImageReader(io.BytesIO(block['blob']))
+                else:
+                    continue
+            except Exception as e:
+                # e.g. a template image format reportlab cannot read (EMF/WMF)
+                print(f"Native cover: image not drawn: {e}")
+                continue
+            if block['align'] == 'center':
+                x = x0 + (content_w - w) / 2
+            elif block['align'] == 'right':
+                x = x0 + content_w - w
+            else:
+                x = x0
+            c.drawImage(image, x, y, w, h, mask='auto', preserveAspectRatio=True, anchor='c')
+            continue
+
+        size = block['font_size_pt']
+        line_h = size * LINE_SPACING
+        if block['type'] == 'row':
+            key = match_label_key(block['label'].strip(), mapping, keys_priority)
+            if key:
+                advance(line_h)
+                _draw_aligned(c, block['label'] + block['sep'], x0, left_w, y, left_align, size)
+                for i, line in enumerate(_wrap(mapping[key], right_w, size)):
+                    if i:
+                        advance(line_h)
+                    _draw_aligned(c, line, x0 + left_w, right_w, y, right_align, size)
+                continue
+            # no field for this label: replace_placeholders fills it in its generic pass
+
+        text = _fill_runs(block['runs'], mapping, keys_priority, placeholder_chars)
+        if not text.strip():
+            advance(line_h)
+            continue
+        for line in _wrap(text, content_w, size):
+            advance(line_h)
+            _draw_aligned(c, line, x0, content_w, y, block['align'], size)
+    c.showPage()
+    c.save()
+    return out_pdf.exists()
+
+
+def render_native_cover(template: Path, logo_path: Optional[Path], mapping: Dict[str, str],
+                        out_pdf: Path, spec: Optional[Dict] = None) -> bool:
+    """Convenience wrapper: extract the layout from the DOCX template and render it."""
+    layout = extract_layout(Document(str(template)))
+    return render_native_pdf(layout, logo_path, mapping, out_pdf, spec)
@@ -1,17 +1,33 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, FileResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 import os
 import json
 import re
-import tempfile
-import shutil
+import io
+import zipfile
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
 from supabase import create_client, Client
 import requests
+
+import soffice_pool
+from asset_cache import AssetCache
+from response_cache import ResponseCache, make_cache_key
+from local_matcher import CATEGORY_SEMANTICS, local_match
+from vector_index import vector_match
+from json_stream import JsonArrayStreamParser
+from cover_cache import CoverCache, cover_cache_key, etag_for, etag_matches
+from logo_bundle import get_logo_bundle
+from logo_provider import LOGO_PREFETCH_TOP, LogoProvider
+from generate_school_cover import docx_to_pdf_bytes, load_spec, render_cover_timed
+import metrics
 '''''
 # 进入 backend 目录（如果后端在 backend）
 cd /home/root1/baoyan_agent/backend
@@ -27,9 +43,21 @@ uvicorn python_parse_service:app --host 127.0.0.1 --port 8000
 load_dotenv()
 
 try:
-    from openai import OpenAI
+    from openai import AsyncOpenAI
 except Exception:
-    OpenAI = None
+    AsyncOpenAI = None
+
+import asyncio
+import time
+import httpx
+
+# LLM client tuning: one long-lived async client per worker with a keep-alive pool
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "50"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "60"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+# upper bound on in-flight LLM calls per worker; further requests wait for a slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "256"))
 
 app = FastAPI(title="Agent Parse Service")
 
@@ -41,12 +69,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Endpoint labels are limited to the registered routes (unknown paths share one label)
+_METRIC_ENDPOINTS = set()
+
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    if not _METRIC_ENDPOINTS:
+        _METRIC_ENDPOINTS.update(getattr(r, "path", "") for r in app.routes)
+    endpoint = request.url.path if request.url.path in _METRIC_ENDPOINTS else "other"
+    if endpoint == "/metrics":
+        return await call_next(request)
+    metrics.HTTP_IN_FLIGHT.labels(endpoint).inc()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        metrics.record_error(endpoint, "unhandled")
+        raise
+    finally:
+        metrics.HTTP_IN_FLIGHT.labels(endpoint).dec()
+        metrics.HTTP_REQUEST_SECONDS.labels(endpoint).observe(time.perf_counter() - start)
+    if response.status_code >= 500:
+        metrics.record_error(endpoint, "http_5xx")
+    return response
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    body, content_type = metrics.render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+@app.on_event("startup")
+def start_soffice_pool():
+    # long-lived LibreOffice workers for cover PDF conversion
+    soffice_pool.start_pool()
+
+
+@app.on_event("shutdown")
+def stop_soffice_pool():
+    soffice_pool.stop_pool()
+
+
 class ParseRequest(BaseModel):
     text: str
 
 class MatchRequest(BaseModel):
     items: List[Dict[str, Any]]
     materials: List[Dict[str, Any]]
+    # "llm" (default): LLM only; "local": deterministic scoring only;
+    # "hybrid": local scoring first, only ambiguous items are sent to the LLM;
+    # "vector": n-gram TF-IDF top-k only; "rerank": the LLM re-ranks the vector shortlist
+    mode: str = "llm"
 
 # --- 工具函数 ---
 def extract_json_robust(text: str):
@@ -65,15 +140,33 @@ def extract_json_robust(text: str):
                 pass
     return None
 
-def get_client():
+_async_client = None
+_llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+def get_async_client():
+    """Shared AsyncOpenAI client (created on first use, closed on shutdown)."""
+    global _async_client
+    if _async_client is not None:
+        return _async_client
     key = os.getenv("OPENAI_API_KEY")
-    if not key or OpenAI is None:
+    if not key or AsyncOpenAI is None:
         return None
     try:
-        return OpenAI(
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(LLM_TIMEOUT, connect=10.0),
+        )
+        _async_client = AsyncOpenAI(
             api_key=key,
-            base_url=os.getenv("OPENAI_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
+            base_url=os.getenv("OPENAI_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1"),
+            http_client=http_client,
         )
+        return _async_client
     except TypeError as te:
         # Compatibility issue between installed openai/httpx versions
         print(f"OpenAI client initialization failed (TypeError): {te}")
@@ -82,17 +175,82 @@ def get_client():
         print(f"OpenAI client initialization failed: {e}")
         return None
 
-# --- 1. Parse (解析) 接口 (保持之前优化的版本) ---
-@app.post("/parse")
-def parse(req: ParseRequest):
-    text = req.text or ""
-    if not text.strip():
-        return []
-
-    client = get_client()
-    if not client: return []
 
-    prompt = f"""
+async def llm_complete(client, system: str, prompt: str, endpoint: str = "parse") -> str:
+    """Run one chat completion on the shared client, bounded by LLM_MAX_CONCURRENCY."""
+    async with _llm_semaphore:
+        metrics.LLM_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            resp = await client.chat.completions.create(
+                model=llm_model(),
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.1,
+            )
+        except Exception:
+            metrics.record_error(endpoint, "llm")
+            raise
+        finally:
+            metrics.LLM_IN_FLIGHT.dec()
+            metrics.LLM_REQUEST_SECONDS.labels(endpoint, "complete").observe(time.perf_counter() - start)
+    return resp.choices[0].message.content
+
+
+async def llm_stream(client, system: str, prompt: str, endpoint: str = "parse"):
+    """Stream a chat completion on the shared client, yielding content deltas."""
+    async with _llm_semaphore:
+        metrics.LLM_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            stream = await client.chat.completions.create(
+                model=llm_model(),
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": prompt},
+                ],
+                temperature=0.1,
+                stream=True,
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception:
+            metrics.record_error(endpoint, "llm")
+            raise
+        finally:
+            metrics.LLM_IN_FLIGHT.dec()
+            metrics.LLM_REQUEST_SECONDS.labels(endpoint, "stream").observe(time.perf_counter() - start)
+
+
+@app.on_event("shutdown")
+async def close_llm_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
+
+def llm_model() -> str:
+    return os.getenv("OPENAI_MODEL", "qwen-falsh")
+
+
+# Bump whenever the /parse prompt changes so cached responses are not reused across prompts
+PARSE_PROMPT_VERSION = "parse-v1"
+
+parse_cache = ResponseCache()
+
+
+def cache_bypassed(request: Request) -> bool:
+    """`X-Cache-Bypass: 1` or `Cache-Control: no-cache` forces a fresh LLM call."""
+    if request.headers.get("x-cache-bypass", "").lower() in ("1", "true", "yes"):
+        return True
+    return "no-cache" in request.headers.get("cache-control", "").lower()
+
+
+def build_parse_prompt(text: str) -> str:
+    return f"""
 You are an expert data cleaning assistant. Extract required materials from text.
 
 Input Text:
@@ -110,60 +268,147 @@ Input: "2. 本科成绩单(带印章)" -> Output: [{{"label": "本科成绩单",
 
 Output JSON array:
 """
+
+
+async def store_parse_result(cache_key: str, items) -> None:
+    """Cache a parse result off the event loop; a failed write only costs the next hit."""
     try:
-        resp = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "qwen-falsh"),
-            messages=[
-                {"role": "system", "content": "You are a strict parser. Output valid JSON."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.1,
-        )
-        parsed = extract_json_robust(resp.choices[0].message.content)
-        return JSONResponse(content=parsed if parsed else [])
+        await asyncio.get_running_loop().run_in_executor(None, parse_cache.set, cache_key, items)
+    except Exception as e:
+        print(f"Parse cache write failed: {e}")
+
+
+# --- 1. Parse (解析) 接口 (保持之前优化的版本) ---
+@app.post("/parse")
+async def parse(req: ParseRequest, request: Request):
+    text = req.text or ""
+    if not text.strip():
+        return []
+
+    cache_key = make_cache_key(text, llm_model(), PARSE_PROMPT_VERSION)
+    if cache_bypassed(request):
+        parse_cache.record_bypass()
+        cache_status = "BYPASS"
+    else:
+        # SQLite lookups stay off the event loop
+        cached = await asyncio.get_running_loop().run_in_executor(None, parse_cache.get, cache_key)
+        if cached is not None:
+            return JSONResponse(content=cached, headers={"X-Cache": "HIT"})
+        cache_status = "MISS"
+
+    client = get_async_client()
+    if not client: return []
+
+    prompt = build_parse_prompt(text)
+    try:
+        content = await llm_complete(client, "You are a strict parser. Output valid JSON.", prompt)
+        parsed = extract_json_robust(content)
     except Exception as e:
         print(f"Parse Error: {e}")
+        metrics.record_error("/parse", "parse")
         return JSONResponse(content=[])
+    if parsed:
+        # only successful parses are cached; failures should be retried
+        await store_parse_result(cache_key, parsed)
+    return JSONResponse(content=parsed if parsed else [], headers={"X-Cache": cache_status})
 
 
-# --- 2. Match (匹配) 接口 (核心修正) ---
-@app.post("/match")
-def match(req: MatchRequest):
-    items = req.items or []
-    materials = req.materials or []
-    
-    if not items:
-        return JSONResponse(content={"matches": []})
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-    client = get_client()
-    if not client:
-        return JSONResponse(content={"matches": []})
 
-    # 1. 构建带有分类语义的精简列表
-    category_semantics = {
-        "transcript": "成绩单/绩点/排名证明",
-        "english": "外语/四六级/托福雅思",
-        "personal": "简历/个人陈述/计划书",
-        "application_form": "报名表/申请表",
-        "certificate": "获奖证书/证明",
-        "recommendation": "推荐信",
-        "identity": "身份证/学生证",
-        "paper": "论文/出版物",
-        "other": "其他材料"
-    }
+@app.post("/parse/stream")
+async def parse_stream(req: ParseRequest, request: Request):
+    """
+    Streaming variant of /parse over Server-Sent Events: each {label, category}
+    object is sent as an `item` event as soon as it is complete in the model
+    output, followed by a `done` event ({"count", "cache"}) or an `error` event.
+    """
+    text = req.text or ""
+    cache_key = make_cache_key(text, llm_model(), PARSE_PROMPT_VERSION)
+    bypass = cache_bypassed(request)
+
+    async def events():
+        if not text.strip():
+            yield sse_event("done", {"count": 0, "cache": "MISS"})
+            return
+        if bypass:
+            parse_cache.record_bypass()
+        else:
+            cached = await asyncio.get_running_loop().run_in_executor(None, parse_cache.get, cache_key)
+            if cached is not None:
+                for item in cached:
+                    yield sse_event("item", item)
+                yield sse_event("done", {"count": len(cached), "cache": "HIT"})
+                return
+        cache_status = "BYPASS" if bypass else "MISS"
+
+        client = get_async_client()
+        if not client:
+            yield sse_event("done", {"count": 0, "cache": cache_status})
+            return
+
+        parser = JsonArrayStreamParser()
+        items = []
+        try:
+            async for delta in llm_stream(client, "You are a strict parser. Output valid JSON.", build_parse_prompt(text),
+                                          endpoint="parse_stream"):
+                for item in parser.feed(delta):
+                    items.append(item)
+                    yield sse_event("item", item)
+            if not items:
+                # output was not a well-formed streaming array; fall back to the robust full parse
+                for item in extract_json_robust(parser.text) or []:
+                    items.append(item)
+                    yield sse_event("item", item)
+        except Exception as e:
+            print(f"Parse Stream Error: {e}")
+            metrics.record_error("/parse/stream", "parse")
+            yield sse_event("error", {"message": str(e)})
+            return
+        if items:
+            await store_parse_result(cache_key, items)
+        yield sse_event("done", {"count": len(items), "cache": cache_status})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/parse/cache-stats")
+def parse_cache_stats():
+    return parse_cache.stats()
+
 
+# --- 2. Match (匹配) 接口 (核心修正) ---
+# Libraries with more materials than this are matched in per-category shards
+MATCH_SHARD_THRESHOLD = int(os.getenv("MATCH_SHARD_THRESHOLD", "40"))
+# Maximum materials per shard prompt
+MATCH_SHARD_SIZE = int(os.getenv("MATCH_SHARD_SIZE", "60"))
+MATCH_MAX_CANDIDATES = 10
+# Vector candidates per item kept for "vector" responses and the "rerank" shortlist
+MATCH_VECTOR_TOP_K = int(os.getenv("MATCH_VECTOR_TOP_K", "5"))
+
+
+def minify_materials(materials: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """构建带有分类语义的精简列表"""
     minified_materials = []
     for m in materials:
         cat = m.get("category", "other")
-        semantic_tag = category_semantics.get(cat, "其他")
+        semantic_tag = CATEGORY_SEMANTICS.get(cat, "其他")
         minified_materials.append({
             "id": m.get("id"),
             "filename": m.get("filename"), 
             "type_hint": semantic_tag
         })
-    
-    # 2. 基于分类的智能匹配 Prompt
-    prompt = f"""
+    return minified_materials
+
+
+def build_match_prompt(items: List[Dict[str, Any]], minified_materials: List[Dict[str, Any]]) -> str:
+    # 基于分类的智能匹配 Prompt
+    return f"""
 Task: Match "Required Items" to "Available Files" using category-first logic.
 
 Required Items:
@@ -214,31 +459,184 @@ Output JSON Structure:
 Output JSON only. Prioritize category matches over filename-only matches.
 """
 
-    try:
-        print(f"Match API called with {len(items)} items and {len(materials)} materials")
-        print(f"Sample materials: {minified_materials[:2] if minified_materials else 'None'}")
-
-        resp = client.chat.completions.create(
-            model=os.getenv("OPENAI_MODEL", "qwen-falsh"),
-            messages=[
-                {"role": "system", "content": "You are a smart assistant. Match files using category-first logic: find correct category first, then match content within category."},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.1,
-        )
 
-        print(f"LLM Response: {resp.choices[0].message.content[:500]}...")
-        
-        parsed = extract_json_robust(resp.choices[0].message.content)
+def normalize_matches(parsed) -> List[Dict[str, Any]]:
+    """LLM output may be {"matches": [...]} or (after extract_json_robust) the bare list."""
+    if isinstance(parsed, dict):
+        parsed = parsed.get("matches")
+    return [m for m in parsed if isinstance(m, dict)] if isinstance(parsed, list) else []
+
+
+async def llm_match(client, items: List[Dict[str, Any]], materials: List[Dict[str, Any]]):
+    """Ask the LLM to match items to materials; returns the parsed JSON (or None)."""
+    minified_materials = minify_materials(materials)
+    prompt = build_match_prompt(items, minified_materials)
+
+    print(f"Match API called with {len(items)} items and {len(materials)} materials")
+    print(f"Sample materials: {minified_materials[:2] if minified_materials else 'None'}")
+
+    content = await llm_complete(
+        client,
+        "You are a smart assistant. Match files using category-first logic: find correct category first, then match content within category.",
+        prompt,
+        endpoint="match",
+    )
+
+    print(f"LLM Response: {content[:500]}...")
+
+    return extract_json_robust(content)
+
+
+def align_entries(items: List[Dict[str, Any]], entries: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    """
+    Line LLM match entries up with `items`: by item_label first, then by position
+    (only for entries whose label does not name another item).
+    """
+    by_label = {e.get("item_label"): e for e in entries}
+    labels = {item.get("label") for item in items}
+    aligned = []
+    for pos, item in enumerate(items):
+        entry = by_label.get(item.get("label"))
+        if entry is None and pos < len(entries) and entries[pos].get("item_label") not in labels:
+            entry = entries[pos]
+        aligned.append(entry)
+    return aligned
+
+
+def build_match_shards(items: List[Dict[str, Any]], materials: List[Dict[str, Any]]):
+    """
+    Split one big match into (item indices, materials) shards by material category.
+    Items go to the shard of their own category; items whose category has no
+    materials (or is missing) are sent to every shard. Categories larger than
+    MATCH_SHARD_SIZE are split further so each prompt stays small.
+    """
+    by_category: Dict[str, List[Dict[str, Any]]] = {}
+    for m in materials:
+        by_category.setdefault(str(m.get("category") or "other").lower(), []).append(m)
+    unplaced = [i for i, it in enumerate(items) if str(it.get("category") or "").lower() not in by_category]
+    shards = []
+    for cat, mats in by_category.items():
+        idxs = [i for i, it in enumerate(items) if str(it.get("category") or "").lower() == cat] + unplaced
+        if not idxs:
+            continue
+        for start in range(0, len(mats), MATCH_SHARD_SIZE):
+            shards.append((sorted(idxs), mats[start:start + MATCH_SHARD_SIZE]))
+    return shards
+
+
+async def sharded_llm_match(client, items: List[Dict[str, Any]], materials: List[Dict[str, Any]]):
+    """Run one smaller prompt per category shard concurrently and merge candidates per item by score."""
+    shards = build_match_shards(items, materials)
+    print(f"Match sharded into {len(shards)} prompts for {len(materials)} materials")
+
+    async def run(idxs, mats):
+        shard_items = [items[i] for i in idxs]
+        return idxs, align_entries(shard_items, normalize_matches(await llm_match(client, shard_items, mats)))
+
+    results = await asyncio.gather(*(run(idxs, mats) for idxs, mats in shards), return_exceptions=True)
+    merged: List[Dict[str, Dict[str, Any]]] = [{} for _ in items]
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"Match shard failed: {result}")
+            continue
+        idxs, entries = result
+        for i, entry in zip(idxs, entries):
+            for cand in (entry or {}).get("candidates") or []:
+                cid = cand.get("id")
+                prev = merged[i].get(cid)
+                if prev is None or (cand.get("score") or 0) > (prev.get("score") or 0):
+                    merged[i][cid] = cand
+    return [
+        {
+            "item_label": item.get("label"),
+            "candidates": sorted(merged[i].values(), key=lambda c: -(c.get("score") or 0))[:MATCH_MAX_CANDIDATES],
+        }
+        for i, item in enumerate(items)
+    ]
+
+
+async def llm_match_entries(client, items: List[Dict[str, Any]], materials: List[Dict[str, Any]]):
+    """LLM match entries aligned with `items`, sharding the prompt for large material libraries."""
+    if len(materials) > MATCH_SHARD_THRESHOLD:
+        return await sharded_llm_match(client, items, materials)
+    return align_entries(items, normalize_matches(await llm_match(client, items, materials)))
+
+
+@app.post("/match")
+async def match(req: MatchRequest):
+    items = req.items or []
+    materials = req.materials or []
+    
+    if not items:
+        return JSONResponse(content={"matches": []})
+
+    mode = (req.mode or "llm").lower()
+    if mode in ("vector", "rerank"):
+        # items x materials scored on the index; rerank sends only the shortlist to the LLM.
+        # Building an index for a new library is CPU work, kept off the event loop.
+        matches = await asyncio.get_running_loop().run_in_executor(
+            None, vector_match, items, materials, MATCH_VECTOR_TOP_K)
+        client = get_async_client() if mode == "rerank" else None
+        if not client:
+            return JSONResponse(content={"matches": matches})
+        shortlist_ids = {c["id"] for m in matches for c in m["candidates"]}
+        shortlist = [m for m in materials if m.get("id") in shortlist_ids]
+        if not shortlist:
+            return JSONResponse(content={"matches": matches})
+        try:
+            llm_entries = await llm_match_entries(client, items, shortlist)
+            for i, entry in enumerate(llm_entries):
+                if entry and entry.get("candidates"):
+                    matches[i] = {"item_label": items[i].get("label"), "candidates": entry["candidates"]}
+        except Exception as e:
+            print(f"Match Error (rerank, keeping vector results): {e}")
+            metrics.record_error("/match", "match")
+        return JSONResponse(content={"matches": matches})
+
+    if mode in ("local", "hybrid"):
+        # deterministic category-first scoring; only ambiguous items go to the LLM in hybrid mode
+        matches, ambiguous = local_match(items, materials)
+        if mode == "local" or not ambiguous:
+            return JSONResponse(content={"matches": matches})
+        client = get_async_client()
+        if not client:
+            return JSONResponse(content={"matches": matches})
+        try:
+            escalated = [items[i] for i in ambiguous]
+            llm_entries = await llm_match_entries(client, escalated, materials)
+            for i, entry in zip(ambiguous, llm_entries):
+                if entry and entry.get("candidates"):
+                    matches[i] = {"item_label": items[i].get("label"), "candidates": entry["candidates"]}
+        except Exception as e:
+            print(f"Match Error (hybrid, keeping local results): {e}")
+            metrics.record_error("/match", "match")
+        return JSONResponse(content={"matches": matches})
+
+    client = get_async_client()
+    if not client:
+        return JSONResponse(content={"matches": []})
+
+    try:
+        if len(materials) > MATCH_SHARD_THRESHOLD:
+            # large libraries: one prompt per category shard, sent concurrently
+            return JSONResponse(content={"matches": await sharded_llm_match(client, items, materials)})
+        parsed = await llm_match(client, items, materials)
         return JSONResponse(content=parsed if parsed else {"matches": []})
             
     except Exception as e:
         print(f"Match Error: {e}")
+        metrics.record_error("/match", "match")
         return JSONResponse(content={"matches": []})
 
 # Supabase storage helper functions
-def download_from_supabase(bucket: str, path: str) -> bytes:
-    """Download file from Supabase storage using HTTP requests"""
+_storage_session = requests.Session()
+# (connect, read) seconds: a stalled storage request must not pin an executor thread
+STORAGE_TIMEOUT = (float(os.getenv("STORAGE_CONNECT_TIMEOUT", "5")), float(os.getenv("STORAGE_READ_TIMEOUT", "30")))
+
+
+def fetch_from_supabase(bucket: str, path: str, etag: Optional[str] = None,
+                        last_modified: Optional[str] = None):
+    """Conditional GET against Supabase storage. Returns (status_code, content, headers)."""
     supabase_url = os.getenv("SUPABASE_URL")
     service_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
@@ -250,132 +648,346 @@ def download_from_supabase(bucket: str, path: str) -> bytes:
         "Authorization": f"Bearer {service_key}",
         "apikey": service_key
     }
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+
+    response = _storage_session.get(download_url, headers=headers, timeout=STORAGE_TIMEOUT)
+    return response.status_code, response.content, response.headers
+
+
+def download_from_supabase(bucket: str, path: str) -> bytes:
+    """Download file from Supabase storage using HTTP requests"""
+    status, content, _ = fetch_from_supabase(bucket, path)
+    if status != 200:
+        raise Exception(f"HTTP {status}: {content.decode('utf-8', 'replace')}")
+
+    return content
+
+
+# Template assets are cached on local disk and revalidated in the background
+asset_cache = AssetCache(fetch_from_supabase)
 
-    response = requests.get(download_url, headers=headers)
-    if response.status_code != 200:
-        raise Exception(f"HTTP {response.status_code}: {response.text}")
+TEMPLATE_BUCKET = "institution-assets"
+TEMPLATE_ASSET = "pdf_generate/config/word_template.docx"
+LOGO_MAPPING_ASSET = "pdf_generate/config/logo_mapping.json"
+LOGO_PINYIN_INDEX_ASSET = "pdf_generate/config/logo_pinyin_index.json"
+TEMPLATE_SPEC_ASSET = "pdf_generate/config/template_spec.json"
 
-    return response.content
+# Rendered covers, keyed by everything that determines the PDF
+cover_cache = CoverCache()
+
+# School logos are downloaded one at a time on first use (unless a logo bundle is deployed)
+def optional_logo_pinyin_index() -> Optional[Path]:
+    """Pinyin / initials logo index (scripts/generate_logo_mapping.py), if uploaded."""
+    try:
+        return asset_cache.get(TEMPLATE_BUCKET, LOGO_PINYIN_INDEX_ASSET)
+    except Exception as e:
+        print(f"Logo pinyin index download failed (optional): {e}")
+        return None
+
+
+logo_provider = LogoProvider(fetch_from_supabase, lambda: asset_cache.get(TEMPLATE_BUCKET, LOGO_MAPPING_ASSET),
+                             optional_logo_pinyin_index)
+
+
+@app.on_event("startup")
+def prefetch_logos():
+    if LOGO_PREFETCH_TOP > 0 and get_logo_bundle() is None:
+        def warm():
+            stats = logo_provider.prefetch(logo_provider.top_schools(LOGO_PREFETCH_TOP))
+            print(f"Logo prefetch: {stats}")
+        threading.Thread(target=warm, name='logo-prefetch', daemon=True).start()
+
+
+@app.on_event("shutdown")
+def flush_logo_requests():
+    logo_provider.flush()
 
 class GenerateCoverRequest(BaseModel):
     fields: Dict[str, str]
     school: str
+    # "docx" (python-docx + LibreOffice) or "native" (reportlab, no LibreOffice)
+    engine: str = "docx"
+
+def resolve_cover_assets():
+    """
+    Resolve template, logo mapping and spec through the local asset cache
+    (misses are downloaded concurrently; mapping and spec are optional).
+    Returns (template_path, spec_path or None).
+    """
+    template_key = (TEMPLATE_BUCKET, TEMPLATE_ASSET)
+    mapping_key = (TEMPLATE_BUCKET, LOGO_MAPPING_ASSET)
+    spec_key = (TEMPLATE_BUCKET, TEMPLATE_SPEC_ASSET)
+    assets, asset_errors = asset_cache.get_many([template_key, mapping_key, spec_key])
+
+    if template_key not in assets:
+        raise Exception(f"模板下载失败: {asset_errors.get(template_key)}")
+    if mapping_key in asset_errors:
+        print(f"Logo mapping download failed (optional): {asset_errors[mapping_key]}")
+    if spec_key in asset_errors:
+        print(f"Template spec download failed (optional): {asset_errors[spec_key]}")
+    return assets[template_key], assets.get(spec_key)
+
+
+# Cover rendering (python-docx / reportlab, CPU-bound) runs on a bounded pool of
+# worker processes so it neither blocks the event loop nor serializes on the GIL.
+# DOCX output is converted to PDF back in this process, where the soffice pool lives.
+COVER_PROCESS_WORKERS = int(os.getenv("COVER_PROCESS_WORKERS") or os.cpu_count() or 2)
+# covers submitted to the pool at once; further renders wait for a slot
+COVER_MAX_PENDING = int(os.getenv("COVER_MAX_PENDING", "64"))
+
+_cover_executor = None
+_cover_semaphore = asyncio.Semaphore(COVER_MAX_PENDING)
+
+
+def get_cover_executor() -> ProcessPoolExecutor:
+    """Shared cover rendering pool (created on first use, shut down with the app)."""
+    global _cover_executor
+    if _cover_executor is None:
+        # spawn, not fork: this process already runs threads (soffice health checks, asset revalidation)
+        _cover_executor = ProcessPoolExecutor(
+            max_workers=COVER_PROCESS_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _cover_executor
+
+
+@app.on_event("shutdown")
+def stop_cover_executor():
+    global _cover_executor
+    if _cover_executor is not None:
+        _cover_executor.shutdown(wait=False, cancel_futures=True)
+        _cover_executor = None
+
+
+def resolve_cover_logo(school: str, spec: Dict) -> Optional[Path]:
+    """
+    Logo file for a school from the packed logo bundle, else from storage
+    (downloaded on first use), or None to keep the template image.
+    Blocks on a download: call it off the event loop.
+    """
+    bundle = get_logo_bundle()
+    if bundle is not None:
+        name = bundle.lookup(school)
+        return bundle.materialize(name) if name else None
+    try:
+        return logo_provider.get(school)
+    except Exception as e:
+        print(f"Logo lookup for {school} failed, keeping template logo: {e}")
+        return None
+
+
+def cover_engine(engine: Optional[str]) -> str:
+    return engine if engine in ('docx', 'native') else 'docx'
+
+
+def cover_job_key(template: Path, spec: Dict, school: str, fields: Dict[str, str], engine: str):
+    """(logo, cache key) of one cover; the key is also its ETag."""
+    with metrics.time_stage('logo_lookup', engine):
+        logo = resolve_cover_logo(school, spec)
+    return logo, cover_cache_key(template, spec, logo, fields, engine)
+
+
+async def render_cover_pdf(template: Path, spec: Dict, logo: Optional[Path], fields: Dict[str, str],
+                           engine: str = "docx") -> bytes:
+    """Render one cover PDF on the process pool with request-scoped template, spec and fields."""
+    engine = cover_engine(engine)
+    fmt = 'pdf' if engine == 'native' else 'docx'
+    loop = asyncio.get_running_loop()
+    metrics.COVER_IN_FLIGHT.inc()
+    try:
+        start = time.perf_counter()
+        async with _cover_semaphore:
+            data, timings = await loop.run_in_executor(
+                get_cover_executor(), render_cover_timed, template, spec, logo, fields, engine, fmt)
+        # stage timings come back from the worker; the rest of the wall time was queueing
+        timings['pool_wait'] = max(0.0, time.perf_counter() - start - sum(timings.values()))
+        metrics.observe_stages(timings, engine)
+        if fmt == 'docx':
+            with metrics.time_stage('soffice_conversion', engine):
+                data = await loop.run_in_executor(None, docx_to_pdf_bytes, data)
+    except BrokenProcessPool:
+        # a worker died (e.g. OOM); start a fresh pool for the next request
+        metrics.record_error("/generate-cover", "pool_broken")
+        stop_cover_executor()
+        raise
+    except Exception:
+        metrics.record_error("/generate-cover", f"render_{engine}")
+        raise
+    finally:
+        metrics.COVER_IN_FLIGHT.dec()
+    return data
+
+
+async def cached_cover_pdf(template: Path, spec: Dict, logo: Optional[Path], fields: Dict[str, str],
+                           engine: str, key: str, bypass: bool = False):
+    """(PDF, X-Cache status): served from the cover cache, or rendered and stored."""
+    loop = asyncio.get_running_loop()
+    if bypass:
+        cover_cache.record_bypass()
+    else:
+        # whole-PDF file reads and writes stay off the event loop
+        cached = await loop.run_in_executor(None, cover_cache.get, key)
+        if cached is not None:
+            return cached, "HIT"
+    pdf = await render_cover_pdf(template, spec, logo, fields, engine)
+    await loop.run_in_executor(None, cover_cache.put, key, pdf)
+    return pdf, "BYPASS" if bypass else "MISS"
+
+
+async def load_cover_config(engine: str = "docx"):
+    """(template path, spec dict) from the asset cache, resolved off the event loop."""
+    engine = cover_engine(engine)
+    with metrics.time_stage('asset_download', engine):
+        template_path, spec_path = await asyncio.get_running_loop().run_in_executor(None, resolve_cover_assets)
+    return template_path, load_spec(spec_path)
+
 
 # --- 3. Generate Cover (封面生成) 接口 ---
 @app.post("/generate-cover")
-def generate_cover(req: GenerateCoverRequest):
-    from generate_school_cover import main as generate_cover_main
-    import sys
-    import io
-    from contextlib import redirect_stdout, redirect_stderr
-
-    # Get field mapping
-    fields = req.fields
-    school = req.school
-
-    # Create temporary directory for processing
-    temp_dir = tempfile.mkdtemp()
+async def generate_cover(req: GenerateCoverRequest, request: Request):
+    engine = cover_engine(req.engine)
     try:
-        temp_path = Path(temp_dir)
+        template_path, spec = await load_cover_config(engine)
+        logo, key = await asyncio.get_running_loop().run_in_executor(
+            None, cover_job_key, template_path, spec, req.school, req.fields, engine)
+        etag = etag_for(key)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            # the client already has exactly this PDF
+            cover_cache.record_not_modified()
+            return Response(status_code=304, headers={"ETag": etag})
+        pdf_content, cache_status = await cached_cover_pdf(
+            template_path, spec, logo, req.fields, engine, key, bypass=cache_bypassed(request))
+    except Exception as e:
+        print(f"Cover generation error: {e}")
+        raise HTTPException(status_code=500, detail=f"封面生成失败: {str(e)}")
 
-        # Download template from Supabase
-        template_bucket = "institution-assets"
-        template_path = "pdf_generate/config/word_template.docx"
+    # Return PDF content as response
+    return Response(
+        content=pdf_content,
+        media_type='application/pdf',
+        headers={
+            "Content-Disposition": "attachment; filename=cover.pdf",
+            "ETag": etag,
+            # revalidate with If-None-Match instead of reusing blindly
+            "Cache-Control": "private, no-cache",
+            "X-Cache": cache_status,
+        }
+    )
 
-        template_content = download_from_supabase(template_bucket, template_path)
-        template_local_path = temp_path / "template.docx"
-        with open(template_local_path, 'wb') as f:
-            f.write(template_content)
 
-        # Download logo mapping (optional)
-        logo_mapping_path = "pdf_generate/config/logo_mapping.json"
-        try:
-            mapping_content = download_from_supabase(template_bucket, logo_mapping_path)
-            mapping_local_path = temp_path / "logo_mapping.json"
-            with open(mapping_local_path, 'wb') as f:
-                f.write(mapping_content)
-        except Exception as e:
-            print(f"Logo mapping download failed (optional): {e}")
+@app.get("/generate-cover/cache-stats")
+def cover_cache_stats():
+    return JSONResponse(content=cover_cache.stats())
+
+
+class CoverJob(BaseModel):
+    school: str
+    fields: Dict[str, str]
+
+
+class BatchCoverRequest(BaseModel):
+    jobs: List[CoverJob]
+    engine: str = "docx"
+
+
+# Largest accepted batch; jobs share the cover process pool
+BATCH_MAX_JOBS = int(os.getenv("BATCH_MAX_JOBS", "500"))
 
-        # Download template spec (optional)
-        template_spec_path = "pdf_generate/config/template_spec.json"
-        try:
-            spec_content = download_from_supabase(template_bucket, template_spec_path)
-            spec_local_path = temp_path / "template_spec.json"
-            with open(spec_local_path, 'wb') as f:
-                f.write(spec_content)
-        except Exception as e:
-            print(f"Template spec download failed (optional): {e}")
-
-        # Create logos directory - for now, skip logo downloading to avoid complex listing
-        logos_dir = temp_path / "logos"
-        logos_dir.mkdir(exist_ok=True)
-        # TODO: Implement logo downloading if needed
-
-        # Generate output path
-        output_path = temp_path / "cover.pdf"
-
-        # Prepare arguments for the script
-        sys.argv = [
-            'generate_school_cover.py',
-            '--template', str(template_local_path),
-            '--logos', str(logos_dir),
-            '--school', school,
-            '--output', str(output_path),
-            '--fields', json.dumps(fields)
-        ]
-
-        # Add spec path if it exists
-        if (temp_path / "template_spec.json").exists():
-            sys.argv.extend(['--spec', str(temp_path / "template_spec.json")])
-
-        # Capture output
-        stdout_capture = io.StringIO()
-        stderr_capture = io.StringIO()
-
-        with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
-            result = generate_cover_main(sys.argv[1:])
-
-        stdout_output = stdout_capture.getvalue()
-        stderr_output = stderr_capture.getvalue()
-
-        print("Cover generation stdout:", stdout_output)
-        if stderr_output:
-            print("Cover generation stderr:", stderr_output)
-
-        if result != 0 or not output_path.exists():
-            error_msg = f"封面生成失败 (exit code: {result})\nstdout: {stdout_output}\nstderr: {stderr_output}"
-            print(error_msg)
-            raise HTTPException(status_code=500, detail=error_msg)
-
-        # Return the generated PDF content directly
-        with open(output_path, 'rb') as f:
-            pdf_content = f.read()
-
-        # Return PDF content as response
-        from fastapi.responses import Response
-        return Response(
-            content=pdf_content,
-            media_type='application/pdf',
-            headers={"Content-Disposition": "attachment; filename=cover.pdf"}
-        )
 
+class _ZipStreamBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink for zipfile; drain() hands out what was written so far."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self._chunks.append(bytes(b))
+        self._pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _safe_filename(name: str) -> str:
+    return re.sub(r'[\\/:*?"<>|\s]+', '_', name).strip('_') or 'cover'
+
+
+# --- 4. Batch Cover Generation (批量封面生成) 接口 ---
+@app.post("/generate-cover/batch")
+async def generate_cover_batch(req: BatchCoverRequest):
+    """
+    Render many covers in one request. Jobs run on the cover process pool and
+    share the cached template, spec and logo index; each PDF is streamed into
+    the ZIP response as soon as it finishes. A failed job becomes
+    `<name>.error.txt` instead of failing the batch, and `manifest.json`
+    (written last) lists the status of every job.
+    """
+    jobs = req.jobs or []
+    if not jobs:
+        raise HTTPException(status_code=400, detail="jobs 不能为空")
+    if len(jobs) > BATCH_MAX_JOBS:
+        raise HTTPException(status_code=400, detail=f"一次最多生成 {BATCH_MAX_JOBS} 个封面")
+
+    try:
+        engine = cover_engine(req.engine)
+        template_path, spec = await load_cover_config(engine)
     except Exception as e:
-        # Clean up on error
-        import shutil
-        try:
-            shutil.rmtree(temp_dir)
-        except:
-            pass
-        print(f"Cover generation error: {e}")
+        print(f"Batch cover generation error: {e}")
         raise HTTPException(status_code=500, detail=f"封面生成失败: {str(e)}")
-    finally:
-        # Additional cleanup
-        import shutil
+
+    async def run_job(idx: int, job: CoverJob):
+        name = f"{idx + 1:03d}-{_safe_filename(job.school)}"
         try:
-            shutil.rmtree(temp_dir)
-        except:
-            pass
+            logo, key = await asyncio.get_running_loop().run_in_executor(
+                None, cover_job_key, template_path, spec, job.school, job.fields, engine)
+            pdf, _ = await cached_cover_pdf(template_path, spec, logo, job.fields, engine, key)
+            return name, pdf, None
+        except Exception as e:
+            return name, None, f"封面生成失败: {e}"
+
+    async def stream():
+        buf = _ZipStreamBuffer()
+        manifest = []
+        tasks = [asyncio.ensure_future(run_job(i, job)) for i, job in enumerate(jobs)]
+        try:
+            with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
+                for fut in asyncio.as_completed(tasks):
+                    name, data, error = await fut
+                    if data is not None:
+                        # PDFs are already compressed
+                        zf.writestr(f"{name}.pdf", data, compress_type=zipfile.ZIP_STORED)
+                        manifest.append({"name": name, "ok": True})
+                    else:
+                        zf.writestr(f"{name}.error.txt", error)
+                        manifest.append({"name": name, "ok": False, "error": error})
+                    yield buf.drain()
+                manifest.sort(key=lambda m: m["name"])
+                zf.writestr("manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2))
+            yield buf.drain()
+        finally:
+            # client went away: drop jobs that have not started
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        stream(),
+        media_type='application/zip',
+        headers={"Content-Disposition": "attachment; filename=covers.zip"},
+    )
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Two-tier cache of rasterized SVG logos.
+
+Rasterizing a logo with cairosvg at 300 DPI x 3 costs far more than the rest of
+the cover pipeline, and the result only depends on the logo bytes and the target
+size. Entries are keyed by (logo content hash, cx, cy, dpi, scale):
+
+ - memory tier: LRU of PNG bytes bounded by RASTER_CACHE_MEMORY_MB
+ - disk tier: <RASTER_CACHE_DIR>/<key>.png bounded by RASTER_CACHE_DISK_MB,
+   least recently used files (by mtime, refreshed on hit) are evicted first
+
+PNGs are returned as bytes, so callers never need a temporary file.
+
+Configuration (environment variables):
+  RASTER_CACHE_DIR        disk tier directory (default: <tmp>/baoyan-raster-cache)
+  RASTER_CACHE_MEMORY_MB  memory tier budget (default 64)
+  RASTER_CACHE_DISK_MB    disk tier budget (default 512)
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+RASTER_CACHE_DIR = os.getenv("RASTER_CACHE_DIR") or str(Path(tempfile.gettempdir()) / "baoyan-raster-cache")
+RASTER_CACHE_MEMORY_MB = float(os.getenv("RASTER_CACHE_MEMORY_MB", "64"))
+RASTER_CACHE_DISK_MB = float(os.getenv("RASTER_CACHE_DISK_MB", "512"))
+
+
+def emu_to_px(emu: int, dpi: int = 300) -> float:
+    """1 inch = 914400 EMU."""
+    return emu / 914400.0 * dpi
+
+
+def rasterize_svg(svg: bytes, cx: Optional[int], cy: Optional[int], dpi: int, scale: float) -> bytes:
+    import cairosvg
+    px_w = round(emu_to_px(cx, dpi=dpi) * scale) if cx else None
+    px_h = round(emu_to_px(cy, dpi=dpi) * scale) if cy else None
+    if px_w and px_h:
+        return cairosvg.svg2png(bytestring=svg, output_width=px_w, output_height=px_h)
+    if px_w:
+        return cairosvg.svg2png(bytestring=svg, output_width=px_w)
+    return cairosvg.svg2png(bytestring=svg)
+
+
+class RasterCache:
+    def __init__(self, disk_dir: str = RASTER_CACHE_DIR,
+                 memory_budget: int = int(RASTER_CACHE_MEMORY_MB * 1024 * 1024),
+                 disk_budget: int = int(RASTER_CACHE_DISK_MB * 1024 * 1024)):
+        self.disk_dir = Path(disk_dir)
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = sum(p.stat().st_size for p in self.disk_dir.glob('*.png'))
+        # (path, mtime_ns, size) -> sha256 of the logo file
+        self._hash_memo: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+        self.hits = {'memory': 0, 'disk': 0}
+        self.misses = 0
+
+    def _logo_hash(self, logo_path: Path) -> Tuple[str, Optional[bytes]]:
+        st = logo_path.stat()
+        memo_key = (str(logo_path), st.st_mtime_ns, st.st_size)
+        sha = self._hash_memo.get(memo_key)
+        if sha is not None:
+            return sha, None
+        data = logo_path.read_bytes()
+        sha = hashlib.sha256(data).hexdigest()
+        self._hash_memo[memo_key] = sha
+        return sha, data
+
+    def _remember(self, key: str, png: bytes) -> None:
+        # caller holds self._lock
+        if len(png) > self.memory_budget:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+        self._memory[key] = png
+        self._memory_bytes += len(png)
+        while self._memory_bytes > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    def _write_disk(self, key: str, png: bytes) -> None:
+        target = self.disk_dir / f'{key}.png'
+        tmp = target.with_name(f'{key}.{os.getpid()}.{threading.get_ident()}.tmp')
+        tmp.write_bytes(png)
+        os.replace(tmp, target)
+        with self._lock:
+            self._disk_bytes += len(png)
+            if self._disk_bytes <= self.disk_budget:
+                return
+            files = sorted(self.disk_dir.glob('*.png'), key=lambda p: p.stat().st_mtime)
+            total = sum(p.stat().st_size for p in files)
+            for p in files:
+                if total <= self.disk_budget:
+                    break
+                if p == target:
+                    continue
+                size = p.stat().st_size
+                try:
+                    p.unlink()
+                    total -= size
+                except OSError:
+                    pass
+            self._disk_bytes = total
+
+    def get_png(self, logo_path: Path, cx: Optional[int], cy: Optional[int],
+                dpi: int = 300, scale: float = 3.0) -> bytes:
+        """PNG bytes of `logo_path` rasterized for a cx x cy EMU extent."""
+        sha, data = self._logo_hash(logo_path)
+        key = f'{sha}_{cx}x{cy}_{dpi}_{scale:g}'
+        with self._lock:
+            png = self._memory.get(key)
+            if png is not None:
+                self._memory.move_to_end(key)
+                self.hits['memory'] += 1
+                return png
+        disk_path = self.disk_dir / f'{key}.png'
+        try:
+            png = disk_path.read_bytes()
+            os.utime(disk_path)
+            with self._lock:
+                self.hits['disk'] += 1
+                self._remember(key, png)
+            return png
+        except OSError:
+            pass
+        if data is None:
+            data = logo_path.read_bytes()
+        png = rasterize_svg(data, cx, cy, dpi, scale)
+        with self._lock:
+            self.misses += 1
+            self._remember(key, png)
+        self._write_disk(key, png)
+        return png
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes,
+                'hits': dict(self.hits),
+                'misses': self.misses,
+            }
+
+
+_CACHE: Optional[RasterCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_raster_cache() -> RasterCache:
+    global _CACHE
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = RasterCache()
+    return _CACHE
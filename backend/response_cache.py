@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Response cache for LLM-backed endpoints (used by /parse).
+
+Students often paste the same admission notice, so /parse results are cached
+under sha256(normalized text + model + prompt version):
+
+ - in-process LRU (PARSE_CACHE_MEMORY_ENTRIES entries) answers repeats in microseconds
+ - SQLite store (PARSE_CACHE_PATH) survives restarts and is shared by workers
+   on the same host; entries expire after PARSE_CACHE_TTL seconds and the least
+   recently used rows are evicted beyond PARSE_CACHE_MAX_ENTRIES; both are
+   trimmed every PARSE_CACHE_TRIM_EVERY stores rather than on every write
+
+get() and set() block on SQLite; async callers run them in an executor.
+
+Hit/miss counters are kept per tier and exposed through stats().
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+PARSE_CACHE_PATH = os.getenv("PARSE_CACHE_PATH") or str(Path(tempfile.gettempdir()) / "baoyan-parse-cache.sqlite3")
+PARSE_CACHE_TTL = float(os.getenv("PARSE_CACHE_TTL", str(7 * 24 * 3600)))
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "20000"))
+PARSE_CACHE_MEMORY_ENTRIES = int(os.getenv("PARSE_CACHE_MEMORY_ENTRIES", "1024"))
+PARSE_CACHE_TRIM_EVERY = int(os.getenv("PARSE_CACHE_TRIM_EVERY", "100"))
+
+_WS_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """NFKC-fold (full-width -> half-width etc.) and collapse whitespace, so trivially different pastes share a key."""
+    return _WS_RE.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+def make_cache_key(text: str, model: str, prompt_version: str) -> str:
+    payload = '\x1f'.join((prompt_version, model, normalize_text(text)))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, db_path: str = PARSE_CACHE_PATH, ttl: float = PARSE_CACHE_TTL,
+                 max_entries: int = PARSE_CACHE_MAX_ENTRIES, memory_entries: int = PARSE_CACHE_MEMORY_ENTRIES,
+                 trim_every: int = PARSE_CACHE_TRIM_EVERY):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.trim_every = max(1, trim_every)
+        self._stores_since_trim = 0
+        self._memory: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            ' key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_created ON responses(created)')
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'bypasses': 0}
+
+    def _remember(self, key: str, created: float, value: Any) -> None:
+        # caller holds self._lock
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.counters['memory_hits'] += 1
+                    return entry[1]
+                del self._memory[key]
+            row = self._db.execute('SELECT value, created FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is not None and now - row[1] <= self.ttl:
+                self._db.execute('UPDATE responses SET accessed = ? WHERE key = ?', (now, key))
+                value = json.loads(row[0])
+                self._remember(key, row[1], value)
+                self.counters['disk_hits'] += 1
+                return value
+            if row is not None:
+                self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.counters['misses'] += 1
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self._db.execute(
+                'INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self.counters['stores'] += 1
+            self._stores_since_trim += 1
+            if self._stores_since_trim >= self.trim_every:
+                self._stores_since_trim = 0
+                self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        # caller holds self._lock; expire old rows and keep the table within its size budget
+        # (get() ignores expired rows, and the table overshoots by at most trim_every rows)
+        self._db.execute('DELETE FROM responses WHERE created < ?', (now - self.ttl,))
+        count = self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+        if count > self.max_entries:
+            self._db.execute(
+                'DELETE FROM responses WHERE key IN '
+                '(SELECT key FROM responses ORDER BY accessed ASC LIMIT ?)',
+                (count - self.max_entries,),
+            )
+
+    def record_bypass(self) -> None:
+        with self._lock:
+            self.counters['bypasses'] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = self._db.execute('SELECT COUNT(*) FROM responses').fetchone()[0]
+            lookups = self.counters['memory_hits'] + self.counters['disk_hits'] + self.counters['misses']
+            hits = self.counters['memory_hits'] + self.counters['disk_hits']
+            return {
+                **self.counters,
+                'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'disk_entries': rows,
+            }
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Pool of long-lived headless LibreOffice workers for DOCX -> PDF conversion.
+
+Spawning ``soffice --headless --convert-to pdf`` for every cover costs several
+seconds of cold start. Instead, the parse service starts a few ``soffice``
+processes once, each listening on its own UNO pipe and using its own user
+profile directory (LibreOffice locks the profile, so workers sharing one would
+serialize or fail). Pipe names and profiles carry the process id, so every
+uvicorn worker process runs a pool of its own. A worker is ready once its own
+process is alive and a UNO resolve() over its pipe succeeds. Conversions are
+handed to an idle worker over UNO.
+
+Workers are health-checked in the background and restarted automatically when
+their process exits or a conversion over UNO fails. A conversion still running
+after SOFFICE_CONVERT_TIMEOUT seconds (a document that hangs LibreOffice) has its
+worker killed and restarted, and fails without a retry.
+
+Configuration (environment variables):
+  SOFFICE_POOL_SIZE        number of workers (default 2, 0 disables the pool)
+  SOFFICE_PROFILE_ROOT     directory holding the per-process, per-worker profiles (default: temp dir)
+  SOFFICE_HEALTH_INTERVAL  seconds between background health checks (default 30)
+  SOFFICE_ACQUIRE_TIMEOUT  seconds to wait for an idle worker (default 60)
+  SOFFICE_CONVERT_TIMEOUT  seconds one conversion may take (default 60)
+
+The UNO bridge needs the ``uno`` module shipped with LibreOffice (python3-uno on
+Debian/Ubuntu). When it is not importable, workers fall back to running
+``soffice --convert-to`` against their own profile, which still allows
+concurrent conversions but pays the start-up cost each time.
+"""
+from __future__ import annotations
+
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+try:
+    import uno  # type: ignore
+    from com.sun.star.beans import PropertyValue  # type: ignore
+except Exception:
+    uno = None
+    PropertyValue = None
+
+POOL_SIZE = int(os.getenv("SOFFICE_POOL_SIZE", "2"))
+PROFILE_ROOT = os.getenv("SOFFICE_PROFILE_ROOT") or str(Path(tempfile.gettempdir()) / "soffice-pool")
+HEALTH_INTERVAL = float(os.getenv("SOFFICE_HEALTH_INTERVAL", "30"))
+ACQUIRE_TIMEOUT = float(os.getenv("SOFFICE_ACQUIRE_TIMEOUT", "60"))
+CONVERT_TIMEOUT = float(os.getenv("SOFFICE_CONVERT_TIMEOUT", "60"))
+STARTUP_TIMEOUT = 30.0
+
+
+def _prop(name: str, value):
+    p = PropertyValue()
+    p.Name = name
+    p.Value = value
+    return p
+
+
+class SofficeWorker:
+    """A single headless LibreOffice process bound to one UNO pipe and one profile."""
+
+    def __init__(self, index: int, pipe_name: str, profile_dir: Path, convert_timeout: float = CONVERT_TIMEOUT):
+        self.index = index
+        self.pipe_name = pipe_name
+        self.profile_dir = profile_dir
+        self.convert_timeout = convert_timeout
+        self.proc: Optional[subprocess.Popen] = None
+        self.restarts = 0
+        self.lock = threading.Lock()
+        self.timed_out = False
+        self._desktop = None
+
+    @property
+    def profile_url(self) -> str:
+        return self.profile_dir.resolve().as_uri()
+
+    @property
+    def connection(self) -> str:
+        return f'pipe,name={self.pipe_name};urp;StarOffice.ComponentContext'
+
+    def start(self) -> None:
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self._desktop = None
+        if uno is None:
+            # no UNO bridge: conversions run as one-shot processes on this profile
+            return
+        cmd = [
+            'soffice', '--headless', '--invisible', '--nologo', '--norestore', '--nodefault',
+            f'-env:UserInstallation={self.profile_url}',
+            f'--accept={self.connection}',
+        ]
+        self.proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError(f"soffice worker {self.index} exited during start-up")
+            try:
+                self._get_desktop()
+                return
+            except Exception:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f"soffice worker {self.index} did not answer on pipe {self.pipe_name}")
+
+    def stop(self) -> None:
+        self._desktop = None
+        if self.proc is None:
+            return
+        try:
+            self.proc.terminate()
+            self.proc.wait(timeout=5)
+        except Exception:
+            try:
+                self.proc.kill()
+            except Exception:
+                pass
+        self.proc = None
+
+    def restart(self) -> None:
+        self.stop()
+        self.restarts += 1
+        print(f"Restarting soffice worker {self.index} (restart #{self.restarts})")
+        self.start()
+
+    def is_healthy(self) -> bool:
+        if uno is None:
+            return True
+        if self.proc is None or self.proc.poll() is not None:
+            return False
+        # a fresh resolve, so a bridge that died with the last conversion is noticed
+        self._desktop = None
+        try:
+            self._get_desktop()
+            return True
+        except Exception:
+            return False
+
+    def _get_desktop(self):
+        if self._desktop is None:
+            local_ctx = uno.getComponentContext()
+            resolver = local_ctx.ServiceManager.createInstanceWithContext(
+                'com.sun.star.bridge.UnoUrlResolver', local_ctx)
+            ctx = resolver.resolve(f'uno:{self.connection}')
+            self._desktop = ctx.ServiceManager.createInstanceWithContext('com.sun.star.frame.Desktop', ctx)
+        return self._desktop
+
+    def _kill_hung(self, proc: subprocess.Popen) -> None:
+        # watchdog: the blocked UNO call fails once its process is gone
+        self.timed_out = True
+        print(f"soffice worker {self.index} conversion exceeded {self.convert_timeout:.0f}s; killing it")
+        try:
+            proc.kill()
+        except Exception:
+            pass
+
+    def convert(self, docx_path: Path, out_pdf: Path) -> bool:
+        """Convert one document; sets timed_out (and raises or returns False) when it exceeds convert_timeout."""
+        self.timed_out = False
+        if uno is None:
+            return self._convert_subprocess(docx_path, out_pdf)
+        watchdog = threading.Timer(self.convert_timeout, self._kill_hung, (self.proc,))
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            desktop = self._get_desktop()
+            doc = desktop.loadComponentFromURL(
+                uno.systemPathToFileUrl(str(docx_path.resolve())), '_blank', 0, (_prop('Hidden', True),))
+            if doc is None:
+                return False
+            try:
+                doc.storeToURL(
+                    uno.systemPathToFileUrl(str(out_pdf.resolve())), (_prop('FilterName', 'writer_pdf_Export'),))
+            finally:
+                doc.close(True)
+        finally:
+            watchdog.cancel()
+        return out_pdf.exists()
+
+    def _convert_subprocess(self, docx_path: Path, out_pdf: Path) -> bool:
+        outdir = Path(tempfile.mkdtemp(prefix=f'soffice-{self.index}-'))
+        try:
+            cmd = [
+                'soffice', f'-env:UserInstallation={self.profile_url}', '--headless',
+                '--convert-to', 'pdf', str(docx_path), '--outdir', str(outdir),
+            ]
+            try:
+                subprocess.run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               timeout=self.convert_timeout)
+            except subprocess.TimeoutExpired:
+                self.timed_out = True
+                raise
+            generated = outdir / (docx_path.stem + '.pdf')
+            if not generated.exists():
+                return False
+            shutil.move(str(generated), str(out_pdf))
+            return True
+        finally:
+            shutil.rmtree(outdir, ignore_errors=True)
+
+
+class SofficePool:
+    """
+    Fixed-size pool of SofficeWorker instances.
+
+    convert() checks out an idle worker, verifies it is alive (restarting it if
+    not), runs the conversion and returns the worker to the pool. A conversion
+    error restarts the worker and is retried once on the fresh process, unless
+    the conversion timed out. Failures, including failed restarts, return False.
+    """
+
+    def __init__(self, size: int = POOL_SIZE, profile_root: str = PROFILE_ROOT,
+                 health_interval: float = HEALTH_INTERVAL):
+        self.size = max(1, size)
+        # unique per process: uvicorn --workers N starts N pools side by side
+        pid = os.getpid()
+        self.workers: List[SofficeWorker] = [
+            SofficeWorker(i, f'soffice-pool-{pid}-{i}', Path(profile_root) / f'{pid}-worker-{i}')
+            for i in range(self.size)
+        ]
+        self.health_interval = health_interval
+        self._idle: "queue.Queue[SofficeWorker]" = queue.Queue()
+        self._stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        for w in self.workers:
+            # a profile left by an earlier process with this pid is stale (and maybe still locked)
+            shutil.rmtree(w.profile_dir, ignore_errors=True)
+            w.start()
+            self._idle.put(w)
+        self._health_thread = threading.Thread(target=self._health_loop, name='soffice-health', daemon=True)
+        self._health_thread.start()
+        mode = 'uno' if uno is not None else 'subprocess'
+        print(f"Started soffice pool with {self.size} workers ({mode} mode)")
+
+    def stop(self) -> None:
+        self._stop.set()
+        for w in self.workers:
+            with w.lock:
+                w.stop()
+                shutil.rmtree(w.profile_dir, ignore_errors=True)
+
+    def _health_loop(self) -> None:
+        while not self._stop.wait(self.health_interval):
+            for w in self.workers:
+                # busy workers are checked on their next checkout instead
+                if not w.lock.acquire(blocking=False):
+                    continue
+                try:
+                    if not w.is_healthy():
+                        w.restart()
+                except Exception as e:
+                    print(f"soffice worker {w.index} health check failed: {e}")
+                finally:
+                    w.lock.release()
+
+    def convert(self, docx_path: Path, out_pdf: Path, timeout: float = ACQUIRE_TIMEOUT) -> bool:
+        try:
+            worker = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            print("No idle soffice worker available; conversion timed out")
+            return False
+        try:
+            with worker.lock:
+                if not worker.is_healthy() and not self._restart(worker):
+                    return False
+                for attempt in range(2):
+                    try:
+                        ok = worker.convert(docx_path, out_pdf)
+                    except Exception as e:
+                        print(f"soffice worker {worker.index} conversion failed (attempt {attempt + 1}): {e}")
+                        ok = None
+                    if worker.timed_out:
+                        # the same document would hang the fresh process too
+                        self._restart(worker)
+                        return False
+                    if ok is not None:
+                        return ok
+                    if not self._restart(worker):
+                        return False
+                return False
+        finally:
+            self._idle.put(worker)
+
+    @staticmethod
+    def _restart(worker: SofficeWorker) -> bool:
+        # caller holds worker.lock; a worker that fails to start is retried by the health loop
+        try:
+            worker.restart()
+            return True
+        except Exception as e:
+            print(f"soffice worker {worker.index} restart failed: {e}")
+            return False
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size,
+            'idle': self._idle.qsize(),
+            'mode': 'uno' if uno is not None else 'subprocess',
+            'workers': [
+                {'index': w.index, 'pipe': w.pipe_name, 'healthy': w.is_healthy(), 'restarts': w.restarts}
+                for w in self.workers
+            ],
+        }
+
+
+_POOL: Optional[SofficePool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def start_pool(size: int = POOL_SIZE) -> Optional[SofficePool]:
+    """Start the process-wide pool (idempotent). Returns None if disabled or soffice is missing."""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            return _POOL
+        if size <= 0:
+            return None
+        if not shutil.which('soffice'):
+            print("LibreOffice (soffice) not found; soffice pool disabled.")
+            return None
+        pool = SofficePool(size=size)
+        try:
+            pool.start()
+        except Exception as e:
+            print(f"Failed to start soffice pool: {e}")
+            pool.stop()
+            return None
+        _POOL = pool
+        return _POOL
+
+
+def stop_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.stop()
+            _POOL = None
+
+
+def get_pool() -> Optional[SofficePool]:
+    """Return the running pool, or None when conversions should spawn soffice directly."""
+    return _POOL
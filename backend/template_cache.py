@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Cache of parsed DOCX templates, keyed by template content hash.
+
+Document(path) unzips the package and re-parses every XML part on each call.
+The cache parses a template once and hands out clones instead: the clone
+deep-copies the main document part (the only XML part cover generation
+mutates) and the package/relationship objects, while the remaining XML parts
+(styles, numbering, settings, theme, ...) are shared read-only with the master
+copy. Binary parts keep sharing their immutable blob bytes.
+
+The master Document is never handed out, so callers may mutate and save their
+clone freely.
+"""
+from __future__ import annotations
+
+import copy
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, Tuple
+
+from docx import Document
+from docx.document import Document as DocxDocument
+from docx.opc.part import XmlPart
+from docx.parts.document import DocumentPart
+
+MAX_TEMPLATES = 8
+
+
+class CompiledTemplate:
+    """A parsed template that can be cheaply instantiated per request."""
+
+    def __init__(self, sha256: str, document):
+        self.sha256 = sha256
+        self._document = document
+        self._artifacts: Dict = {}
+        self._lock = threading.Lock()
+        # XML elements that stay shared between clones (never mutated by cover generation)
+        self._shared_elements = [
+            part._element
+            for part in document.part.package.iter_parts()
+            if isinstance(part, XmlPart) and not isinstance(part, DocumentPart)
+        ]
+
+    def artifact(self, key, build: Callable):
+        """
+        Memoize something derived read-only from the master document, e.g. the
+        compiled placeholder locations. `build` receives the master Document.
+        """
+        with self._lock:
+            if key not in self._artifacts:
+                self._artifacts[key] = build(self._document)
+            return self._artifacts[key]
+
+    def instantiate(self):
+        """Return an independent Document whose main part can be mutated and saved."""
+        memo = {id(el): el for el in self._shared_elements}
+        clone = copy.deepcopy(self._document, memo)
+        # wrap the copied element afresh: the deep copy also carries the master's
+        # cached body proxy (filled by any read of .paragraphs), which would point
+        # add_paragraph/add_table at a detached copy of w:body
+        return DocxDocument(clone.element, clone.part)
+
+
+class TemplateCache:
+    def __init__(self, max_entries: int = MAX_TEMPLATES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CompiledTemplate]" = OrderedDict()
+        # (path, mtime_ns, size) -> sha256, so unchanged files are not re-hashed
+        self._hash_memo: Dict[Tuple[str, int, int], str] = {}
+        self._lock = threading.Lock()
+
+    def _content_hash(self, template: Path) -> str:
+        st = template.stat()
+        memo_key = (str(template.resolve()), st.st_mtime_ns, st.st_size)
+        sha = self._hash_memo.get(memo_key)
+        if sha is None:
+            sha = hashlib.sha256(template.read_bytes()).hexdigest()
+            self._hash_memo[memo_key] = sha
+        return sha
+
+    def get(self, template: Path) -> CompiledTemplate:
+        sha = self._content_hash(template)
+        with self._lock:
+            entry = self._entries.get(sha)
+            if entry is not None:
+                self._entries.move_to_end(sha)
+                return entry
+            entry = CompiledTemplate(sha, Document(str(template)))
+            self._entries[sha] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return entry
+
+
+_CACHE = TemplateCache()
+
+
+def get_compiled_template(template: Path) -> CompiledTemplate:
+    return _CACHE.get(template)
+
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# backend modules import each other by bare name (flat layout)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
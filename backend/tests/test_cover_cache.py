@@ -0,0 +1,35 @@
+from pathlib import Path
+
+import pytest
+
+from cover_cache import cover_cache_key
+
+
+@pytest.fixture
+def template(tmp_path) -> Path:
+    path = tmp_path / 'word_template.docx'
+    path.write_bytes(b'template bytes')
+    return path
+
+
+def key(template: Path, fields) -> str:
+    return cover_cache_key(template, {}, None, fields, 'docx')
+
+
+def test_same_fields_same_key(template):
+    assert key(template, {'学生姓名': '李明'}) == key(template, {'学生姓名': '李明'})
+
+
+def test_fullwidth_and_ascii_values_do_not_collide(template):
+    # rendered verbatim, so the covers differ
+    assert key(template, {'学生姓名': 'Ｌｉ　Ｍｉｎｇ'}) != key(template, {'学生姓名': 'Li Ming'})
+
+
+def test_empty_value_and_missing_key_do_not_collide(template):
+    assert key(template, {'学生姓名': ''}) != key(template, {})
+
+
+def test_field_order_is_part_of_the_key(template):
+    # replace_placeholders falls back to the first field in dict order
+    assert key(template, {'学生姓名': '李明', '本科院校': '清华大学'}) != \
+        key(template, {'本科院校': '清华大学', '学生姓名': '李明'})
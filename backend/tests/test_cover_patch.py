@@ -0,0 +1,79 @@
+import io
+import zipfile
+from pathlib import Path
+
+import pytest
+from docx import Document
+
+import generate_school_cover as cover
+
+FIELDS = {
+    '学生姓名': '王小明',
+    '申请专业': '计算机科学与技术',
+    '本科院校': '北京大学',
+    '邮箱': 'wangxiaoming@pku.edu.cn',
+}
+
+
+@pytest.fixture
+def template(tmp_path) -> Path:
+    doc = Document()
+    p = doc.add_paragraph()
+    for text in ('××', '大学', '××', '学院'):
+        p.add_run(text)
+    for label in ('学  生  姓  名', '申  请  专  业', '本  科  院  校', '邮            箱'):
+        p = doc.add_paragraph()
+        p.add_run(label + '：')
+        p.add_run('×××')
+    doc.add_paragraph('备注 ×××')
+    path = tmp_path / 'word_template.docx'
+    doc.save(str(path))
+    return path
+
+
+@pytest.fixture
+def plans(monkeypatch):
+    cache = cover.PatchPlanCache()
+    monkeypatch.setattr(cover, '_PATCH_PLANS', cache)
+    return cache
+
+
+def document_xml(template: Path, fields) -> bytes:
+    docx = cover.assemble_cover_docx(template, {}, None, fields)
+    return zipfile.ZipFile(io.BytesIO(docx)).read('word/document.xml')
+
+
+def python_docx_xml(template: Path, fields) -> bytes:
+    doc, _ = cover.fill_cover_document(template, {}, None, fields)
+    buf = io.BytesIO()
+    doc.save(buf)
+    return zipfile.ZipFile(buf).read('word/document.xml')
+
+
+def test_reordered_fields_share_a_plan(template, plans):
+    reordered = {'学生姓名': FIELDS['学生姓名'], **dict(reversed(list(FIELDS.items())))}
+    assert document_xml(template, FIELDS) == python_docx_xml(template, FIELDS)
+    assert document_xml(template, reordered) == python_docx_xml(template, reordered)
+    assert len(plans) == 1
+
+
+def test_first_field_picks_the_plan(template, plans):
+    # the stray '×××' falls back to the first field
+    moved = {'邮箱': FIELDS['邮箱'], **FIELDS}
+    assert document_xml(template, moved) == python_docx_xml(template, moved)
+    assert len(plans) == 1
+    document_xml(template, FIELDS)
+    assert len(plans) == 2
+
+
+def test_unknown_field_names_take_the_python_docx_path(template, plans):
+    fields = {**FIELDS, 'x-client-field': 'value'}
+    assert document_xml(template, fields) == python_docx_xml(template, fields)
+    assert len(plans) == 0
+
+
+def test_plans_are_bounded(template, monkeypatch):
+    monkeypatch.setattr(cover, '_PATCH_PLANS', cover.PatchPlanCache(max_entries=2))
+    for key in FIELDS:
+        document_xml(template, {key: FIELDS[key]})
+    assert len(cover._PATCH_PLANS) == 2
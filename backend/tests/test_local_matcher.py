@@ -0,0 +1,31 @@
+from local_matcher import CONFIDENT_SCORE, contains_term, denoise_filename, score_item
+
+
+def test_university_name_after_content_keeps_the_content():
+    assert denoise_filename('成绩单北京大学.pdf').strip() == '成绩单'
+    assert '成绩单' in denoise_filename('王小明本科成绩单清华大学.pdf')
+
+
+def test_university_name_is_stripped():
+    assert denoise_filename('清华大学成绩单.pdf').strip() == '成绩单'
+
+
+def test_ascii_terms_match_whole_words():
+    assert not contains_term('degree', 'gre')
+    assert not contains_term('cvpr论文', 'cv')
+    assert not contains_term('frank', 'rank')
+    assert contains_term('gre成绩', 'gre')
+    assert contains_term('my_cv', 'cv')
+
+
+def test_substring_of_ascii_synonym_scores_no_synonym_hit():
+    materials = [{'id': 'm1', 'filename': 'degree.pdf', 'category': 'english'}]
+    candidates = score_item({'label': '六级成绩', 'category': 'english'}, materials)
+    assert candidates and 'gre' not in candidates[0]['reason']
+    assert candidates[0]['score'] < CONFIDENT_SCORE
+
+
+def test_content_before_university_name_still_matches():
+    materials = [{'id': 'm1', 'filename': '成绩单北京大学.pdf', 'category': 'transcript'}]
+    candidates = score_item({'label': '成绩单', 'category': 'transcript'}, materials)
+    assert candidates[0]['reason'].endswith("Filename contains '成绩单'")
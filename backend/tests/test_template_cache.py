@@ -0,0 +1,41 @@
+import io
+from pathlib import Path
+
+import pytest
+from docx import Document
+
+from template_cache import TemplateCache
+
+
+@pytest.fixture
+def template(tmp_path) -> Path:
+    doc = Document()
+    doc.add_paragraph('封面')
+    path = tmp_path / 'word_template.docx'
+    doc.save(str(path))
+    return path
+
+
+def saved_texts(doc) -> list:
+    buf = io.BytesIO()
+    doc.save(buf)
+    buf.seek(0)
+    return [p.text for p in Document(buf).paragraphs]
+
+
+def test_clone_writes_survive_save_after_artifact(template):
+    compiled = TemplateCache().get(template)
+    # reading the master's paragraphs fills python-docx's cached body proxy
+    compiled.artifact('count', lambda master: len(master.paragraphs))
+    clone = compiled.instantiate()
+    clone.add_paragraph('new')
+    clone.add_table(rows=1, cols=1)
+    assert clone.element.body.xpath('./w:tbl')
+    assert saved_texts(clone) == ['封面', 'new']
+
+
+def test_clones_do_not_share_the_document_body(template):
+    compiled = TemplateCache().get(template)
+    first = compiled.instantiate()
+    first.add_paragraph('only in first')
+    assert saved_texts(compiled.instantiate()) == ['封面']
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Character n-gram vector index for /match.
+
+Material file names (de-noised, plus the semantic hint of their category) and
+requirement labels (plus their category hint and synonym group, e.g. CET ->
+四级/六级/托福/...) are turned into hashed character 1-3 gram TF-IDF vectors.
+Material vectors are kept sparse (CSR arrays, ~100 of VECTOR_INDEX_DIM buckets
+per file), and all items are scored against all materials in a few vectorized
+passes, so a library of thousands of files costs milliseconds instead of a
+huge prompt:
+
+  score = CATEGORY_WEIGHT * (same category) + (1 - CATEGORY_WEIGHT) * cosine
+
+The top-k candidates per item are returned directly ("vector" mode) or used as
+the shortlist for a much smaller LLM re-ranking prompt ("rerank" mode).
+
+Material indexes are cached (LRU) by the content of the material list, since
+the same user library is usually matched against several programmes.
+
+Config (env):
+  VECTOR_INDEX_DIM         hashed feature dimension (power of two, checked at import; default 4096)
+  VECTOR_INDEX_CACHE_SIZE  cached material indexes (default 16)
+
+Dependencies:
+  pip install numpy
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from local_matcher import CATEGORY_SEMANTICS, denoise_filename, synonym_group
+
+VECTOR_INDEX_DIM = int(os.getenv("VECTOR_INDEX_DIM", "4096"))
+VECTOR_INDEX_CACHE_SIZE = int(os.getenv("VECTOR_INDEX_CACHE_SIZE", "16"))
+
+
+def _check_dim(dim: int) -> None:
+    # buckets are taken with `& (dim - 1)`, which only spreads over all of a power of two
+    if dim <= 0 or dim & (dim - 1):
+        raise ValueError(f"VECTOR_INDEX_DIM must be a power of two, got {dim}")
+
+
+_check_dim(VECTOR_INDEX_DIM)
+
+NGRAM_RANGE = (1, 3)
+CATEGORY_WEIGHT = 0.5
+# candidates below this combined score are not reported
+MIN_VECTOR_SCORE = 0.15
+DEFAULT_TOP_K = 5
+
+_NON_WORD_RE = re.compile(r'[^0-9a-z\u4e00-\u9fff]+')
+
+
+def _normalize(text: str) -> str:
+    return _NON_WORD_RE.sub(' ', text.lower()).strip()
+
+
+def char_ngrams(text: str) -> Counter:
+    """Character n-grams of each space-separated word (no n-grams across word boundaries)."""
+    grams: Counter = Counter()
+    lo, hi = NGRAM_RANGE
+    for word in _normalize(text).split():
+        for n in range(lo, hi + 1):
+            for i in range(len(word) - n + 1):
+                grams[word[i:i + n]] += 1
+    return grams
+
+
+def material_text(material: Dict) -> str:
+    cat = str(material.get('category') or 'other').lower()
+    return ' '.join((denoise_filename(str(material.get('filename') or '')), CATEGORY_SEMANTICS.get(cat, '')))
+
+
+def item_category(item: Dict) -> str:
+    """The item's category, or the one its label's synonym group implies ('' if unknown)."""
+    cat = str(item.get('category') or '').lower()
+    if not cat or cat == 'other':
+        cat = synonym_group(str(item.get('label') or ''))[0] or cat
+    return cat
+
+
+def item_text(item: Dict) -> str:
+    label = str(item.get('label') or '')
+    cat = item_category(item)
+    _, group = synonym_group(label, cat or None)
+    return ' '.join([label, CATEGORY_SEMANTICS.get(cat, '')] + list(group or []))
+
+
+# Sparse rows in CSR layout: (indptr, indices, values); row i is indices/values[indptr[i]:indptr[i + 1]]
+SparseRows = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def _row_ids(rows: SparseRows) -> np.ndarray:
+    indptr = rows[0]
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+
+class NgramVectorizer:
+    """Hashing vectorizer with sublinear TF and IDF fitted on the material side."""
+
+    def __init__(self, dim: int = VECTOR_INDEX_DIM):
+        _check_dim(dim)
+        self.dim = dim
+        self.idf = np.ones(dim, dtype=np.float32)
+
+    def _bucket(self, gram: str) -> int:
+        # crc32 rather than hash(): stable across processes and restarts
+        return zlib.crc32(gram.encode('utf-8')) & (self.dim - 1)
+
+    def counts(self, texts: List[str]) -> SparseRows:
+        """Sublinear term frequencies of each text, as sparse rows (a row has ~100 of `dim` buckets set)."""
+        indptr = [0]
+        indices: List[int] = []
+        values: List[float] = []
+        for text in texts:
+            buckets: Counter = Counter()
+            for gram, n in char_ngrams(text).items():
+                buckets[self._bucket(gram)] += n
+            indices.extend(buckets.keys())
+            values.extend(buckets.values())
+            indptr.append(len(indices))
+        tf = np.asarray(values, dtype=np.float32)
+        return (np.asarray(indptr, dtype=np.int64), np.asarray(indices, dtype=np.int64),
+                1.0 + np.log(tf) if len(tf) else tf)
+
+    def fit(self, counts: SparseRows) -> None:
+        # buckets are unique within a row, so bucket occurrences are document frequencies
+        df = np.bincount(counts[1], minlength=self.dim).astype(np.float32)
+        n_rows = len(counts[0]) - 1
+        self.idf = np.log((1.0 + n_rows) / (1.0 + df)) + 1.0
+
+    def weight(self, counts: SparseRows) -> SparseRows:
+        indptr, indices, values = counts
+        values = values * self.idf[indices]
+        norms = np.sqrt(np.bincount(_row_ids(counts), weights=values * values, minlength=len(indptr) - 1))
+        norms[norms == 0] = 1.0
+        return indptr, indices, (values / np.repeat(norms, np.diff(indptr))).astype(np.float32)
+
+    def dense(self, rows: SparseRows) -> np.ndarray:
+        indptr, indices, values = rows
+        mat = np.zeros((len(indptr) - 1, self.dim), dtype=np.float32)
+        mat[_row_ids(rows), indices] = values
+        return mat
+
+
+class MaterialIndex:
+    """Sparse TF-IDF vectors and category one-hots for one material list."""
+
+    def __init__(self, materials: List[Dict], dim: int = VECTOR_INDEX_DIM):
+        self.ids = [m.get('id') for m in materials]
+        self.categories = [str(m.get('category') or 'other').lower() for m in materials]
+        self.vectorizer = NgramVectorizer(dim)
+        counts = self.vectorizer.counts([material_text(m) for m in materials])
+        self.vectorizer.fit(counts)
+        # sparse: a dense len(materials) x dim matrix would be ~80 MB for 5k materials
+        self.vectors = self.vectorizer.weight(counts)
+        self._vector_rows = _row_ids(self.vectors)
+        self.category_names = sorted(set(self.categories))
+        self._category_pos = {c: i for i, c in enumerate(self.category_names)}
+        self.category_onehot = np.zeros((len(materials), len(self.category_names)), dtype=np.float32)
+        for row, cat in enumerate(self.categories):
+            self.category_onehot[row, self._category_pos[cat]] = 1.0
+
+    def score(self, items: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """(combined scores, category agreement), both shaped (len(items), len(materials))."""
+        item_vectors = self.vectorizer.dense(
+            self.vectorizer.weight(self.vectorizer.counts([item_text(it) for it in items])))
+        item_onehot = np.zeros((len(items), len(self.category_names)), dtype=np.float32)
+        for row, item in enumerate(items):
+            pos = self._category_pos.get(item_category(item))
+            if pos is not None:
+                item_onehot[row, pos] = 1.0
+        _, indices, values = self.vectors
+        similarity = np.empty((len(items), len(self.ids)), dtype=np.float32)
+        for row, q in enumerate(item_vectors):
+            # dot product of the (dense) item with every sparse material row
+            similarity[row] = np.bincount(self._vector_rows, weights=q[indices] * values, minlength=len(self.ids))
+        same_category = item_onehot @ self.category_onehot.T
+        return CATEGORY_WEIGHT * same_category + (1.0 - CATEGORY_WEIGHT) * similarity, same_category
+
+    def top_k(self, items: List[Dict], k: int = DEFAULT_TOP_K,
+              min_score: float = MIN_VECTOR_SCORE) -> List[List[Dict]]:
+        """Best `k` candidates per item ({id, score 0-100, reason}), best first."""
+        if not items or not self.ids:
+            return [[] for _ in items]
+        scores, same_category = self.score(items)
+        k = min(k, len(self.ids))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        out = []
+        for row, cols in enumerate(top):
+            cols = cols[np.argsort(-scores[row, cols])]
+            candidates = []
+            for col in cols:
+                score = float(scores[row, col])
+                if score < min_score:
+                    break
+                reasons = []
+                if same_category[row, col]:
+                    cat = self.categories[col]
+                    reasons.append(f"Category:{CATEGORY_SEMANTICS.get(cat, cat).split('/')[0]}")
+                similarity = (score - CATEGORY_WEIGHT * float(same_category[row, col])) / (1.0 - CATEGORY_WEIGHT)
+                reasons.append(f"Filename similarity {similarity:.2f}")
+                candidates.append({'id': self.ids[col], 'score': round(score * 100), 'reason': ' + '.join(reasons)})
+            out.append(candidates)
+        return out
+
+
+def _materials_key(materials: List[Dict]) -> str:
+    payload = json.dumps(
+        [(m.get('id'), m.get('filename'), m.get('category')) for m in materials],
+        ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+_INDEXES: "OrderedDict[str, MaterialIndex]" = OrderedDict()
+_INDEX_LOCK = threading.Lock()
+
+
+def get_material_index(materials: List[Dict]) -> MaterialIndex:
+    """MaterialIndex for `materials`, reused while the same library is matched again."""
+    key = _materials_key(materials)
+    with _INDEX_LOCK:
+        index = _INDEXES.get(key)
+        if index is not None:
+            _INDEXES.move_to_end(key)
+            return index
+    index = MaterialIndex(materials)
+    with _INDEX_LOCK:
+        _INDEXES[key] = index
+        while len(_INDEXES) > VECTOR_INDEX_CACHE_SIZE:
+            _INDEXES.popitem(last=False)
+    return index
+
+
+def vector_match(items: List[Dict], materials: List[Dict], k: int = DEFAULT_TOP_K) -> List[Dict]:
+    """Match entries ({item_label, candidates}) in item order from the vector index."""
+    candidates = get_material_index(materials).top_k(items, k)
+    return [{'item_label': item.get('label'), 'candidates': cands} for item, cands in zip(items, candidates)]
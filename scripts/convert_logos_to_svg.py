@@ -1,21 +1,37 @@
 #!/usr/bin/env python3
 """
-Batch-convert bitmap logos into simple SVG wrappers that embed the raster image as base64.
-This creates an SVG file per input image; these SVGs can be rasterized later at arbitrary sizes.
+Batch-convert bitmap logos into simple SVG wrappers that embed the raster image as base64,
+or (--format png) into PNGs pre-sized for the cover template's logo box.
 
 Usage:
   python scripts/convert_logos_to_svg.py --input /home/root1/下载/中国所有大学校徽图片-200px-jpgs --output /home/root1/下载/中国所有大学校徽-images-svg
+  python scripts/convert_logos_to_svg.py --input logos-jpgs --format png --template word_template.docx --spec scripts/template_spec.json
 
 Notes:
  - This is NOT true vectorization. It embeds the original bitmap inside an SVG container.
  - The generated SVGs keep the original image's aspect ratio and include width/height attributes.
+ - PNG output is what the service would rasterize the SVG wrapper to at request time: the image
+   fitted (aspect kept, centered, transparent padding) into the first image extent of --template
+   (or --extent-in) at the spec's logo dpi x scale_factor. It skips cairo at request time and is
+   smaller than the base64 wrapper (~33% larger than the image it embeds).
+ - Files are converted on a process pool (--jobs). <output>/.convert-manifest.json records each
+   input's size, mtime and sha256 with the output it produced, so unchanged logos are skipped on
+   the next run (--force converts everything).
  - Requires Pillow: pip install pillow
 """
 from __future__ import annotations
 
 import argparse
 import base64
+import hashlib
+import io
+import json
+import os
+import re
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Dict, Optional, Tuple
 from PIL import Image
 
 
@@ -25,46 +41,164 @@ SVG_TEMPLATE = """<?xml version="1.0" encoding="UTF-8" standalone="no"?>
 </svg>
 """
 
+INPUT_EXTS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif')
+MANIFEST_NAME = '.convert-manifest.json'
+EMU_PER_INCH = 914400
 
-def convert_dir(input_dir: Path, output_dir: Path):
+
+def template_logo_extent(template: Path) -> Tuple[int, int]:
+    """(cx, cy) in EMU of the first image in the template's document body."""
+    with zipfile.ZipFile(template) as zf:
+        xml = zf.read('word/document.xml').decode('utf-8')
+    m = re.search(r'<wp:extent\b[^>]*\bcx="(\d+)"[^>]*\bcy="(\d+)"', xml)
+    if not m:
+        raise ValueError(f"No image extent found in {template}")
+    return int(m.group(1)), int(m.group(2))
+
+
+def png_box(cx: int, cy: int, dpi: int, scale: float) -> Tuple[int, int]:
+    """Pixel size the service rasterizes a cx x cy EMU logo to (see backend/raster_cache.py)."""
+    return round(cx / EMU_PER_INCH * dpi * scale), round(cy / EMU_PER_INCH * dpi * scale)
+
+
+def to_svg(data: bytes, im: Image.Image) -> bytes:
+    w, h = im.size
+    mime = Image.MIME.get(im.format, 'image/png')
+    b64 = base64.b64encode(data).decode('ascii')
+    return SVG_TEMPLATE.format(w=w, h=h, mime=mime, b64=b64).encode('utf-8')
+
+
+def to_png(im: Image.Image, box: Tuple[int, int]) -> bytes:
+    """The image fitted into `box`, centered on a transparent canvas (SVG preserveAspectRatio meet)."""
+    im = im.convert('RGBA')
+    ratio = min(box[0] / im.width, box[1] / im.height)
+    size = (max(1, round(im.width * ratio)), max(1, round(im.height * ratio)))
+    im = im.resize(size, Image.LANCZOS)
+    canvas = Image.new('RGBA', box, (0, 0, 0, 0))
+    canvas.paste(im, ((box[0] - size[0]) // 2, (box[1] - size[1]) // 2))
+    out = io.BytesIO()
+    canvas.save(out, format='PNG', optimize=True)
+    return out.getvalue()
+
+
+def convert_one(src: str, output_dir: str, fmt: str, box: Optional[Tuple[int, int]],
+                known_sha: Optional[str]) -> Dict:
+    """Convert one logo (read once). Returns its manifest entry plus a 'status'."""
+    p = Path(src)
+    st = p.stat()
+    entry = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    try:
+        with open(p, 'rb') as f:
+            data = f.read()
+        entry['sha256'] = hashlib.sha256(data).hexdigest()
+        out = Path(output_dir) / (p.stem + '.' + fmt)
+        entry['output'] = out.name
+        if entry['sha256'] == known_sha and out.exists():
+            # touched but unchanged
+            return {**entry, 'status': 'unchanged'}
+        im = Image.open(io.BytesIO(data))
+        payload = to_png(im, box) if fmt == 'png' else to_svg(data, im)
+        tmp = out.with_name(out.name + f'.{os.getpid()}.tmp')
+        tmp.write_bytes(payload)
+        os.replace(tmp, out)
+        return {**entry, 'status': 'converted'}
+    except Exception as e:
+        return {**entry, 'status': 'failed', 'error': str(e)}
+
+
+def load_manifest(output_dir: Path, options: Dict) -> Dict[str, Dict]:
+    try:
+        manifest = json.loads((output_dir / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except Exception:
+        return {}
+    # different format / logo box: every output is stale
+    return manifest.get('files', {}) if manifest.get('options') == options else {}
+
+
+def save_manifest(output_dir: Path, options: Dict, files: Dict[str, Dict]) -> None:
+    tmp = output_dir / (MANIFEST_NAME + '.tmp')
+    tmp.write_text(json.dumps({'options': options, 'files': files}, ensure_ascii=False, indent=2), encoding='utf-8')
+    os.replace(tmp, output_dir / MANIFEST_NAME)
+
+
+def convert_dir(input_dir: Path, output_dir: Path, fmt: str = 'svg', box: Optional[Tuple[int, int]] = None,
+                jobs: Optional[int] = None, force: bool = False) -> Dict[str, int]:
     output_dir.mkdir(parents=True, exist_ok=True)
+    options = {'format': fmt, 'box': list(box) if box else None}
+    previous = {} if force else load_manifest(output_dir, options)
+    files: Dict[str, Dict] = {}
+    todo = []
+    counts = {'converted': 0, 'unchanged': 0, 'skipped': 0, 'failed': 0}
     for p in sorted(input_dir.iterdir()):
-        if not p.is_file():
+        if not p.is_file() or p.suffix.lower() not in INPUT_EXTS:
             continue
-        if p.suffix.lower() not in ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif'):
+        old = previous.get(p.name)
+        st = p.stat()
+        if (old and old.get('size') == st.st_size and old.get('mtime_ns') == st.st_mtime_ns
+                and (output_dir / old.get('output', '')).is_file()):
+            files[p.name] = old
+            counts['skipped'] += 1
             continue
-        try:
-            im = Image.open(p)
-            w, h = im.size
-            mime = Image.MIME.get(im.format, 'image/png')
-            with open(p, 'rb') as f:
-                b = f.read()
-            b64 = base64.b64encode(b).decode('ascii')
-            svg_name = output_dir / (p.stem + '.svg')
-            svg_text = SVG_TEMPLATE.format(w=w, h=h, mime=mime, b64=b64)
-            svg_name.write_text(svg_text, encoding='utf-8')
-            print("Wrote", svg_name)
-        except Exception as e:
-            print("Failed to convert", p, e)
+        todo.append(p)
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+            results = pool.map(
+                convert_one, [str(p) for p in todo], [str(output_dir)] * len(todo), [fmt] * len(todo),
+                [box] * len(todo), [(previous.get(p.name) or {}).get('sha256') for p in todo],
+                chunksize=max(1, len(todo) // ((jobs or os.cpu_count() or 1) * 8)))
+            for p, result in zip(todo, results):
+                status = result.pop('status')
+                counts[status] += 1
+                if status == 'failed':
+                    print("Failed to convert", p, result.get('error'))
+                    continue
+                if status == 'converted':
+                    print("Wrote", output_dir / result['output'])
+                files[p.name] = result
+    save_manifest(output_dir, options, files)
+    return counts
 
 
 def main(argv):
     parser = argparse.ArgumentParser()
     parser.add_argument('--input', required=True, help='Input directory with bitmap logos')
-    parser.add_argument('--output', required=False, help='Output directory for SVGs')
+    parser.add_argument('--output', required=False, help='Output directory for SVGs / PNGs')
+    parser.add_argument('--format', choices=('svg', 'png'), default='svg',
+                        help='svg: base64 wrapper (default); png: pre-sized for the template logo box')
+    parser.add_argument('--template', help='cover template .docx whose first image extent sizes the PNGs')
+    parser.add_argument('--extent-in', help='logo box in inches, WxH (instead of --template)')
+    parser.add_argument('--spec', help='template_spec.json for logo dpi / scale_factor (default 300 / 3.0)')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--force', action='store_true', help='ignore the manifest and convert every file')
     args = parser.parse_args(argv)
     inp = Path(args.input)
-    out = Path(args.output) if args.output else inp.parent / (inp.name + "-svg")
+    out = Path(args.output) if args.output else inp.parent / (inp.name + "-" + args.format)
     if not inp.exists():
         print("Input dir not found:", inp)
         return 2
-    convert_dir(inp, out)
+
+    box = None
+    if args.format == 'png':
+        if args.template:
+            cx, cy = template_logo_extent(Path(args.template))
+        elif args.extent_in:
+            w_in, h_in = (float(v) for v in args.extent_in.lower().split('x'))
+            cx, cy = round(w_in * EMU_PER_INCH), round(h_in * EMU_PER_INCH)
+        else:
+            print("--format png needs --template or --extent-in")
+            return 2
+        logo_spec = {}
+        if args.spec:
+            logo_spec = json.loads(Path(args.spec).read_text(encoding='utf-8')).get('logo', {})
+        box = png_box(cx, cy, logo_spec.get('dpi', 300), logo_spec.get('scale_factor', 3.0))
+        print(f"PNG logo box: {box[0]}x{box[1]} px")
+
+    counts = convert_dir(inp, out, args.format, box, args.jobs, args.force)
+    print(f"{counts['converted']} converted, {counts['unchanged'] + counts['skipped']} unchanged, "
+          f"{counts['failed']} failed -> {out}")
     return 0
 
 
 if __name__ == '__main__':
     raise SystemExit(main(__import__('sys').argv[1:]))
-
-
-
-
@@ -6,9 +6,21 @@ from Chinese display name -> ASCII filename (relative to logos dir).
 
 Usage:
   python scripts/generate_logo_mapping.py --logos "/path/to/logos" --out scripts/logo_mapping.json
+  python scripts/generate_logo_mapping.py --logos "/path/to/logos" --out scripts/logo_mapping.json --incremental
 
 The script will try to transliterate Chinese to pinyin using pypinyin if available.
 If not available, it will fall back to generating stable short hashes.
+
+Next to the mapping it writes:
+ - logo_pinyin_index.json: {"pinyin": {"beijingdaxue": [file, ...]}, "initials": {"bjdx": [file, ...]}},
+   built from the display names, so hash-named files (school_f21a4a5f.svg) can still be found
+   by pinyin; backend/logo_index.py loads it as is
+ - <mapping>.manifest.json: display name, size, mtime and transliteration of every file.
+   With --incremental only files that are new or changed since the manifest are transliterated
+   (on a process pool); the others are taken from the manifest.
+
+Display names of files renamed by an earlier run are recovered from the manifest, or from the
+existing mapping when there is no manifest yet.
 """
 from __future__ import annotations
 
@@ -17,8 +29,9 @@ import json
 import hashlib
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Tuple
 
 try:
     from pypinyin import lazy_pinyin
@@ -26,6 +39,10 @@ except Exception:
     lazy_pinyin = None  # type: ignore
 
 
+# same order as find_logo_file (backend/logo_index.py)
+EXT_PREFERENCE = {'.svg': 0, '.png': 1, '.jpg': 2, '.jpeg': 2}
+
+
 def ascii_name_for(orig: str) -> str:
     # orig is filename without extension
     # try pypinyin
@@ -49,11 +66,55 @@ def ascii_name_for(orig: str) -> str:
     return f'school_{h}'
 
 
+def transliterate(display: str) -> Tuple[str, str, str]:
+    """(ASCII file base, pinyin key, initials key) of a display name; keys are '' without pypinyin."""
+    base = ascii_name_for(display)
+    if not lazy_pinyin:
+        return base, '', ''
+    try:
+        syllables = [s.lower() for s in lazy_pinyin(display.strip())]
+    except Exception:
+        return base, '', ''
+    pinyin = re.sub(r'[^0-9a-z]', '', ''.join(syllables))
+    initials = ''.join(s[0] for s in syllables if s and s[0].isascii() and s[0].isalnum())
+    # a single letter is not a usable abbreviation
+    return base, pinyin, initials if len(initials) > 1 else ''
+
+
+def transliterate_all(names: List[str], jobs: int) -> List[Tuple[str, str, str]]:
+    if len(names) < 64 or jobs <= 1:
+        return [transliterate(n) for n in names]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(transliterate, names, chunksize=max(1, len(names) // (jobs * 8))))
+
+
+def _load_json(path: Path) -> Dict:
+    try:
+        return json.loads(path.read_text(encoding='utf-8'))
+    except Exception:
+        return {}
+
+
+def build_pinyin_index(manifest: Dict[str, Dict]) -> Dict[str, Dict[str, List[str]]]:
+    index: Dict[str, Dict[str, List[str]]] = {'pinyin': {}, 'initials': {}}
+    for fname, entry in sorted(manifest.items()):
+        for kind in ('pinyin', 'initials'):
+            key = entry.get(kind)
+            if key:
+                index[kind].setdefault(key, []).append(fname)
+    return index
+
+
 def main(argv):
     parser = argparse.ArgumentParser()
     parser.add_argument('--logos', required=True, help='Path to logos directory')
     parser.add_argument('--out', required=True, help='Output mapping JSON path')
     parser.add_argument('--dry-run', action='store_true', help='Do not actually rename files')
+    parser.add_argument('--incremental', action='store_true',
+                        help='only transliterate files that are new or changed since the manifest')
+    parser.add_argument('--manifest', help='manifest path (default: <out>.manifest.json)')
+    parser.add_argument('--index-out', help='pinyin/initials index path (default: logo_pinyin_index.json next to --out)')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='transliteration processes')
     args = parser.parse_args(argv)
 
     logos_dir = Path(args.logos)
@@ -61,22 +122,46 @@ def main(argv):
         print('Logos dir not found:', logos_dir)
         return 2
 
-    mapping: Dict[str, str] = {}
-    used_names = set(x.name for x in logos_dir.iterdir() if x.is_file())
-
-    for p in sorted(logos_dir.iterdir()):
-        if not p.is_file():
-            continue
-        orig_name = p.stem
+    out_path = Path(args.out)
+    manifest_path = Path(args.manifest) if args.manifest else out_path.with_suffix('.manifest.json')
+    index_path = Path(args.index_out) if args.index_out else out_path.with_name('logo_pinyin_index.json')
+    old_manifest: Dict[str, Dict] = _load_json(manifest_path)
+    # file -> display name for files an earlier run already renamed
+    known_display = {fname: entry['display'] for fname, entry in old_manifest.items() if entry.get('display')}
+    if not known_display:
+        known_display = {fname: display for display, fname in _load_json(out_path).items()}
+    # the mapping keeps one file per display name; siblings (x.svg / x.png) share it
+    display_by_stem = {Path(fname).stem: display for fname, display in known_display.items()}
+
+    # one directory scan; the stat results decide what is unchanged
+    files = sorted((e.name, e.stat()) for e in os.scandir(logos_dir) if e.is_file())
+    manifest: Dict[str, Dict] = {}
+    todo: List[Tuple[str, str, bool]] = []  # (current file name, display name, renamed earlier)
+    for name, st in files:
+        old = old_manifest.get(name) if args.incremental else None
+        if old and old.get('size') == st.st_size and old.get('mtime_ns') == st.st_mtime_ns:
+            manifest[name] = old
+        else:
+            display = known_display.get(name) or display_by_stem.get(Path(name).stem)
+            todo.append((name, display or Path(name).stem, display is not None))
+
+    results = transliterate_all([display for _, display, _ in todo], args.jobs)
+    stat_of = dict(files)
+    used_names = set(stat_of)
+    for (name, display, renamed), (ascii_base, pinyin, initials) in zip(todo, results):
+        p = logos_dir / name
         ext = p.suffix
-        ascii_base = ascii_name_for(orig_name)
-        candidate = ascii_base + ext
-        i = 1
-        # ensure no collision with existing names (including current file)
-        while candidate in used_names and candidate != p.name:
-            candidate = f'{ascii_base}_{i}{ext}'
-            i += 1
-        used_names.add(candidate)
+        if renamed:
+            # renamed by an earlier run: keep the current name
+            candidate = name
+        else:
+            candidate = ascii_base + ext
+            i = 1
+            # ensure no collision with existing names (including current file)
+            while candidate in used_names and candidate != p.name:
+                candidate = f'{ascii_base}_{i}{ext}'
+                i += 1
+            used_names.add(candidate)
         # rename if necessary
         if candidate != p.name:
             target = logos_dir / candidate
@@ -85,13 +170,28 @@ def main(argv):
                 p.rename(target)
         else:
             target = p
-        # mapping uses the original Chinese display name string
-        mapping[orig_name] = target.name
+        # a rename keeps size and mtime
+        st = stat_of[name]
+        manifest[target.name] = {
+            'display': display, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+            'pinyin': pinyin, 'initials': initials,
+        }
+
+    # mapping uses the original Chinese display name string; svg, then png, then jpg when several share it
+    mapping: Dict[str, str] = {}
+    for fname, entry in sorted(manifest.items(), key=lambda kv: (EXT_PREFERENCE.get(Path(kv[0]).suffix.lower(), 3), kv[0])):
+        mapping.setdefault(entry['display'], fname)
+    mapping = dict(sorted(mapping.items()))
 
-    out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
     out_path.write_text(json.dumps(mapping, ensure_ascii=False, indent=2), encoding='utf-8')
     print('Wrote mapping to', out_path)
+    if not lazy_pinyin:
+        print('pypinyin not installed: the pinyin index only covers ASCII display names')
+    index_path.write_text(json.dumps(build_pinyin_index(manifest), ensure_ascii=False, indent=2), encoding='utf-8')
+    print('Wrote pinyin index to', index_path)
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f'Transliterated {len(todo)} of {len(files)} files; manifest {manifest_path}')
     return 0
 
 
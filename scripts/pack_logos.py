@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Pack a logos directory and its logo_mapping.json into one logo bundle
+(see backend/logo_bundle.py for the format). Identical image bytes are
+stored once; mapping entries pointing at missing files are dropped.
+
+Usage:
+  python scripts/pack_logos.py --logos "/path/to/logos" --mapping scripts/logo_mapping.json --out logos.bundle
+
+Deploy the bundle next to the service and point LOGO_BUNDLE_PATH at it.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from logo_bundle import LogoBundle, write_bundle  # noqa: E402
+
+IMAGE_EXTS = {'.svg', '.png', '.jpg', '.jpeg', '.gif', '.webp'}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logos', required=True, help='logos directory')
+    parser.add_argument('--mapping', help='logo_mapping.json (Chinese name -> file name)')
+    parser.add_argument('--out', required=True, help='bundle file to write')
+    args = parser.parse_args()
+
+    logos_dir = Path(args.logos)
+    if not logos_dir.is_dir():
+        print('Logos directory not found:', logos_dir)
+        return 1
+    files = {p.name: p for p in logos_dir.iterdir() if p.is_file() and p.suffix.lower() in IMAGE_EXTS}
+    mapping = {}
+    if args.mapping:
+        mapping = json.loads(Path(args.mapping).read_text(encoding='utf-8'))
+
+    out = Path(args.out)
+    stats = write_bundle(files, mapping, out)
+
+    # read the bundle back before anyone deploys it
+    bundle = LogoBundle(out)
+    try:
+        for name, path in files.items():
+            if bundle.get(name) != path.read_bytes():
+                print('Bundle verification failed for', name)
+                return 1
+    finally:
+        bundle.close()
+
+    saved = stats['input_bytes'] - stats['bundle_bytes']
+    print(f"Packed {stats['files']} logos ({stats['blobs']} unique images) and "
+          f"{stats['schools']} mapped schools into {out}")
+    print(f"  {stats['input_bytes']} bytes of logos -> {stats['bundle_bytes']} byte bundle ({saved:+d} saved)")
+    if stats['unmapped_schools']:
+        print(f"  {stats['unmapped_schools']} mapping entries skipped: file not in the logos directory")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
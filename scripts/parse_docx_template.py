@@ -6,25 +6,39 @@ Parse a DOCX template and extract:
 
 Usage:
   python scripts/parse_docx_template.py /path/to/template.docx /path/to/output.json
+  python scripts/parse_docx_template.py /path/to/templates/ /path/to/output_dir/ [--jobs 4]
 
 Dependencies:
   pip install python-docx lxml
 
 Notes:
- - This script uses python-docx's oxml to inspect wp:inline drawing elements to get extent (cx/cy).
+ - analyze_docx() streams word/document.xml and every header/footer part straight from the ZIP
+   with lxml iterparse and collects images (extent, relationship, media part) and placeholders in
+   one pass, including paragraphs inside tables. Each item records its part, the paragraph index
+   within its container (body / header / footer paragraphs, or the table cell), the run index, and
+   for table content the [table, row, cell] path (outermost first; cell = w:tc index in the row).
+ - Given a directory, every *.docx in it is analyzed on a process pool and one JSON per template
+   is written to the output directory.
+ - --legacy uses the original python-docx walk (document body only).
  - Position information in DOCX is limited; this extracts size (extent) and relationship id to the image part.
  - Placeholder detection uses simple heuristics; inspect the JSON output and adjust rules if needed.
 """
 from __future__ import annotations
 
+import argparse
 import json
-import math
+import os
+import posixpath
+import re
 import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from docx import Document
+from lxml import etree
 
 # Namespaces used for XPath
 NSMAP = {
@@ -52,6 +66,11 @@ class ImageInfo:
     cy: int
     width_px: float
     height_px: float
+    # filled in by analyze_docx
+    part: str = 'word/document.xml'
+    paragraph_index: Optional[int] = None
+    run_index: Optional[int] = None
+    table: Optional[List[List[int]]] = None
 
 
 @dataclass
@@ -62,6 +81,9 @@ class PlaceholderInfo:
     run_index: int
     font_name: Optional[str]
     font_size_pt: Optional[float]
+    # filled in by analyze_docx
+    part: str = 'word/document.xml'
+    table: Optional[List[List[int]]] = None
 
 
 def extract_images_info(doc: Document) -> List[Dict]:
@@ -183,22 +205,200 @@ def detect_placeholders(doc: Document) -> List[Dict]:
     return [asdict(p) for p in placeholders]
 
 
-def main(argv):
-    if len(argv) < 2:
-        print("Usage: parse_docx_template.py /path/to/template.docx [/path/to/output.json]")
-        return 2
-    docx_path = Path(argv[1])
-    if not docx_path.exists():
-        print("File not found:", docx_path)
-        return 2
-    out_path = Path(argv[2]) if len(argv) > 2 else Path('scripts/template_parsed.json')
+W_NS = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+W = '{%s}' % W_NS
+WP = '{%s}' % NSMAP['wp']
+A = '{%s}' % NSMAP['a']
+R = '{%s}' % NSMAP['r']
+PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+
+HEADER_FOOTER_PART = re.compile(r'^word/(header|footer)\d*\.xml$')
+
+
+def _part_order(name: str) -> Tuple:
+    m = re.search(r'(\d+)\.xml$', name)
+    return (0 if name == 'word/document.xml' else 1 if 'header' in name else 2, int(m.group(1)) if m else 0)
+
+
+def _part_rels(zf: zipfile.ZipFile, part: str) -> Dict[str, str]:
+    """rId -> target partname (e.g. /word/media/image1.png) for one part."""
+    rels_name = posixpath.join(posixpath.dirname(part), '_rels', posixpath.basename(part) + '.rels')
+    try:
+        root = etree.fromstring(zf.read(rels_name))
+    except KeyError:
+        return {}
+    rels = {}
+    for rel in root.iter(PKG_REL):
+        target = rel.get('Target', '')
+        if rel.get('TargetMode') != 'External':
+            target = '/' + posixpath.normpath(posixpath.join(posixpath.dirname(part), target)).lstrip('/')
+        rels[rel.get('Id')] = target
+    return rels
+
+
+def _placeholders_for_paragraph(text: str, runs: List[Tuple[str, Optional[str], Optional[float]]]) -> List[Dict]:
+    """detect_placeholders heuristics on one paragraph given its text and (text, font, size) runs."""
+    if '：' in text or ':' in text:
+        left, right = text.split('：', 1) if '：' in text else text.split(':', 1)
+        placeholder_text = right.strip()
+        run_index, font_name, font_size_pt = 0, None, None
+        for r_idx, (run_text, font, size) in enumerate(runs):
+            if placeholder_text and placeholder_text in run_text:
+                run_index, font_name, font_size_pt = r_idx, font, size
+                break
+        else:
+            if runs:
+                run_index = len(runs) - 1
+                _, font_name, font_size_pt = runs[-1]
+        return [{'label': left.strip(), 'placeholder_text': placeholder_text, 'run_index': run_index,
+                 'font_name': font_name, 'font_size_pt': font_size_pt}]
+    found = []
+    for r_idx, (run_text, font, size) in enumerate(runs):
+        t = run_text.strip()
+        if t and ('XXX' in t or '____' in t or t.startswith('[') and t.endswith(']')):
+            found.append({'label': '', 'placeholder_text': t, 'run_index': r_idx,
+                          'font_name': font, 'font_size_pt': size})
+    return found
+
+
+def _analyze_part(stream, part: str, rels: Dict[str, str], images: List[ImageInfo],
+                  placeholders: List[PlaceholderInfo]) -> int:
+    """One iterparse pass over a story part; returns its paragraph count."""
+    # container stack: paragraph / table counters of the body (or header/footer), each open cell
+    # and each open text box
+    containers = [{'paragraphs': 0, 'tables': 0}]
+    tables: List[List[int]] = []        # open tables: [index, row, cell]
+    paragraphs: List[Dict] = []         # open paragraphs (text boxes nest them inside runs)
+    run: Optional[Dict] = None
+    drawing: Optional[Dict] = None
+    total = 0
+
+    for event, el in etree.iterparse(stream, events=('start', 'end')):
+        tag = el.tag
+        if event == 'start':
+            if tag == W + 'p':
+                ctx = containers[-1]
+                paragraphs.append({'index': ctx['paragraphs'], 'runs': [], 'run': None,
+                                   'table': [list(t) for t in tables] or None})
+                ctx['paragraphs'] += 1
+                total += 1
+            elif tag == W + 'r' and paragraphs and el.getparent() is not None and el.getparent().tag == W + 'p':
+                para = paragraphs[-1]
+                run = para['run'] = {'text': [], 'font': None, 'size': None}
+                para['runs'].append(run)
+            elif tag == W + 'tbl':
+                ctx = containers[-1]
+                tables.append([ctx['tables'], -1, -1])
+                ctx['tables'] += 1
+            elif tag == W + 'tr' and tables:
+                tables[-1][1] += 1
+                tables[-1][2] = -1
+            elif tag == W + 'tc' and tables:
+                tables[-1][2] += 1
+                containers.append({'paragraphs': 0, 'tables': 0})
+            elif tag == W + 'txbxContent':
+                # text box paragraphs are not paragraphs of the story they are anchored in
+                containers.append({'paragraphs': 0, 'tables': 0})
+            elif tag in (WP + 'inline', WP + 'anchor'):
+                drawing = {'cx': None, 'cy': None, 'rId': None}
+            continue
+
+        # end events: children are complete here
+        if tag == W + 't' and paragraphs and paragraphs[-1]['run'] is not None:
+            paragraphs[-1]['run']['text'].append(el.text or '')
+        elif tag == W + 'tab' and paragraphs and paragraphs[-1]['run'] is not None and el.getparent().tag == W + 'r':
+            paragraphs[-1]['run']['text'].append('\t')
+        elif tag == W + 'rFonts' and run is not None and el.getparent().getparent() is not None \
+                and el.getparent().getparent().tag == W + 'r':
+            run['font'] = el.get(W + 'ascii')
+        elif tag == W + 'sz' and run is not None and el.getparent().getparent() is not None \
+                and el.getparent().getparent().tag == W + 'r':
+            try:
+                run['size'] = int(el.get(W + 'val')) / 2.0
+            except (TypeError, ValueError):
+                pass
+        elif tag == WP + 'extent' and drawing is not None and drawing['cx'] is None:
+            try:
+                drawing['cx'], drawing['cy'] = int(el.get('cx')), int(el.get('cy'))
+            except (TypeError, ValueError):
+                pass
+        elif tag == A + 'blip' and drawing is not None and drawing['rId'] is None:
+            drawing['rId'] = el.get(R + 'embed')
+        elif tag in (WP + 'inline', WP + 'anchor') and drawing is not None:
+            if drawing['rId'] and drawing['cx'] and drawing['cy']:
+                para = paragraphs[-1] if paragraphs else None
+                images.append(ImageInfo(
+                    rId=drawing['rId'],
+                    partname=rels.get(drawing['rId'], ''),
+                    cx=drawing['cx'],
+                    cy=drawing['cy'],
+                    width_px=round(emu_to_px(drawing['cx']), 2),
+                    height_px=round(emu_to_px(drawing['cy']), 2),
+                    part=part,
+                    paragraph_index=para['index'] if para else None,
+                    run_index=len(para['runs']) - 1 if para and para['runs'] else None,
+                    table=para['table'] if para else None,
+                ))
+            drawing = None
+        elif tag == W + 'r' and paragraphs and paragraphs[-1]['run'] is not None \
+                and el.getparent() is not None and el.getparent().tag == W + 'p':
+            paragraphs[-1]['run'] = None
+            run = None
+        elif tag == W + 'p' and paragraphs:
+            para = paragraphs.pop()
+            runs = [(''.join(r['text']), r['font'], r['size']) for r in para['runs']]
+            text = ''.join(t for t, _, _ in runs)
+            for found in _placeholders_for_paragraph(text, runs):
+                placeholders.append(PlaceholderInfo(paragraph_index=para['index'], part=part,
+                                                    table=para['table'], **found))
+            run = paragraphs[-1]['run'] if paragraphs else None
+        elif tag in (W + 'tc', W + 'txbxContent') and len(containers) > 1:
+            containers.pop()
+        elif tag == W + 'tbl' and tables:
+            tables.pop()
+
+        # drop finished top-level blocks so memory stays flat on large templates
+        if tag in (W + 'p', W + 'tbl') and not paragraphs and not tables:
+            el.clear()
+            parent = el.getparent()
+            while parent is not None and el.getprevious() is not None:
+                del parent[0]
+    return total
+
+
+def analyze_docx(docx_path: Path) -> Dict:
+    """
+    Single-pass analysis of a template straight from the ZIP: images and placeholders of the
+    document body, tables, headers and footers, with their positions.
+    """
+    images: List[ImageInfo] = []
+    placeholders: List[PlaceholderInfo] = []
+    parts = []
+    with zipfile.ZipFile(docx_path) as zf:
+        names = sorted((n for n in zf.namelist() if n == 'word/document.xml' or HEADER_FOOTER_PART.match(n)),
+                       key=_part_order)
+        for part in names:
+            with zf.open(part) as stream:
+                count = _analyze_part(stream, part, _part_rels(zf, part), images, placeholders)
+            parts.append({'part': part, 'paragraphs': count})
+    return {
+        'source': str(docx_path),
+        'images': [asdict(i) for i in images],
+        'placeholders': [asdict(p) for p in placeholders],
+        'parts': parts,
+        'summary': {
+            'image_count': len(images),
+            'placeholder_count': len(placeholders),
+        },
+    }
 
-    doc = Document(str(docx_path))
 
+def analyze_legacy(docx_path: Path) -> Dict:
+    """The original python-docx analysis (document body only)."""
+    doc = Document(str(docx_path))
     images = extract_images_info(doc)
     placeholders = detect_placeholders(doc)
-
-    result = {
+    return {
         'source': str(docx_path),
         'images': images,
         'placeholders': placeholders,
@@ -208,6 +408,54 @@ def main(argv):
         },
     }
 
+
+def _analyze_to_file(docx_path: str, out_path: str, legacy: bool) -> Tuple[str, Optional[str]]:
+    try:
+        result = (analyze_legacy if legacy else analyze_docx)(Path(docx_path))
+        Path(out_path).write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+        return docx_path, None
+    except Exception as e:
+        return docx_path, str(e)
+
+
+def analyze_dir(input_dir: Path, output_dir: Path, jobs: Optional[int] = None, legacy: bool = False) -> int:
+    """Analyze every *.docx in input_dir on a process pool; returns the number of failures."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    templates = sorted(p for p in input_dir.glob('*.docx') if not p.name.startswith('~$'))
+    failures = 0
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count() or 1) as pool:
+        futures = [pool.submit(_analyze_to_file, str(p), str(output_dir / (p.stem + '.json')), legacy)
+                   for p in templates]
+        for fut in futures:
+            path, error = fut.result()
+            if error:
+                failures += 1
+                print("Failed to parse", path, error)
+            else:
+                print("Parsed", path)
+    print(f"Wrote {len(templates) - failures} parsed templates to {output_dir}")
+    return failures
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='parse_docx_template.py')
+    parser.add_argument('input', help='template .docx, or a directory of templates')
+    parser.add_argument('output', nargs='?', help='output JSON (or directory in batch mode)')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes in batch mode (default: one per CPU)')
+    parser.add_argument('--legacy', action='store_true', help='use the python-docx walk (document body only)')
+    args = parser.parse_args(argv[1:])
+
+    docx_path = Path(args.input)
+    if not docx_path.exists():
+        print("File not found:", docx_path)
+        return 2
+    if docx_path.is_dir():
+        out_dir = Path(args.output) if args.output else Path('scripts/template_parsed')
+        return 1 if analyze_dir(docx_path, out_dir, args.jobs, args.legacy) else 0
+
+    out_path = Path(args.output) if args.output else Path('scripts/template_parsed.json')
+    result = analyze_legacy(docx_path) if args.legacy else analyze_docx(docx_path)
+
     out_path.parent.mkdir(parents=True, exist_ok=True)
     out_path.write_text(json.dumps(result, ensure_ascii=False, indent=2))
     print("Wrote parsed template to", out_path)